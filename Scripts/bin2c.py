@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+
+# bin2c: turns resource files (images, fonts...) into C++ sources, so a plugin can load them
+# from memory instead of the file system.
+#
+# every input gets its own <name>.cpp defining the data, plus
+#   embedded_resources.h          declarations and FindEmbeddedResource(name)
+#   embedded_resources.cpp        the name -> data table, sorted for binary search
+#   embedded_resources_unity.cpp  includes all of the above, for projects that would rather not add files to their build
+#
+# each generated source records a stamp of its input, so only the sources of changed inputs are rewritten
+# (and recompiled). stale sources of removed inputs are deleted.
+#
+# data encodings (--encoding):
+#   auto    #embed where the compiler has it, else a string literal, else (MSVC, whose string literals
+#           are limited to 64 KB) a byte list
+#   embed   #embed only (C23, clang 19+, gcc 15+)
+#   string  string literals only, cheap for compilers to parse
+#   bytes   comma separated bytes only, works everywhere but slow to compile for large files
+#
+# USAGE:
+# bin2c.py <outputdir> <input file or folder> [...]
+
+import argparse, hashlib, os, re, sys
+
+import tracing
+from resource_inputs import collect_inputs
+
+GENERATOR_VERSION = "1"
+ENCODINGS = ("auto", "embed", "string", "bytes")
+MARKER = "// generated by bin2c.py"
+STAMP_PREFIX = "// bin2c-stamp: "
+INDEX_NAME = "embedded_resources"
+LINE_WIDTH = 100
+
+def identifier(name):
+  """kCamelCase C++ identifier for a resource name, e.g. Roboto-Regular.ttf -> kRobotoRegularTtf."""
+  words = [w for w in re.split(r"[^0-9A-Za-z]+", name) if w]
+  return "k" + "".join(w[0].upper() + w[1:] for w in words)
+
+def string_literal_lines(data):
+  """data as lines of a C string literal. bytes outside printable ASCII become 3 digit octal escapes,
+  which can't swallow a following digit."""
+  lines = []
+  line = []
+  width = 0
+  for b in data:
+    if b in (0x22, 0x5c):  # " and backslash
+      piece = "\\" + chr(b)
+    elif b == 0x3f:  # ? could start a trigraph
+      piece = "\\?"
+    elif 0x20 <= b < 0x7f:
+      piece = chr(b)
+    else:
+      piece = "\\%03o" % b
+    line.append(piece)
+    width += len(piece)
+    if width >= LINE_WIDTH:
+      lines.append('"' + "".join(line) + '"')
+      line = []
+      width = 0
+  if line or not lines:
+    lines.append('"' + "".join(line) + '"')
+  return lines
+
+def byte_list_lines(data):
+  per_line = 24
+  return [",".join(str(b) for b in data[i:i + per_line]) + "," for i in range(0, len(data), per_line)]
+
+def resource_source(name, ident, data, embed_path, encoding, stamp):
+  out = [MARKER + " from " + name + ", do not edit", STAMP_PREFIX + stamp, ""]
+  out.append('#include "' + INDEX_NAME + '.h"')
+  out.append("")
+  out.append("const size_t " + ident + "Size = " + str(len(data)) + ";")
+  out.append("")
+
+  definition = "alignas(16) const unsigned char " + ident + "[" + str(len(data) + 1) + "] = "
+  embed = [definition + "{", '#embed "' + embed_path + '" suffix(,)', "0", "};"]
+  string = [definition] + string_literal_lines(data)
+  string[-1] += ";"
+  # the trailing 0 keeps the array the same size as with a string literal, and text resources NUL terminated
+  byte_list = [definition + "{"] + byte_list_lines(data) + ["0", "};"]
+
+  if encoding == "embed":
+    out += embed
+  elif encoding == "string":
+    out += string
+  elif encoding == "bytes":
+    out += byte_list
+  else:
+    out.append("#if defined(__has_embed)")
+    out.append('#if __has_embed("' + embed_path + '")')
+    out.append("#define BIN2C_EMBED 1")
+    out.append("#endif")
+    out.append("#endif")
+    out.append("")
+    out.append("#if defined(BIN2C_EMBED)")
+    out += embed
+    out.append("#undef BIN2C_EMBED")
+    out.append("#elif !defined(_MSC_VER) || defined(__clang__)")
+    out += string
+    out.append("#else")
+    out += byte_list
+    out.append("#endif")
+  out.append("")
+  return "\n".join(out)
+
+def index_header(resources):
+  out = [MARKER + ", do not edit", "", "#pragma once", "", "#include <cstddef>", "#include <cstring>", ""]
+  out.append("struct EmbeddedResource")
+  out.append("{")
+  out.append("  const char* name;")
+  out.append("  const unsigned char* data;")
+  out.append("  size_t size;")
+  out.append("};")
+  out.append("")
+  for name, ident in resources:
+    out.append("extern const unsigned char " + ident + "[]; // " + name)
+    out.append("extern const size_t " + ident + "Size;")
+  out.append("")
+  out.append("extern const EmbeddedResource kEmbeddedResources[];")
+  out.append("extern const size_t kNumEmbeddedResources;")
+  out.append("")
+  out.append("/** Find an embedded resource by file name, e.g. \"Roboto-Regular.ttf\". Returns nullptr if there is none. */")
+  out.append("inline const EmbeddedResource* FindEmbeddedResource(const char* name)")
+  out.append("{")
+  out.append("  size_t lo = 0, hi = kNumEmbeddedResources;")
+  out.append("  while (lo < hi)")
+  out.append("  {")
+  out.append("    const size_t mid = (lo + hi) / 2;")
+  out.append("    const int cmp = std::strcmp(kEmbeddedResources[mid].name, name);")
+  out.append("    if (cmp == 0)")
+  out.append("      return &kEmbeddedResources[mid];")
+  out.append("    if (cmp < 0)")
+  out.append("      lo = mid + 1;")
+  out.append("    else")
+  out.append("      hi = mid;")
+  out.append("  }")
+  out.append("  return nullptr;")
+  out.append("}")
+  out.append("")
+  return "\n".join(out)
+
+def index_source(resources):
+  out = [MARKER + ", do not edit", "", '#include "' + INDEX_NAME + '.h"', ""]
+  # the table is sorted by the names' bytes, the order strcmp uses
+  out.append("const EmbeddedResource kEmbeddedResources[] = {")
+  for name, ident in resources:
+    out.append('  {"' + name + '", ' + ident + ", " + ident + "Size},")
+  if not resources:
+    out.append("  {nullptr, nullptr, 0}")
+  out.append("};")
+  out.append("")
+  out.append("const size_t kNumEmbeddedResources = " + str(len(resources)) + ";")
+  out.append("")
+  return "\n".join(out)
+
+def unity_source(sources):
+  out = [MARKER + ", do not edit", "// compiles every embedded resource as part of one translation unit", ""]
+  out += ['#include "' + s + '"' for s in sources]
+  out.append("")
+  return "\n".join(out)
+
+def read_stamp(path):
+  try:
+    with open(path, "r", encoding="utf-8") as f:
+      for _ in range(2):
+        line = f.readline()
+        if line.startswith(STAMP_PREFIX):
+          return line[len(STAMP_PREFIX):].strip()
+  except OSError:
+    pass
+  return None
+
+def write_text_if_changed(path, text):
+  try:
+    with open(path, "r", encoding="utf-8") as f:
+      if f.read() == text:
+        return False
+  except OSError:
+    pass
+  with open(path, "w", encoding="utf-8", newline="\n") as f:
+    f.write(text)
+  return True
+
+def generate(output_dir, paths, encoding="auto"):
+  """Generate the sources for the files in paths into output_dir. Returns (written, unchanged, removed) file lists."""
+  if encoding not in ENCODINGS:
+    raise ValueError("unknown encoding " + encoding)
+  inputs = collect_inputs(paths)
+  os.makedirs(output_dir, exist_ok=True)
+
+  idents = {}
+  for name in inputs:
+    ident = identifier(name)
+    if ident in idents:
+      raise ValueError(name + " and " + idents[ident] + " map to the same identifier " + ident)
+    idents[ident] = name
+
+  written, unchanged = [], []
+  resources = []
+  sources = []
+  for name in sorted(inputs, key=lambda n: n.encode("utf-8")):
+    ident = identifier(name)
+    source_name = ident[1:] + ".cpp"
+    source_path = os.path.join(output_dir, source_name)
+    resources.append((name, ident))
+    sources.append(source_name)
+
+    with open(inputs[name], "rb") as f:
+      data = f.read()
+    embed_path = os.path.relpath(inputs[name], output_dir).replace(os.sep, "/")
+    stamp = hashlib.sha256("\0".join([GENERATOR_VERSION, encoding, name, embed_path]).encode("utf-8") + b"\0" + data).hexdigest()
+
+    if read_stamp(source_path) == stamp:
+      unchanged.append(source_path)
+      continue
+
+    with tracing.span("bin2c", "file", file=name) as span:
+      span.read(len(data))
+      text = resource_source(name, ident, data, embed_path, encoding, stamp)
+      with open(source_path, "w", encoding="utf-8", newline="\n") as f:
+        f.write(text)
+      span.wrote(len(text))
+    written.append(source_path)
+
+  generated = {
+    INDEX_NAME + ".h": index_header(resources),
+    INDEX_NAME + ".cpp": index_source(resources),
+    INDEX_NAME + "_unity.cpp": unity_source(sources + [INDEX_NAME + ".cpp"]),
+  }
+  for file_name, text in generated.items():
+    path = os.path.join(output_dir, file_name)
+    (written if write_text_if_changed(path, text) else unchanged).append(path)
+
+  # remove sources of resources that no longer exist, but only files this script generated
+  removed = []
+  for file_name in sorted(os.listdir(output_dir)):
+    path = os.path.join(output_dir, file_name)
+    if file_name.endswith(".cpp") and file_name not in sources and file_name not in generated and read_stamp(path):
+      os.remove(path)
+      removed.append(path)
+
+  return written, unchanged, removed
+
+def main():
+  parser = argparse.ArgumentParser(description="Generate C++ sources embedding resource files.")
+  parser.add_argument("output", help="Folder for the generated sources.")
+  parser.add_argument("inputs", nargs="+", help="Resource files, or folders whose files are embedded.")
+  parser.add_argument("--encoding", choices=ENCODINGS, default="auto", help="How the data is written (default: auto).")
+  args = parser.parse_args()
+
+  try:
+    written, unchanged, removed = generate(args.output, [p for p in args.inputs if os.path.exists(p)], args.encoding)
+  except ValueError as e:
+    print("error: " + str(e))
+    sys.exit(1)
+
+  for path in written:
+    print("wrote " + path)
+  for path in removed:
+    print("removed " + path)
+  tracing.debug(str(len(unchanged)) + " files unchanged")
+
+if __name__ == '__main__':
+  main()
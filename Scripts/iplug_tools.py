@@ -0,0 +1,371 @@
+#!/usr/bin/env python3
+
+# one entry point for the projects' build phase scripts, with an optional resident daemon.
+#
+# iplug-tools <command> [args]      the client build phases call, a bash script next to this one. if a daemon is
+#                                   running it sends the command there with nc -U, so no Python interpreter starts.
+#                                   otherwise it runs iplug_tools.py
+# iplug_tools.py <command> [args]   runs scripts/<script> of the project containing the current folder, with
+#                                   the same arguments, environment and working folder as calling it directly
+# iplug_tools.py daemon start|stop|status [--idle-timeout seconds]
+# iplug_tools.py bench-startup [command] [-n runs]   time a command run directly, through this entry point
+#                                                    and through iplug-tools
+#
+# scripts are imported under their own name and their main() is called, so they find the tooling modules on
+# the sys.path set up here and their __main__ block (the set-up for direct calls) doesn't run.
+#
+# the daemon listens on a Unix socket in a private (0700) temporary folder and writes the socket's path to
+# .iplug-tools-daemon in the workspace. it forks for every request, so each run starts from the same warm
+# state (tooling modules imported, config.h files parsed) and runs can't affect each other. set
+# IPLUG_TOOLS_DAEMON=0 to never use it.
+#
+# a request is NUL-terminated fields: PROTOCOL, the working folder, the number of arguments, the arguments
+# (the command first), the number of environment variables and NAME=value for each. the reply is the
+# command's output (stdout and stderr) followed by EXIT_LINE and the exit code.
+#
+# only os and sys are imported up front, everything else when a command needs it.
+
+import os, sys
+
+scriptpath = os.path.dirname(os.path.realpath(__file__))
+workspacepath = os.path.abspath(os.path.join(scriptpath, os.pardir))
+
+# command -> script in the project's scripts folder
+COMMANDS = {
+  "update-version-mac": "update_version-mac.py",
+  "update-version-ios": "update_version-ios.py",
+  "prepare-resources-mac": "prepare_resources-mac.py",
+  "prepare-resources-ios": "prepare_resources-ios.py",
+  "update-installer-win": "update_installer-win.py",
+  "embed-resources": "embed_resources.py",
+}
+
+# imported by the daemon before it serves, so forked requests find them loaded
+PRELOAD = ["plistlib", "fileinput", "glob", "shutil", "subprocess", "json", "hashlib", "re", "zipfile", "traceback", "parse_config", "bin2c", "resource_pack"]
+
+PROTOCOL = b"iplug-tools-1"
+EXIT_LINE = b"\niplug-tools-exit:"
+# written by the daemon, read by the iplug-tools client
+POINTER_PATH = os.path.join(workspacepath, ".iplug-tools-daemon")
+DEFAULT_IDLE_TIMEOUT = 30 * 60
+REQUEST_TIMEOUT = 10
+
+def tool_paths():
+  """The folders with the tooling modules the scripts import (parse_config, tracing, ...)."""
+  return [scriptpath, os.path.join(workspacepath, "iPlug2", "Scripts")]
+
+def find_script(command, cwd):
+  """(script path, folder to run it in) for a command run from cwd."""
+  if command not in COMMANDS:
+    print("error: unknown command " + command + " (" + ", ".join(sorted(COMMANDS)) + ")")
+    sys.exit(2)
+
+  # build phases run in <project>/projects, the scripts expect to run one level below the project
+  project = cwd
+  while not os.path.isfile(os.path.join(project, "config.h")):
+    parent = os.path.dirname(project)
+    if parent == project:
+      print("error: " + cwd + " is not inside a project (no config.h found)")
+      sys.exit(2)
+    project = parent
+
+  script = os.path.join(project, "scripts", COMMANDS[command])
+  rundir = cwd if os.path.dirname(cwd) == project else os.path.join(project, "scripts")
+  return script, rundir
+
+def run_script(script, args):
+  """Import a script and call its main() with args, returning its exit code."""
+  # loaded by hand rather than with runpy or importlib.util, whose imports cost more than the rest of a typical
+  # build phase. the compiled code is cached in __pycache__
+  import types
+  from importlib.machinery import SourceFileLoader
+  name = os.path.splitext(os.path.basename(script))[0].replace("-", "_")
+  code = SourceFileLoader(name, script).get_code(name)
+  module = types.ModuleType(name)
+  module.__file__ = script
+  sys.modules[name] = module
+  sys.argv = [script] + args
+  try:
+    exec(code, module.__dict__)
+    module.main()
+  except SystemExit as e:
+    if e.code is None or isinstance(e.code, int):
+      return e.code or 0
+    print(e.code, file=sys.stderr)
+    return 1
+  return 0
+
+def run_local(command, args):
+  script, rundir = find_script(command, os.getcwd())
+  sys.path[:0] = tool_paths()
+  os.chdir(rundir)
+  return run_script(script, args)
+
+class ConfigCache(object):
+  """Memoizes parse_config() by config.h path, size and mtime. Filled in the daemon before each fork."""
+
+  def __init__(self, parse):
+    self.parse = parse
+    self.entries = {}
+
+  def __call__(self, projectpath, *args, **kwargs):
+    import copy
+    if args or kwargs:
+      return self.parse(projectpath, *args, **kwargs)
+    path = os.path.realpath(os.path.join(projectpath, "config.h"))
+    try:
+      st = os.stat(path)
+    except OSError:
+      return self.parse(projectpath)
+    key = (st.st_mtime_ns, st.st_size)
+    entry = self.entries.get(path)
+    if not entry or entry[0] != key:
+      entry = (key, self.parse(projectpath))
+      self.entries[path] = entry
+    # callers modify the dict they get
+    return copy.deepcopy(entry[1])
+
+def parse_request(data):
+  """(cwd, args, env) from the fields of a request, or None if data doesn't hold all of them yet."""
+  fields = data.split(b"\0")[:-1]
+  if fields and fields[0] != PROTOCOL:
+    raise ValueError("not an iplug-tools request")
+  if len(fields) < 3:
+    return None
+  argc = int(fields[2])
+  if len(fields) < 4 + argc:
+    return None
+  envc = int(fields[3 + argc])
+  if len(fields) < 4 + argc + envc:
+    return None
+
+  def decode(field):
+    return field.decode("utf-8", "surrogateescape")
+  args = [decode(f) for f in fields[3:3 + argc]]
+  env = dict(decode(f).partition("=")[::2] for f in fields[4 + argc:4 + argc + envc])
+  if not args:
+    raise ValueError("no command")
+  return decode(fields[1]), args, env
+
+def read_request(conn):
+  conn.settimeout(REQUEST_TIMEOUT)
+  data = b""
+  while True:
+    request = parse_request(data)
+    if request:
+      return request
+    chunk = conn.recv(65536)
+    if not chunk:
+      raise ValueError("incomplete request")
+    data += chunk
+
+def handle(conn, request):
+  """Run a request in the forked child, with its output going to conn. Returns the exit code."""
+  import atexit, importlib, signal, traceback
+  cwd, args, env = request
+  signal.signal(signal.SIGTERM, signal.SIG_DFL)
+  # the request was read with a timeout, which made the socket non-blocking
+  conn.setblocking(True)
+  os.dup2(conn.fileno(), 1)
+  os.dup2(conn.fileno(), 2)
+  conn.close()
+  code = [1]
+
+  def send_exit_code():
+    sys.stdout.flush()
+    sys.stderr.flush()
+    os.write(1, EXIT_LINE + str(code[0]).encode() + b"\n")
+
+  # registered first, so it runs after everything the script registers (e.g. writing its trace)
+  atexit.register(send_exit_code)
+  try:
+    os.environ.clear()
+    os.environ.update(env)
+    # tracing reads IPLUG_TRACE when it is imported, re-import it with the client's environment
+    if "tracing" in sys.modules:
+      importlib.reload(sys.modules["tracing"])
+    script, rundir = find_script(args[0], cwd)
+    os.chdir(rundir)
+    code[0] = run_script(script, args[1:])
+  except SystemExit as e:
+    code[0] = e.code if isinstance(e.code, int) else 1
+  except BaseException:
+    traceback.print_exc()
+  return code[0]
+
+def serve(idle_timeout):
+  import gc, importlib, shutil, signal, socket, tempfile
+
+  # requests bring their own environment, a trace of the daemon itself would be mixed into theirs
+  os.environ.pop("IPLUG_TRACE", None)
+  sys.path[:0] = tool_paths()
+  for name in PRELOAD:
+    try:
+      importlib.import_module(name)
+    except ImportError:
+      pass
+
+  cache = None
+  if "parse_config" in sys.modules:
+    module = sys.modules["parse_config"]
+    cache = module.parse_config = ConfigCache(module.parse_config)
+
+  # only this user can reach a socket in a folder made by mkdtemp (mode 0700)
+  folder = tempfile.mkdtemp(prefix="iplug-tools-")
+  path = os.path.join(folder, "daemon.sock")
+  server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+  server.bind(path)
+  server.listen(16)
+  server.settimeout(idle_timeout)
+  with open(os.path.join(folder, "daemon.pid"), "w") as f:
+    f.write(str(os.getpid()))
+  temp_path = POINTER_PATH + "." + str(os.getpid()) + ".tmp"
+  with open(temp_path, "w") as f:
+    f.write(path + "\n")
+  os.replace(temp_path, POINTER_PATH)
+
+  # keep the preloaded objects out of the children's collections, so they stay shared with the daemon
+  gc.freeze()
+  daemon_pid = os.getpid()
+  signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+  try:
+    while True:
+      try:
+        conn, _ = server.accept()
+      except socket.timeout:
+        break
+      try:
+        request = read_request(conn)
+      except (ValueError, OSError):
+        conn.close()
+        continue
+      # warm the config cache in the daemon, so later requests find it parsed
+      if cache:
+        try:
+          script, rundir = find_script(request[1][0], request[0])
+          cache(os.path.dirname(os.path.dirname(script)))
+        except (Exception, SystemExit):
+          # the request's own run reports it
+          pass
+
+      if os.fork() == 0:
+        server.close()
+        # leave through the interpreter, so what the script registered with atexit runs
+        sys.exit(handle(conn, request))
+      conn.close()
+      try:
+        while os.waitpid(-1, os.WNOHANG)[0]:
+          pass
+      except ChildProcessError:
+        pass
+  finally:
+    # the forked children pass through here on their way out too
+    if os.getpid() == daemon_pid:
+      server.close()
+      if read_pointer() == path:
+        os.remove(POINTER_PATH)
+      shutil.rmtree(folder, ignore_errors=True)
+
+def read_pointer():
+  try:
+    with open(POINTER_PATH) as f:
+      return f.read().strip()
+  except OSError:
+    return None
+
+def daemon_running():
+  import socket
+  path = read_pointer()
+  if not path:
+    return False
+  sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+  try:
+    sock.connect(path)
+    return True
+  except OSError:
+    return False
+  finally:
+    sock.close()
+
+def daemon(args):
+  import argparse
+  parser = argparse.ArgumentParser(prog="iplug_tools.py daemon", description="Control the resident tooling daemon.")
+  parser.add_argument("action", choices=["start", "stop", "status", "run"])
+  parser.add_argument("--idle-timeout", type=float, default=DEFAULT_IDLE_TIMEOUT, help="Exit after this many seconds without requests.")
+  args = parser.parse_args(args)
+
+  if args.action == "status":
+    print(("running: " + read_pointer()) if daemon_running() else "not running")
+  elif args.action == "stop":
+    if daemon_running():
+      import signal
+      with open(os.path.join(os.path.dirname(read_pointer()), "daemon.pid")) as f:
+        os.kill(int(f.read()), signal.SIGTERM)
+      print("stopped")
+    else:
+      print("not running")
+  elif args.action == "run":
+    serve(args.idle_timeout)
+  elif daemon_running():
+    print("already running: " + read_pointer())
+  else:
+    import subprocess, time
+    # detached, so it outlives the build phase that started it
+    subprocess.Popen([sys.executable, os.path.realpath(__file__), "daemon", "run", "--idle-timeout", str(args.idle_timeout)],
+      stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, start_new_session=True, cwd=workspacepath)
+    for _ in range(100):
+      if daemon_running():
+        break
+      time.sleep(0.05)
+    print(("started: " + read_pointer()) if daemon_running() else "failed to start")
+
+def bench_startup(args):
+  import argparse, shutil, subprocess, time
+  parser = argparse.ArgumentParser(prog="iplug_tools.py bench-startup", description="Time a command run directly, through iplug_tools.py and through iplug-tools.")
+  parser.add_argument("command", nargs="?", default="update-version-mac")
+  parser.add_argument("args", nargs="*")
+  parser.add_argument("-n", "--runs", type=int, default=10)
+  args = parser.parse_args(args)
+
+  script, rundir = find_script(args.command, os.getcwd())
+  env = dict(os.environ)
+  env.pop("IPLUG_TRACE", None)
+  client = os.path.join(scriptpath, "iplug-tools")
+  variants = [
+    ("direct", [sys.executable, script] + args.args, dict(env)),
+    ("iplug_tools.py", [sys.executable, os.path.realpath(__file__), args.command] + args.args, dict(env)),
+  ]
+  if daemon_running() and shutil.which("nc"):
+    variants.append(("iplug-tools + daemon", [client, args.command] + args.args, dict(env)))
+  else:
+    print("(no daemon running or no nc, start one with: iplug_tools.py daemon start)")
+
+  print("%-26s %10s %10s" % ("", "mean ms", "min ms"))
+  for name, cmd, variant_env in variants:
+    times = []
+    for _ in range(args.runs):
+      start = time.perf_counter()
+      result = subprocess.run(cmd, cwd=rundir, env=variant_env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+      times.append((time.perf_counter() - start) * 1000)
+      if result.returncode != 0:
+        print("error: " + " ".join(cmd) + " failed with exit code " + str(result.returncode))
+        return 1
+    print("%-26s %10.1f %10.1f" % (name, sum(times) / len(times), min(times)))
+  return 0
+
+def main():
+  if len(sys.argv) < 2 or sys.argv[1] in ("-h", "--help"):
+    print("usage: iplug_tools.py <command> [args] | daemon start|stop|status | bench-startup [command] [-n runs]")
+    print("commands: " + ", ".join(sorted(COMMANDS)))
+    sys.exit(0 if len(sys.argv) >= 2 else 2)
+
+  command, args = sys.argv[1], sys.argv[2:]
+  if command == "daemon":
+    daemon(args)
+  elif command == "bench-startup":
+    sys.exit(bench_startup(args))
+  else:
+    sys.exit(run_local(command, args))
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+
+# renders a project's icons from one master image: every size listed in each
+# Images.xcassets/*.appiconset/Contents.json, the Windows .ico and the macOS .icns.
+# sizes are rendered in parallel and cached by (master hash, size), so regenerating
+# the icons of many projects sharing a master only renders each size once.
+# outputs are only rewritten when their content changes.
+#
+# requires Pillow (pip install Pillow)
+#
+# USAGE:
+# make_icons.py master.png --project TemplateProject
+# make_icons.py master.png [--appiconset DIR ...] [--ico PATH] [--icns PATH]
+
+import argparse, concurrent.futures, glob, hashlib, io, json, os, struct, sys
+
+import tracing
+
+DEFAULT_CACHE = os.path.join(os.environ.get("XDG_CACHE_HOME", os.path.expanduser("~/.cache")), "iplug2", "icons")
+
+# the images in a Windows .ico, largest first. sizes below 256 are stored as 32-bit bitmaps for older tools
+ICO_SIZES = [256, 48, 32, 24, 16]
+
+# .icns element types and their pixel sizes. PNG elements, plus the RLE RGB + 8-bit mask pairs older macOS versions use
+ICNS_PNG_TYPES = [(b"ic11", 32), (b"ic12", 64), (b"ic07", 128), (b"ic13", 256), (b"ic08", 256), (b"ic14", 512), (b"ic09", 512), (b"ic10", 1024)]
+ICNS_RLE_TYPES = [(b"is32", b"s8mk", 16), (b"il32", b"l8mk", 32)]
+
+def import_pil():
+  try:
+    from PIL import Image
+    return Image
+  except ImportError:
+    print("error: make_icons.py needs Pillow, install it with: pip install Pillow")
+    sys.exit(1)
+
+def sha256(data):
+  return hashlib.sha256(data).hexdigest()
+
+class Renderer(object):
+  """Renders PNG bytes of the master at a pixel size, cached on disk by master hash and size."""
+
+  def __init__(self, master_path, cache_dir=DEFAULT_CACHE):
+    self.Image = import_pil()
+    with open(master_path, "rb") as f:
+      self.master_data = f.read()
+    self.master = self.Image.open(io.BytesIO(self.master_data)).convert("RGBA")
+    if self.master.width != self.master.height:
+      print("error: " + master_path + " is " + str(self.master.width) + "x" + str(self.master.height) + ", the master image must be square")
+      sys.exit(1)
+    self.cache_dir = os.path.join(cache_dir, sha256(self.master_data)) if cache_dir else None
+    self.rendered = 0
+
+  def png(self, size):
+    cache_path = os.path.join(self.cache_dir, str(size) + ".png") if self.cache_dir else None
+    if cache_path and os.path.exists(cache_path):
+      with open(cache_path, "rb") as f:
+        return f.read()
+
+    with tracing.span("render", "file", size=size) as span:
+      image = self.master if size == self.master.width else self.master.resize((size, size), self.Image.LANCZOS)
+      out = io.BytesIO()
+      image.save(out, "PNG", optimize=True)
+      data = out.getvalue()
+      span.wrote(len(data))
+    self.rendered += 1
+
+    if cache_path:
+      os.makedirs(self.cache_dir, exist_ok=True)
+      temp_path = cache_path + "." + str(os.getpid()) + ".tmp"
+      with open(temp_path, "wb") as f:
+        f.write(data)
+      os.replace(temp_path, cache_path)
+    return data
+
+  def rgba(self, png):
+    return self.Image.open(io.BytesIO(png)).convert("RGBA")
+
+  def render_all(self, sizes, jobs=None):
+    """Render sizes in parallel (Pillow releases the GIL while resampling and compressing). Returns {size: png bytes}."""
+    sizes = sorted(set(sizes))
+    with concurrent.futures.ThreadPoolExecutor(max_workers=jobs) as pool:
+      return dict(zip(sizes, pool.map(self.png, sizes)))
+
+def appiconset_images(appiconset):
+  """The images of an appiconset as (entry, pixel size). Entries without a filename are given one."""
+  with open(os.path.join(appiconset, "Contents.json"), "r", encoding="utf-8") as f:
+    contents = json.load(f)
+  images = []
+  for index, entry in enumerate(contents["images"]):
+    if "size" not in entry:
+      continue
+    points = float(entry["size"].split("x")[0])
+    scale = int(entry.get("scale", "1x").rstrip("x"))
+    if "filename" not in entry:
+      # filename first, the way Xcode orders the keys
+      entry = contents["images"][index] = dict([("filename", "icon_" + entry["size"] + "@" + str(scale) + "x.png")] + list(entry.items()))
+    images.append((entry, int(round(points * scale))))
+  return contents, images
+
+def write_if_changed(path, data):
+  """Write data to path unless it already holds exactly that. Returns True if the file was written."""
+  if os.path.exists(path) and os.path.getsize(path) == len(data):
+    with open(path, "rb") as f:
+      if f.read() == data:
+        return False
+  with tracing.span("write", "file", file=os.path.basename(path)) as span:
+    with open(path, "wb") as f:
+      f.write(data)
+    span.wrote(len(data))
+  return True
+
+def bmp_entry(image):
+  """A 32-bit BGRA DIB as stored in .ico files: BITMAPINFOHEADER with doubled height, bottom-up rows, then the AND mask."""
+  width, height = image.size
+  header = struct.pack("<IiiHHIIiiII", 40, width, height * 2, 1, 32, 0, 0, 0, 0, 0, 0)
+  pixels = image.tobytes("raw", "BGRA", 0, -1)
+  # the alpha channel carries transparency, so the AND mask is all zeros (rows padded to 32 bits)
+  mask = bytes(((width + 31) // 32) * 4 * height)
+  return header + pixels + mask
+
+def ico_data(renderer, pngs):
+  entries = []
+  for size in ICO_SIZES:
+    data = pngs[size] if size >= 256 else bmp_entry(renderer.rgba(pngs[size]))
+    entries.append((size, data))
+
+  offset = 6 + 16 * len(entries)
+  directory = struct.pack("<HHH", 0, 1, len(entries))
+  for size, data in entries:
+    # a width/height of 0 means 256
+    directory += struct.pack("<BBBBHHII", size % 256, size % 256, 0, 0, 1, 32, len(data), offset)
+    offset += len(data)
+  return directory + b"".join(data for _, data in entries)
+
+def icns_rle(channel):
+  """PackBits-style run length encoding used by the is32/il32 elements, for one colour channel."""
+  out = bytearray()
+  i = 0
+  n = len(channel)
+  while i < n:
+    run = 1
+    while i + run < n and run < 130 and channel[i + run] == channel[i]:
+      run += 1
+    if run >= 3:
+      out += bytes((run + 125, channel[i]))
+      i += run
+      continue
+    start = i
+    while i < n and i - start < 128:
+      if i + 2 < n and channel[i] == channel[i + 1] == channel[i + 2]:
+        break
+      i += 1
+    out.append(i - start - 1)
+    out += channel[start:i]
+  return bytes(out)
+
+def icns_data(renderer, pngs):
+  elements = []
+  for rgb_type, mask_type, size in ICNS_RLE_TYPES:
+    image = renderer.rgba(pngs[size])
+    r, g, b, a = (band.tobytes() for band in image.split())
+    elements.append((rgb_type, icns_rle(r) + icns_rle(g) + icns_rle(b)))
+    elements.append((mask_type, a))
+  for png_type, size in ICNS_PNG_TYPES:
+    elements.append((png_type, pngs[size]))
+
+  toc = b"".join(struct.pack(">4sI", t, len(d) + 8) for t, d in elements)
+  elements.insert(0, (b"TOC ", toc))
+  body = b"".join(struct.pack(">4sI", t, len(d) + 8) + d for t, d in elements)
+  return struct.pack(">4sI", b"icns", len(body) + 8) + body
+
+def icon_sizes(appiconsets, ico, icns):
+  sizes = set()
+  for appiconset in appiconsets:
+    sizes.update(size for _, size in appiconset_images(appiconset)[1])
+  if ico:
+    sizes.update(ICO_SIZES)
+  if icns:
+    sizes.update(size for _, _, size in ICNS_RLE_TYPES)
+    sizes.update(size for _, size in ICNS_PNG_TYPES)
+  return sizes
+
+def make_icons(master, appiconsets=(), ico=None, icns=None, cache_dir=DEFAULT_CACHE, jobs=None):
+  """Render every icon for the given targets from master. Returns the list of files that changed."""
+  renderer = Renderer(master, cache_dir)
+  with tracing.span("render sizes"):
+    pngs = renderer.render_all(icon_sizes(appiconsets, ico, icns), jobs)
+  tracing.debug("rendered " + str(renderer.rendered) + " of " + str(len(pngs)) + " sizes, the rest were cached")
+
+  changed = []
+  for appiconset in appiconsets:
+    contents_path = os.path.join(appiconset, "Contents.json")
+    with open(contents_path, "r", encoding="utf-8") as f:
+      original = f.read()
+    contents, images = appiconset_images(appiconset)
+    for entry, size in images:
+      path = os.path.join(appiconset, entry["filename"])
+      if write_if_changed(path, pngs[size]):
+        changed.append(path)
+    # keep the file's own formatting, Xcode writes two spaces and '"key" : value', other tools tabs
+    indent = "\t" if "\n\t" in original else 2
+    separator = " : " if '" : ' in original else ": "
+    text = json.dumps(contents, indent=indent, separators=(",", separator), ensure_ascii=False) + "\n"
+    if text.strip() != original.strip() and write_if_changed(contents_path, text.encode("utf-8")):
+      changed.append(contents_path)
+
+  if ico and write_if_changed(ico, ico_data(renderer, pngs)):
+    changed.append(ico)
+  if icns and write_if_changed(icns, icns_data(renderer, pngs)):
+    changed.append(icns)
+  return changed
+
+def project_targets(project):
+  """The appiconsets, .ico and .icns of an iPlug2 project folder."""
+  name = os.path.basename(os.path.normpath(project))
+  resources = os.path.join(project, "resources")
+  appiconsets = sorted(glob.glob(os.path.join(resources, "Images.xcassets", "*.appiconset")))
+  return appiconsets, os.path.join(resources, name + ".ico"), os.path.join(resources, name + ".icns")
+
+def main():
+  parser = argparse.ArgumentParser(description="Render appiconsets, .ico and .icns files from one master image.")
+  parser.add_argument("master", help="Master image, square and ideally at least 1024x1024.")
+  parser.add_argument("--project", help="Project folder, renders all of its appiconsets, resources/<project>.ico and .icns.")
+  parser.add_argument("--appiconset", action="append", default=[], help="An .appiconset folder to render (repeatable).")
+  parser.add_argument("--ico", help="Windows .ico file to write.")
+  parser.add_argument("--icns", help="macOS .icns file to write.")
+  parser.add_argument("--no-cache", action="store_true", help="Render every size, don't use or fill the cache.")
+  parser.add_argument("-j", "--jobs", type=int, default=None, help="Number of sizes rendered in parallel.")
+  args = parser.parse_args()
+
+  appiconsets, ico, icns = list(args.appiconset), args.ico, args.icns
+  if args.project:
+    project_appiconsets, project_ico, project_icns = project_targets(args.project)
+    appiconsets += project_appiconsets
+    ico = ico or project_ico
+    icns = icns or project_icns
+
+  if not (appiconsets or ico or icns):
+    print("error: nothing to do, pass --project or at least one of --appiconset, --ico and --icns")
+    sys.exit(1)
+
+  changed = make_icons(args.master, appiconsets, ico, icns, None if args.no_cache else DEFAULT_CACHE, args.jobs)
+  for path in changed:
+    print("wrote " + path)
+  if not changed:
+    print("icons are up to date")
+
+if __name__ == '__main__':
+  main()
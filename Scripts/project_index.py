@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+
+# an index of the iPlug2 projects in a workspace: every folder with a config.h defining PLUG_NAME.
+# the parsed config.h values are cached in <root>/.iplug-project-index.json and re-parsed only when
+# a config.h's mtime or size changes. lookups by name, unique ID and manufacturer ID are dict lookups.
+#
+# USAGE:
+# project_index.py [root]                dump the index as JSON
+# project_index.py [root] --check        report projects sharing a PLUG_UNIQUE_ID (exit code 1 if any)
+# project_index.py [root] --unique-id    print a PLUG_UNIQUE_ID no project uses
+
+import argparse, json, os, random, re, string, sys
+
+INDEX_VERSION = 1
+CACHE_NAME = ".iplug-project-index.json"
+DEFAULT_DEPTH = 3
+# folders that never contain projects of the workspace (iPlug2 itself ships many examples)
+SKIP_DIRS = ("iPlug2", "node_modules", "__pycache__")
+
+DEFINE_RE = re.compile(r"^\s*#define\s+(\w+)[ \t]+(.*?)\s*$", re.MULTILINE)
+QUOTED_RE = re.compile(r"""^("(?:[^"\\]|\\.)*"|'(?:[^'\\]|\\.)*')""")
+
+def parse_value(value):
+  quoted = QUOTED_RE.match(value)
+  if quoted:
+    return quoted.group(1)[1:-1]
+  value = value.split("//")[0].strip()
+  try:
+    return int(value, 0)
+  except ValueError:
+    return value
+
+def parse_defines(text):
+  """Every #define in a config.h's text, string and character literals without their quotes, numbers as ints."""
+  return dict((name, parse_value(value)) for name, value in DEFINE_RE.findall(text))
+
+def parse_config_defines(path):
+  with open(path, "r", encoding="utf-8", errors="replace") as f:
+    return parse_defines(f.read())
+
+def random_id(chars=string.ascii_letters + string.digits):
+  return "".join(random.choice(chars) for _ in range(4))
+
+class ProjectIndex(object):
+  """The projects under root, with their config.h values."""
+
+  def __init__(self, root, depth=DEFAULT_DEPTH, use_cache=True):
+    self.root = os.path.abspath(root)
+    self.depth = depth
+    self.cache_path = os.path.join(self.root, CACHE_NAME)
+    self.parsed = 0
+    self.projects = {}
+    self.dirty = False
+    self.refresh(self.load_cache() if use_cache else {})
+
+  def load_cache(self):
+    try:
+      with open(self.cache_path, "r", encoding="utf-8") as f:
+        cache = json.load(f)
+      if cache.get("version") == INDEX_VERSION:
+        return cache["projects"]
+    except (OSError, ValueError, KeyError):
+      pass
+    return {}
+
+  def save(self):
+    """Write the cache, if anything was re-parsed since it was loaded."""
+    if not self.dirty:
+      return
+    temp_path = self.cache_path + "." + str(os.getpid()) + ".tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+      json.dump({"version": INDEX_VERSION, "projects": self.projects}, f, indent=1, sort_keys=True)
+    os.replace(temp_path, self.cache_path)
+    self.dirty = False
+
+  def find_project_dirs(self):
+    found = []
+    def walk(path, depth):
+      try:
+        entries = list(os.scandir(path))
+      except OSError:
+        return
+      if path != self.root and any(e.name == "config.h" and e.is_file() for e in entries):
+        found.append(path)
+        # projects don't nest
+        return
+      if depth == 0:
+        return
+      for e in entries:
+        if e.is_dir(follow_symlinks=False) and not e.name.startswith(".") and not e.name.startswith("build-") and e.name not in SKIP_DIRS:
+          walk(e.path, depth - 1)
+    walk(self.root, self.depth)
+    return found
+
+  def refresh(self, cached=None):
+    """Rescan the folders, re-parsing only config.h files that changed."""
+    cached = self.projects if cached is None else cached
+    projects = {}
+    for path in self.find_project_dirs():
+      relpath = os.path.relpath(path, self.root).replace(os.sep, "/")
+      config_path = os.path.join(path, "config.h")
+      st = os.stat(config_path)
+      entry = cached.get(relpath)
+      if not entry or entry["mtime_ns"] != st.st_mtime_ns or entry["size"] != st.st_size:
+        config = parse_config_defines(config_path)
+        if "PLUG_NAME" not in config:
+          continue
+        entry = {"mtime_ns": st.st_mtime_ns, "size": st.st_size, "config": config}
+        self.parsed += 1
+        self.dirty = True
+      projects[relpath] = entry
+    if set(projects) != set(cached):
+      self.dirty = True
+    self.projects = projects
+    self.build_lookups()
+
+  def build_lookups(self):
+    self.by_name = {}
+    self.by_unique_id = {}
+    self.by_mfr_id = {}
+    for relpath, entry in sorted(self.projects.items()):
+      config = entry["config"]
+      self.by_name[os.path.basename(relpath)] = relpath
+      uid, mfr = config.get("PLUG_UNIQUE_ID"), config.get("PLUG_MFR_ID")
+      self.by_unique_id.setdefault(uid, []).append(relpath)
+      self.by_mfr_id.setdefault(mfr, []).append(relpath)
+
+  def get(self, name):
+    """config.h values of the project in folder name, or None."""
+    relpath = self.by_name.get(name)
+    return self.projects[relpath]["config"] if relpath else None
+
+  def unique_id_in_use(self, uid):
+    return uid in self.by_unique_id
+
+  def projects_with_mfr_id(self, mfr_id):
+    return list(self.by_mfr_id.get(mfr_id, []))
+
+  def duplicate_unique_ids(self):
+    return dict((uid, paths) for uid, paths in self.by_unique_id.items() if len(paths) > 1)
+
+  def new_unique_id(self, generate=random_id, attempts=10000):
+    """A PLUG_UNIQUE_ID not used by any project in the index."""
+    for _ in range(attempts):
+      uid = generate()
+      if not self.unique_id_in_use(uid):
+        return uid
+    raise RuntimeError("could not find an unused unique ID")
+
+  def as_dict(self):
+    return {"root": self.root, "projects": dict((relpath, entry["config"]) for relpath, entry in self.projects.items())}
+
+def main():
+  parser = argparse.ArgumentParser(description="Index the iPlug2 projects in a workspace.")
+  parser.add_argument("root", nargs="?", default=os.getcwd(), help="Workspace folder (default: the current folder).")
+  parser.add_argument("--depth", type=int, default=DEFAULT_DEPTH, help="How many folder levels to search for projects.")
+  parser.add_argument("--refresh", action="store_true", help="Re-parse every config.h, ignoring the cache.")
+  parser.add_argument("--check", action="store_true", help="Report projects sharing a PLUG_UNIQUE_ID.")
+  parser.add_argument("--unique-id", action="store_true", help="Print an unused PLUG_UNIQUE_ID.")
+  args = parser.parse_args()
+
+  index = ProjectIndex(args.root, args.depth, use_cache=not args.refresh)
+  index.save()
+
+  if args.unique_id:
+    print(index.new_unique_id())
+  elif args.check:
+    duplicates = index.duplicate_unique_ids()
+    for uid, paths in sorted(duplicates.items()):
+      print("error: PLUG_UNIQUE_ID '" + str(uid) + "' is used by " + ", ".join(paths))
+    if duplicates:
+      sys.exit(1)
+    print("ok: " + str(len(index.projects)) + " projects, no duplicate unique IDs")
+  else:
+    json.dump(index.as_dict(), sys.stdout, indent=2, sort_keys=True)
+    sys.stdout.write("\n")
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,504 @@
+#!/usr/bin/env python3
+
+# binary delta patches between two releases' distribution folders (e.g. build-win/out of the previous and
+# the new version), so updates only download what changed. every file is diffed against the file with the
+# same name in the old release (version numbers in names are ignored), and zip archives are diffed member
+# by member, as their compressed bytes change completely when anything in them does.
+#
+# patches are made with xdelta3 (VCDIFF) if it is installed, otherwise with a built-in copy/add encoding
+# compressed with lzma. the built-in encoding scans the new file a byte at a time in Python (about a second
+# per MB that doesn't match), so files over DELTA_MAX_SIZE need xdelta3 and are only compressed without it.
+# files are diffed in parallel, one process per core. zip members are extracted to temporary files, files
+# are memory mapped and patches streamed, and the built-in encoding's index of the old file is kept to
+# MAX_BLOCKS block hashes, so large files (PDBs) aren't read into memory.
+#
+# USAGE:
+# release_delta.py create <old dir> <new dir> -o <patch dir>    write patches and delta-manifest.json
+# release_delta.py apply <old dir> <patch dir> -o <new dir>     rebuild the new release, checking every hash
+#                                                               of the old files before and of the new files after
+#
+# a zip archive is only diffed by member when it can be rebuilt byte for byte from its members and the
+# header fields recorded in the manifest (checked when the patches are made, e.g. archives written by
+# makezip-win.py). other archives are diffed as a whole. rebuilt archives are checked against their hash.
+
+import argparse, concurrent.futures, contextlib, hashlib, json, lzma, mmap, os, re, shutil, struct, subprocess, sys, tempfile, zipfile, zlib
+
+MANIFEST_NAME = "delta-manifest.json"
+MANIFEST_VERSION = 2
+MAGIC = b"IPD1"
+CHUNK_SIZE = 1 << 20
+# old files are indexed in blocks of at least this size, more for large files to bound memory use
+MIN_BLOCK_SIZE = 32
+MAX_BLOCKS = 1 << 16
+# larger files are only diffed with xdelta3, the built-in delta is too slow for them
+DELTA_MAX_SIZE = 4 << 20
+VERSION_PATTERN = re.compile(r"-v\d+\.\d+\.\d+")
+# deflate levels tried when matching a zip member's compressed bytes, zipfile's default first
+DEFLATE_LEVELS = [zlib.Z_DEFAULT_COMPRESSION, 9, 1]
+# ZipInfo fields recorded in the manifest to rebuild archives as they were
+ZIPINFO_FIELDS = ["compress_type", "create_system", "create_version", "extract_version", "reserved", "flag_bits",
+  "volume", "internal_attr", "external_attr", "CRC", "compress_size", "file_size"]
+
+def file_sha256(path):
+  """(sha256, size) of a file."""
+  h = hashlib.sha256()
+  size = 0
+  with open(path, "rb") as f:
+    for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+      h.update(chunk)
+      size += len(chunk)
+  return h.hexdigest(), size
+
+def find_xdelta3():
+  return shutil.which("xdelta3")
+
+def release_key(name):
+  """A file's name with the version number taken out, used to pair files between releases."""
+  return VERSION_PATTERN.sub("-v*", name)
+
+def entry_name(ref):
+  return ref[0] + ("/" + ref[1] if ref[1] else "")
+
+def list_files(directory):
+  """Paths of the files in a distribution folder, relative to it."""
+  paths = []
+  for root, dirs, files in os.walk(directory):
+    dirs.sort()
+    for name in sorted(files):
+      paths.append(os.path.relpath(os.path.join(root, name), directory).replace(os.sep, "/"))
+  return paths
+
+def list_entries(directory, whole=()):
+  """(key, (file, member)) for every file in a distribution folder, with zip archives (except those in whole)
+  expanded to their members."""
+  entries = []
+  for relpath in list_files(directory):
+    if relpath.endswith(".zip") and relpath not in whole:
+      with zipfile.ZipFile(os.path.join(directory, *relpath.split("/"))) as zf:
+        for info in zf.infolist():
+          if not info.is_dir():
+            entries.append((release_key(relpath) + "/" + info.filename, (relpath, info.filename)))
+    else:
+      entries.append((release_key(relpath), (relpath, None)))
+  return entries
+
+def extract_members(path, members, staging):
+  """Extract members of the zip at path to numbered files in staging (runs in a worker process). Returns {member: path}."""
+  os.makedirs(staging, exist_ok=True)
+  paths = {}
+  with zipfile.ZipFile(path) as zf:
+    for i, member in enumerate(members):
+      paths[member] = os.path.join(staging, "%05d" % i)
+      with zf.open(member) as f, open(paths[member], "wb") as out:
+        shutil.copyfileobj(f, out, CHUNK_SIZE)
+  return paths
+
+def stage_entries(directory, refs, staging, pool):
+  """{(file, member): path} for refs, with zip members extracted below staging."""
+  paths = {}
+  archives = {}
+  for relpath, member in refs:
+    if member is None:
+      paths[(relpath, None)] = os.path.join(directory, *relpath.split("/"))
+    else:
+      archives.setdefault(relpath, []).append(member)
+
+  futures = dict((relpath, pool.submit(extract_members, os.path.join(directory, *relpath.split("/")), sorted(members),
+    os.path.join(staging, "%05d" % i))) for i, (relpath, members) in enumerate(sorted(archives.items())))
+  for relpath, future in futures.items():
+    for member, path in future.result().items():
+      paths[(relpath, member)] = path
+  return paths
+
+@contextlib.contextmanager
+def mapped(path):
+  """A file's bytes, memory mapped."""
+  with open(path, "rb") as f:
+    if os.fstat(f.fileno()).st_size == 0:
+      yield b""
+      return
+    with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+      yield m
+
+# built-in copy/add delta. the patch is MAGIC followed by an lzma stream of operations:
+# b"C" + <u64 offset> + <u64 length> copies from the old file, b"A" + <u64 length> + bytes adds new data.
+
+def match_length(old, o, new, n, limit):
+  """Length of the common run of old[o:] and new[n:], up to limit."""
+  length = 0
+  for step in (4096, 256, 16, 1):
+    while length + step <= limit and old[o + length:o + length + step] == new[n + length:n + length + step]:
+      length += step
+  return length
+
+def make_delta(old, new, out):
+  """Write a patch turning old into new (bytes-like, e.g. mapped files) to the file object out."""
+  block = max(MIN_BLOCK_SIZE, len(old) // MAX_BLOCKS)
+  # keyed on the blocks' hashes rather than their bytes, a hit is checked against old
+  index = {}
+  for i in range(0, len(old) - block + 1, block):
+    index.setdefault(hash(old[i:i + block]), i)
+
+  out.write(MAGIC)
+  compressor = lzma.LZMACompressor()
+
+  def add(start, end):
+    if end > start:
+      out.write(compressor.compress(b"A" + struct.pack("<Q", end - start)))
+      for pos in range(start, end, CHUNK_SIZE):
+        out.write(compressor.compress(new[pos:min(end, pos + CHUNK_SIZE)]))
+
+  pending = p = 0
+  while p + block <= len(new):
+    data = new[p:p + block]
+    o = index.get(hash(data))
+    if o is None or old[o:o + block] != data:
+      p += 1
+      continue
+    # the match may start before the block that found it
+    back = 0
+    while back < p - pending and back < o and old[o - back - 1] == new[p - back - 1]:
+      back += 1
+    length = block + match_length(old, o + block, new, p + block, min(len(old) - o, len(new) - p) - block)
+    add(pending, p - back)
+    out.write(compressor.compress(b"C" + struct.pack("<QQ", o - back, length + back)))
+    p = pending = p + length
+  add(pending, len(new))
+  out.write(compressor.flush())
+
+def apply_delta(old, patch, out):
+  """Apply a patch read from the file object patch to old (bytes-like), writing the result to out."""
+  if patch.read(len(MAGIC)) != MAGIC:
+    raise ValueError("not a delta patch")
+  with lzma.LZMAFile(patch) as ops:
+    while True:
+      op = ops.read(1)
+      if not op:
+        return
+      if op == b"C":
+        offset, length = struct.unpack("<QQ", ops.read(16))
+        if offset + length > len(old):
+          raise ValueError("corrupt delta patch")
+        for pos in range(offset, offset + length, CHUNK_SIZE):
+          out.write(old[pos:min(offset + length, pos + CHUNK_SIZE)])
+      elif op == b"A":
+        length, = struct.unpack("<Q", ops.read(8))
+        while length:
+          data = ops.read(min(length, CHUNK_SIZE))
+          if not data:
+            raise ValueError("corrupt delta patch")
+          out.write(data)
+          length -= len(data)
+      else:
+        raise ValueError("corrupt delta patch")
+
+def write_patch(method, old_path, new_path, patch_path):
+  if method == "full":
+    with open(new_path, "rb") as f, lzma.open(patch_path, "wb") as out:
+      shutil.copyfileobj(f, out, CHUNK_SIZE)
+  elif method == "xdelta3":
+    subprocess.run(["xdelta3", "-e", "-9", "-f", "-s", old_path, new_path, patch_path], check=True)
+  else:
+    with mapped(old_path) as old, mapped(new_path) as new, open(patch_path, "wb") as out:
+      make_delta(old, new, out)
+
+def create_patch(old_path, old_ref, new_path, new_ref, patch_path, method):
+  """Diff one file (runs in a worker process). Returns its manifest entry."""
+  digest, size = file_sha256(new_path)
+  entry = {"file": new_ref[0], "member": new_ref[1], "sha256": digest, "size": size}
+
+  if old_path:
+    entry.update({"source": old_ref[0], "source_member": old_ref[1], "source_sha256": file_sha256(old_path)[0]})
+    if entry["source_sha256"] == entry["sha256"]:
+      entry["method"] = "same"
+      return entry
+
+  candidates = ["full"]
+  if old_path and (method != "delta" or size <= DELTA_MAX_SIZE):
+    candidates.insert(0, method)
+
+  # a delta against a very different file can be larger than the compressed file itself
+  best = None
+  for name in candidates:
+    path = patch_path + "." + name
+    write_patch(name, old_path, new_path, path)
+    patch_size = os.path.getsize(path)
+    if not best or patch_size < best[1]:
+      if best:
+        os.remove(patch_path + "." + best[0])
+      best = (name, patch_size)
+    else:
+      os.remove(path)
+    if patch_size < size // 4:
+      break
+
+  entry["method"], entry["patch_size"] = best
+  os.replace(patch_path + "." + best[0], patch_path)
+  entry["patch"] = os.path.basename(patch_path)
+  return entry
+
+# zip archives
+
+class Slice(object):
+  """Read-only file object for length bytes of f from offset (a member's data in a zip)."""
+
+  def __init__(self, f, offset, length):
+    self.f = f
+    self.offset = offset
+    self.length = length
+    self.pos = 0
+
+  def seek(self, pos):
+    self.pos = pos
+
+  def read(self, n=-1):
+    n = self.length - self.pos if n < 0 else min(n, self.length - self.pos)
+    self.f.seek(self.offset + self.pos)
+    data = self.f.read(n)
+    self.pos += len(data)
+    return data
+
+  def close(self):
+    pass
+
+def data_offset(f, info):
+  """Where a member's data starts, after its local header."""
+  f.seek(info.header_offset)
+  name_length, extra_length = struct.unpack_from("<HH", f.read(30), 26)
+  return info.header_offset + 30 + name_length + extra_length
+
+def find_level(path, raw):
+  """The deflate level that compresses the file at path to exactly the bytes in raw, or None."""
+  for level in DEFLATE_LEVELS:
+    raw.seek(0)
+    compressor = zlib.compressobj(level, zlib.DEFLATED, -15)
+    with open(path, "rb") as f:
+      # stops at the first difference, so a wrong level costs little
+      for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+        data = compressor.compress(chunk)
+        if raw.read(len(data)) != data:
+          break
+      else:
+        data = compressor.flush()
+        if raw.read(len(data)) == data and not raw.read(1):
+          return level
+  return None
+
+def zip_info(fields):
+  zinfo = zipfile.ZipInfo(fields["name"], tuple(fields["date_time"]))
+  for name in ZIPINFO_FIELDS:
+    setattr(zinfo, name, fields[name])
+  zinfo.extra = bytes.fromhex(fields["extra"])
+  zinfo.comment = bytes.fromhex(fields["comment"])
+  # the level ZipFile.open() deflates the member at (compress_level from Python 3.13, _compresslevel before)
+  setattr(zinfo, "compress_level" if hasattr(zinfo, "compress_level") else "_compresslevel", fields["level"])
+  return zinfo
+
+def write_archive(f, layout, member_paths):
+  """Write a zip with the recorded layout to the file f, compressing each member from its extracted file in
+  member_paths ({member: path})."""
+  with zipfile.ZipFile(f, "w") as zf:
+    for fields in layout["members"]:
+      with open(member_paths.get(fields["name"], os.devnull), "rb") as data, zf.open(zip_info(fields), "w") as out:
+        shutil.copyfileobj(data, out, CHUNK_SIZE)
+    zf.comment = bytes.fromhex(layout["comment"])
+
+def rebuild_archive(target, layout, member_paths):
+  """Rebuild a zip from its extracted members and check it against the recorded hash (runs in a worker process)."""
+  temp_path = target + ".tmp"
+  try:
+    with open(temp_path, "wb") as f:
+      write_archive(f, layout, member_paths)
+    if file_sha256(temp_path) != (layout["sha256"], layout["size"]):
+      raise ValueError(os.path.basename(target) + ": rebuilt archive doesn't match")
+  except BaseException:
+    if os.path.exists(temp_path):
+      os.remove(temp_path)
+    raise
+  os.replace(temp_path, target)
+
+def archive_layout(path, member_paths, trial_path):
+  """The recorded layout of the zip at path, and whether rebuild_archive() rebuilds it byte for byte from
+  member_paths ({member: extracted file}), tried at trial_path. Runs in a worker process."""
+  digest, size = file_sha256(path)
+  members = []
+  exact = True
+  with zipfile.ZipFile(path) as zf, open(path, "rb") as f:
+    for info in zf.infolist():
+      level = None
+      if info.compress_type == zipfile.ZIP_DEFLATED:
+        raw = Slice(f, data_offset(f, info), info.compress_size)
+        level = find_level(member_paths.get(info.filename, os.devnull), raw)
+        exact = exact and level is not None
+      elif info.compress_type != zipfile.ZIP_STORED:
+        exact = False
+      fields = {"name": info.filename, "date_time": list(info.date_time), "level": level,
+        "extra": info.extra.hex(), "comment": info.comment.hex()}
+      fields.update((name, getattr(info, name)) for name in ZIPINFO_FIELDS)
+      members.append(fields)
+    layout = {"sha256": digest, "size": size, "comment": zf.comment.hex(), "members": members}
+
+  if exact:
+    # the levels reproduce each member's bytes, the rest of the archive (headers, order, flags) has to come
+    # out the same too
+    try:
+      rebuild_archive(trial_path, layout, member_paths)
+      os.remove(trial_path)
+    except (ValueError, zipfile.BadZipFile):
+      exact = False
+  return layout, exact
+
+def create(old_dir, new_dir, patch_dir, method=None, jobs=None):
+  method = method or ("xdelta3" if find_xdelta3() else "delta")
+  os.makedirs(os.path.join(patch_dir, "patches"), exist_ok=True)
+
+  with tempfile.TemporaryDirectory(dir=patch_dir, prefix=".delta-") as staging, concurrent.futures.ProcessPoolExecutor(max_workers=jobs) as pool:
+    new_paths = stage_entries(new_dir, [ref for _, ref in list_entries(new_dir)], os.path.join(staging, "new"), pool)
+
+    # archives that can't be rebuilt from their members are diffed as a whole
+    zips = [relpath for relpath in list_files(new_dir) if relpath.endswith(".zip")]
+    futures = dict((relpath, pool.submit(archive_layout, os.path.join(new_dir, *relpath.split("/")),
+      dict((member, path) for (r, member), path in new_paths.items() if r == relpath and member),
+      os.path.join(staging, "trial-%05d.zip" % i))) for i, relpath in enumerate(zips))
+    archives = {}
+    whole = set()
+    for relpath, future in futures.items():
+      layout, exact = future.result()
+      if exact:
+        archives[relpath] = layout
+      else:
+        whole.add(relpath)
+        new_paths[(relpath, None)] = os.path.join(new_dir, *relpath.split("/"))
+
+    new_entries = list_entries(new_dir, whole)
+    old_entries = list_entries(old_dir)
+    old_refs = dict(old_entries)
+    old_refs.update((release_key(relpath), (relpath, None)) for relpath in list_files(old_dir) if relpath.endswith(".zip"))
+    sources = dict((ref, old_refs.get(key)) for key, ref in new_entries)
+    old_paths = stage_entries(old_dir, set(ref for ref in sources.values() if ref), os.path.join(staging, "old"), pool)
+
+    futures = [pool.submit(create_patch, old_paths.get(sources[ref]), sources[ref], new_paths[ref], ref,
+      os.path.join(patch_dir, "patches", "%05d.patch" % i), method) for i, (key, ref) in enumerate(new_entries)]
+    files = [f.result() for f in futures]
+
+  kept = set(key for key, _ in new_entries)
+  whole_keys = set(release_key(relpath) for relpath in whole)
+  manifest = {
+    "version": MANIFEST_VERSION,
+    "files": files,
+    "archives": archives,
+    "removed": sorted(entry_name(ref) for key, ref in old_entries if key not in kept and release_key(ref[0]) not in whole_keys),
+  }
+
+  temp_path = os.path.join(patch_dir, MANIFEST_NAME + ".tmp")
+  with open(temp_path, "w", encoding="utf-8") as f:
+    json.dump(manifest, f, indent=2, sort_keys=True)
+    f.write("\n")
+  os.replace(temp_path, os.path.join(patch_dir, MANIFEST_NAME))
+  return manifest
+
+def apply_patch(old_path, patch_dir, entry, output_path):
+  """Rebuild one file (runs in a worker process), checking the old file's hash before and the result's after."""
+  name = entry_name((entry["file"], entry["member"]))
+  if "source" in entry and file_sha256(old_path)[0] != entry["source_sha256"]:
+    raise ValueError(name + ": the old release's file doesn't match the one the patch was made from")
+
+  if entry["method"] == "same":
+    shutil.copyfile(old_path, output_path)
+  else:
+    patch_path = os.path.join(patch_dir, "patches", entry["patch"])
+    if entry["method"] == "full":
+      with lzma.open(patch_path, "rb") as f, open(output_path, "wb") as out:
+        shutil.copyfileobj(f, out, CHUNK_SIZE)
+    elif entry["method"] == "xdelta3":
+      subprocess.run(["xdelta3", "-d", "-f", "-s", old_path, patch_path, output_path], check=True)
+    else:
+      with mapped(old_path) as old, open(patch_path, "rb") as patch, open(output_path, "wb") as out:
+        apply_delta(old, patch, out)
+
+  if file_sha256(output_path) != (entry["sha256"], entry["size"]):
+    raise ValueError(name + ": patched file doesn't match")
+
+def apply(old_dir, patch_dir, output_dir, jobs=None):
+  with open(os.path.join(patch_dir, MANIFEST_NAME), "r", encoding="utf-8") as f:
+    manifest = json.load(f)
+  if manifest.get("version") != MANIFEST_VERSION:
+    raise ValueError(MANIFEST_NAME + " has version " + str(manifest.get("version")) + ", expected " + str(MANIFEST_VERSION))
+  files = manifest["files"]
+
+  os.makedirs(output_dir, exist_ok=True)
+  staging = tempfile.mkdtemp(dir=output_dir, prefix=".delta-")
+  try:
+    with concurrent.futures.ProcessPoolExecutor(max_workers=jobs) as pool:
+      sources = set((entry["source"], entry["source_member"]) for entry in files if "source" in entry)
+      old_paths = stage_entries(old_dir, sources, os.path.join(staging, "old"), pool)
+
+      staged = [os.path.join(staging, "%05d" % i) for i in range(len(files))]
+      futures = [pool.submit(apply_patch, old_paths.get((entry.get("source"), entry.get("source_member"))), patch_dir, entry, path)
+        for entry, path in zip(files, staged)]
+      for future in futures:
+        future.result()
+
+      members = {}
+      for entry, path in zip(files, staged):
+        if entry["member"] is None:
+          target = os.path.join(output_dir, *entry["file"].split("/"))
+          os.makedirs(os.path.dirname(target), exist_ok=True)
+          os.replace(path, target)
+        else:
+          members.setdefault(entry["file"], {})[entry["member"]] = path
+
+      futures = []
+      for relpath, layout in manifest["archives"].items():
+        target = os.path.join(output_dir, *relpath.split("/"))
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        futures.append(pool.submit(rebuild_archive, target, layout, members.get(relpath, {})))
+      for future in futures:
+        future.result()
+  finally:
+    shutil.rmtree(staging)
+  return manifest
+
+def main():
+  parser = argparse.ArgumentParser(description="Create and apply binary delta patches between two releases.")
+  parser.add_argument("-j", "--jobs", type=int, help="Number of worker processes (default: one per core).")
+  sub = parser.add_subparsers(dest="command", required=True)
+
+  creator = sub.add_parser("create", help="Diff the new release against the old one.")
+  creator.add_argument("old")
+  creator.add_argument("new")
+  creator.add_argument("-o", "--output", required=True, help="Folder for the patches and manifest.")
+  creator.add_argument("--method", choices=("xdelta3", "delta"), help="Patch format (default: xdelta3 if installed, otherwise the built-in delta, which only diffs files up to 4 MB).")
+
+  applier = sub.add_parser("apply", help="Rebuild the new release from the old one and the patches.")
+  applier.add_argument("old")
+  applier.add_argument("patches")
+  applier.add_argument("-o", "--output", required=True, help="Folder to write the new release to.")
+
+  args = parser.parse_args()
+
+  if args.command == "create":
+    if args.method == "xdelta3" and not find_xdelta3():
+      print("error: xdelta3 not found")
+      sys.exit(1)
+    method = args.method or ("xdelta3" if find_xdelta3() else "delta")
+    manifest = create(args.old, args.new, args.output, method, args.jobs)
+    size = sum(f["size"] for f in manifest["files"])
+    patched = sum(f.get("patch_size", 0) for f in manifest["files"])
+    unchanged = sum(1 for f in manifest["files"] if f["method"] == "same")
+    whole = sum(1 for f in manifest["files"] if f["member"] is None and f["file"].endswith(".zip"))
+    print("%d files (%d unchanged, %d removed, %d archives diffed as a whole): %d bytes of patches for %d bytes of files (%.1f%%)" %
+      (len(manifest["files"]), unchanged, len(manifest["removed"]), whole, patched, size, 100. * patched / max(1, size)))
+    large = sum(1 for f in manifest["files"] if "source" in f and f["method"] == "full" and f["size"] > DELTA_MAX_SIZE)
+    if method == "delta" and large:
+      print("%d changed files over %d MB were compressed whole, install xdelta3 to diff them" % (large, DELTA_MAX_SIZE >> 20))
+  else:
+    try:
+      manifest = apply(args.old, args.patches, args.output, args.jobs)
+    except (ValueError, OSError, KeyError, lzma.LZMAError, subprocess.CalledProcessError) as e:
+      print("error: " + str(e))
+      sys.exit(1)
+    print("rebuilt " + str(len(manifest["files"])) + " files in " + args.output)
+
+if __name__ == '__main__':
+  main()
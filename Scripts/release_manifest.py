@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+
+# release manifests: SHA-256 of every distributed file (and of the files packed into each archive),
+# computed concurrently - hashlib releases the GIL, so threads hash at disk speed.
+# hashes are cached by (path, size, mtime_ns), so unchanged build artifacts aren't re-read.
+#
+# USAGE:
+# release_manifest.py create <dir> [-o manifest.json]    hash every file in dir
+# release_manifest.py verify <manifest.json> [dir]        check dir against a manifest
+
+import argparse, concurrent.futures, datetime, hashlib, json, os, sys, threading
+
+MANIFEST_VERSION = 1
+CHUNK_SIZE = 1 << 20
+DEFAULT_JOBS = min(32, (os.cpu_count() or 1) * 2)
+DEFAULT_CACHE = os.path.join(os.environ.get("XDG_CACHE_HOME", os.path.expanduser("~/.cache")), "iplug2", "release-hashes.json")
+
+def sha256_file(path):
+  h = hashlib.sha256()
+  buf = bytearray(CHUNK_SIZE)
+  view = memoryview(buf)
+  with open(path, "rb", buffering=0) as f:
+    while True:
+      n = f.readinto(buf)
+      if not n:
+        break
+      h.update(view[:n])
+  return h.hexdigest()
+
+class HashCache(object):
+  """sha256 digests keyed by absolute path, valid while size and mtime_ns are unchanged."""
+
+  def __init__(self, path=DEFAULT_CACHE):
+    self.path = path
+    self.lock = threading.Lock()
+    self.entries = {}
+    if path:
+      try:
+        with open(path, "r", encoding="utf-8") as f:
+          self.entries = json.load(f)
+      except (OSError, ValueError):
+        pass
+
+  def digest(self, path):
+    path = os.path.abspath(path)
+    st = os.stat(path)
+    cached = self.entries.get(path)
+    if cached and cached[0] == st.st_size and cached[1] == st.st_mtime_ns:
+      return cached[2], st.st_size
+    digest = sha256_file(path)
+    with self.lock:
+      self.entries[path] = [st.st_size, st.st_mtime_ns, digest]
+    return digest, st.st_size
+
+  def save(self):
+    if not self.path:
+      return
+    # drop entries for files that no longer exist
+    entries = dict((p, e) for p, e in self.entries.items() if os.path.exists(p))
+    os.makedirs(os.path.dirname(self.path), exist_ok=True)
+    temp_path = self.path + "." + str(os.getpid())
+    with open(temp_path, "w", encoding="utf-8") as f:
+      json.dump(entries, f)
+    os.replace(temp_path, self.path)
+
+def hash_files(paths, cache=None, jobs=DEFAULT_JOBS):
+  """Return {path: (sha256, size)} for paths, hashed concurrently."""
+  cache = cache or HashCache(None)
+  unique = sorted(set(paths))
+  with concurrent.futures.ThreadPoolExecutor(max_workers=jobs) as pool:
+    return dict(zip(unique, pool.map(cache.digest, unique)))
+
+def list_files(directory, exclude=()):
+  files = []
+  for root, dirs, names in os.walk(directory):
+    dirs[:] = sorted(d for d in dirs if d != ".git")
+    for name in sorted(names):
+      path = os.path.join(root, name)
+      if os.path.abspath(path) not in exclude:
+        files.append(path)
+  return files
+
+def relname(path, base):
+  return os.path.relpath(path, base).replace(os.sep, "/")
+
+def write_manifest(manifest_path, files, archives=None, sources_base=None, cache=None, jobs=DEFAULT_JOBS, digests=None):
+  """Hash files and the sources of each archive's members, and write a JSON manifest.
+
+  files are paths next to (or below) the manifest. archives maps an archive path to the
+  (source path, arcname) pairs that went into it. digests gives (sha256, size) for files
+  that are already hashed (or not on disk, e.g. streamed archives). Returns the manifest dict.
+  """
+  archives = archives or {}
+  known = digests or {}
+  base = os.path.dirname(os.path.abspath(manifest_path))
+  sources = [src for members in archives.values() for src, _ in members]
+  digests = hash_files([p for p in list(files) + list(archives) + sources if p not in known], cache, jobs)
+  digests.update(known)
+
+  manifest = {
+    "version": MANIFEST_VERSION,
+    "created": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+    "files": {},
+    "archives": {},
+  }
+
+  for path in sorted(set(files) | set(archives)):
+    digest, size = digests[path]
+    manifest["files"][relname(path, base)] = {"sha256": digest, "size": size}
+
+  for archive, members in sorted(archives.items()):
+    manifest["archives"][relname(archive, base)] = [
+      {"name": arcname.replace(os.sep, "/"), "source": relname(src, sources_base or base), "sha256": digests[src][0], "size": digests[src][1]}
+      for src, arcname in members]
+
+  temp_path = manifest_path + ".tmp"
+  with open(temp_path, "w", encoding="utf-8") as f:
+    json.dump(manifest, f, indent=2, sort_keys=True)
+    f.write("\n")
+  os.replace(temp_path, manifest_path)
+  return manifest
+
+def verify_tar_zst_members(archive_path, members):
+  """verify_members() for .tar.zst archives, which are read in one pass."""
+  import zstd_archive
+  expected = dict((m["name"], m["sha256"]) for m in members)
+  problems = []
+  try:
+    for info, f in zstd_archive.open_members(archive_path):
+      h = hashlib.sha256()
+      for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+        h.update(chunk)
+      if info.name in expected and h.hexdigest() != expected.pop(info.name):
+        problems.append(archive_path + ": member " + info.name + " does not match")
+  except RuntimeError as e:
+    return problems + [str(e)]
+  problems += [archive_path + ": missing member " + name for name in sorted(expected)]
+  return problems
+
+def verify_members(archive_path, members):
+  """Hash the members of a zip (or .tar.zst) archive as they are decompressed. Returns a list of problems."""
+  if archive_path.endswith(".tar.zst"):
+    return verify_tar_zst_members(archive_path, members)
+  import zipfile
+  problems = []
+  with zipfile.ZipFile(archive_path) as zf:
+    for member in members:
+      h = hashlib.sha256()
+      try:
+        with zf.open(member["name"]) as f:
+          for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            h.update(chunk)
+      except KeyError:
+        problems.append(archive_path + ": missing member " + member["name"])
+        continue
+      if h.hexdigest() != member["sha256"]:
+        problems.append(archive_path + ": member " + member["name"] + " does not match")
+  return problems
+
+def verify(manifest_path, directory=None, members=False, jobs=DEFAULT_JOBS):
+  """Check the files in directory against a manifest. Returns a list of problems (empty if everything matches)."""
+  with open(manifest_path, "r", encoding="utf-8") as f:
+    manifest = json.load(f)
+  directory = directory or os.path.dirname(os.path.abspath(manifest_path))
+
+  problems = []
+  expected = manifest["files"]
+  present = [n for n in expected if os.path.isfile(os.path.join(directory, n))]
+  problems += [n + ": missing" for n in sorted(set(expected) - set(present))]
+
+  # no cache here, verification always reads the bytes
+  digests = hash_files([os.path.join(directory, n) for n in present], None, jobs)
+  for name in sorted(present):
+    digest, size = digests[os.path.join(directory, name)]
+    if size != expected[name]["size"] or digest != expected[name]["sha256"]:
+      problems.append(name + ": checksum mismatch")
+
+  if members:
+    archives = [(os.path.join(directory, a), m) for a, m in manifest.get("archives", {}).items() if a in present and a.endswith((".zip", ".tar.zst"))]
+    with concurrent.futures.ThreadPoolExecutor(max_workers=jobs) as pool:
+      for result in pool.map(lambda a: verify_members(*a), archives):
+        problems += result
+
+  return problems
+
+def main():
+  parser = argparse.ArgumentParser(description="Create or verify SHA-256 release manifests.")
+  parser.add_argument("-j", "--jobs", type=int, default=DEFAULT_JOBS, help="Number of files hashed concurrently.")
+  sub = parser.add_subparsers(dest="command", required=True)
+
+  create = sub.add_parser("create", help="Hash every file in a directory.")
+  create.add_argument("directory")
+  create.add_argument("-o", "--output", help="Manifest path (default: <directory>/manifest.json).")
+  create.add_argument("--no-cache", action="store_true", help="Don't use or update the hash cache.")
+
+  check = sub.add_parser("verify", help="Check a directory against a manifest.")
+  check.add_argument("manifest")
+  check.add_argument("directory", nargs="?", help="Directory to check (default: the manifest's folder).")
+  check.add_argument("--members", action="store_true", help="Also decompress and check the members of zip and .tar.zst archives.")
+
+  args = parser.parse_args()
+
+  if args.command == "create":
+    output = args.output or os.path.join(args.directory, "manifest.json")
+    cache = HashCache(None if args.no_cache else DEFAULT_CACHE)
+    files = list_files(args.directory, exclude=(os.path.abspath(output),))
+    write_manifest(output, files, cache=cache, jobs=args.jobs)
+    cache.save()
+    print("wrote " + output + " (" + str(len(files)) + " files)")
+  else:
+    problems = verify(args.manifest, args.directory, args.members, args.jobs)
+    for problem in problems:
+      print("error: " + problem)
+    if problems:
+      sys.exit(1)
+    print("ok")
+
+if __name__ == '__main__':
+  main()
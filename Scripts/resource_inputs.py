@@ -0,0 +1,22 @@
+#!/usr/bin/env python3
+
+# the resource files a project hands to bin2c.py and resource_pack.py: the files of the given folders (not
+# recursed) and single files, keyed by file name, without hidden files and OS clutter
+
+import os
+
+IGNORED_FILES = (".DS_Store", "Thumbs.db", "desktop.ini")
+
+def collect_inputs(paths):
+  """{resource name: path} for the files in paths (folders are listed, not recursed)."""
+  inputs = {}
+  for path in paths:
+    files = [os.path.join(path, f) for f in sorted(os.listdir(path))] if os.path.isdir(path) else [path]
+    for f in files:
+      name = os.path.basename(f)
+      if not os.path.isfile(f) or name in IGNORED_FILES or name.startswith("."):
+        continue
+      if name in inputs:
+        raise ValueError("two resources named " + name + ": " + inputs[name] + " and " + f)
+      inputs[name] = f
+  return inputs
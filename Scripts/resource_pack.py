@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+
+# resource packs: every resource (pngs, ttfs, svgs etc) in one indexed file that a plugin can mmap,
+# instead of one file per resource in the bundle. TemplateProject/ResourcePack.h is the C++ reader,
+# ResourcePack below is the reference reader.
+#
+# layout, all integers little-endian:
+#   header   magic "IPLUGPAK", u32 version, u32 entry count, u32 page size, u32 alignment,
+#            u64 data offset, u64 file size                                                   (40 bytes)
+#   entries  u64 data offset, u64 size, u32 name offset, u32 name length - sorted by name bytes (24 bytes each)
+#   names    UTF-8, each followed by a NUL
+#   data     starts on a page boundary, each resource aligned to the alignment and followed by a NUL
+#
+# USAGE:
+# resource_pack.py pack <pack> <input file or folder> [...]
+# resource_pack.py list <pack>
+# resource_pack.py verify <pack> <input file or folder> [...]
+
+import argparse, mmap, os, struct, sys
+
+import tracing
+from resource_inputs import collect_inputs
+
+MAGIC = b"IPLUGPAK"
+VERSION = 1
+HEADER = struct.Struct("<8sIIIIQQ")
+ENTRY = struct.Struct("<QQII")
+DEFAULT_PAGE_SIZE = 16384  # the largest page size of the supported platforms (Apple silicon)
+DEFAULT_ALIGNMENT = 16
+
+def align(offset, alignment):
+  return (offset + alignment - 1) // alignment * alignment
+
+def pack_bytes(inputs, page_size=DEFAULT_PAGE_SIZE, alignment=DEFAULT_ALIGNMENT):
+  """Build a pack from {name: path}. Returns the pack's bytes."""
+  names = sorted(inputs, key=lambda n: n.encode("utf-8"))
+  encoded = [n.encode("utf-8") for n in names]
+
+  names_offset = HEADER.size + ENTRY.size * len(names)
+  name_offsets = []
+  offset = names_offset
+  for name in encoded:
+    name_offsets.append(offset)
+    offset += len(name) + 1
+  data_offset = align(offset, page_size)
+
+  entries = []
+  blobs = []
+  offset = data_offset
+  for name in names:
+    with open(inputs[name], "rb") as f:
+      data = f.read()
+    offset = align(offset, alignment)
+    entries.append((offset, len(data)))
+    blobs.append((offset, data))
+    # a NUL after each resource, so text resources can be used as C strings
+    offset += len(data) + 1
+  file_size = offset
+
+  out = bytearray(file_size)
+  HEADER.pack_into(out, 0, MAGIC, VERSION, len(names), page_size, alignment, data_offset, file_size)
+  for i, ((offset, size), name, name_offset) in enumerate(zip(entries, encoded, name_offsets)):
+    ENTRY.pack_into(out, HEADER.size + i * ENTRY.size, offset, size, name_offset, len(name))
+    out[name_offset:name_offset + len(name)] = name
+  for offset, data in blobs:
+    out[offset:offset + len(data)] = data
+  return bytes(out)
+
+def write_pack(path, paths, page_size=DEFAULT_PAGE_SIZE, alignment=DEFAULT_ALIGNMENT):
+  """Pack the files in paths (folders are listed, not recursed) into path. Returns False if path was already up to date."""
+  with tracing.span("pack resources", "file", file=os.path.basename(path)) as span:
+    data = pack_bytes(collect_inputs(paths), page_size, alignment)
+    span.wrote(len(data))
+
+  if os.path.exists(path) and os.path.getsize(path) == len(data):
+    with open(path, "rb") as f:
+      if f.read() == data:
+        return False
+
+  # replace rather than overwrite, a running plugin may have the old pack mapped
+  temp_path = path + "." + str(os.getpid()) + ".tmp"
+  with open(temp_path, "wb") as f:
+    f.write(data)
+  os.replace(temp_path, path)
+  return True
+
+class ResourcePack(object):
+  """Reference reader: maps a pack and returns zero-copy memoryviews of its resources."""
+
+  def __init__(self, path):
+    with open(path, "rb") as f:
+      self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    self.view = memoryview(self.map)
+    if len(self.map) < HEADER.size:
+      raise ValueError(path + " is not a resource pack")
+    magic, version, self.count, self.page_size, self.alignment, self.data_offset, file_size = HEADER.unpack_from(self.map, 0)
+    if magic != MAGIC or version != VERSION:
+      raise ValueError(path + " is not a version " + str(VERSION) + " resource pack")
+    if file_size != len(self.map) or HEADER.size + self.count * ENTRY.size > len(self.map):
+      raise ValueError(path + " is truncated")
+
+  def entry(self, index):
+    offset, size, name_offset, name_length = ENTRY.unpack_from(self.map, HEADER.size + index * ENTRY.size)
+    return bytes(self.view[name_offset:name_offset + name_length]), offset, size
+
+  def names(self):
+    return [self.entry(i)[0].decode("utf-8") for i in range(self.count)]
+
+  def get(self, name):
+    """The data of a resource as a memoryview into the mapping, or None."""
+    key = name.encode("utf-8")
+    lo, hi = 0, self.count
+    while lo < hi:
+      mid = (lo + hi) // 2
+      entry_name, offset, size = self.entry(mid)
+      if entry_name == key:
+        return self.view[offset:offset + size]
+      if entry_name < key:
+        lo = mid + 1
+      else:
+        hi = mid
+    return None
+
+  def close(self):
+    self.view.release()
+    self.map.close()
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, exc_type, exc, tb):
+    self.close()
+    return False
+
+def verify(path, paths):
+  """Check a pack holds exactly the files in paths. Returns a list of problems."""
+  inputs = collect_inputs(paths)
+  problems = []
+  with ResourcePack(path) as pack:
+    names = pack.names()
+    problems += [name + ": not in the pack" for name in sorted(set(inputs) - set(names))]
+    problems += [name + ": not an input" for name in sorted(set(names) - set(inputs))]
+    for name in sorted(set(inputs) & set(names)):
+      with open(inputs[name], "rb") as f:
+        data = pack.get(name)
+        if data != f.read():
+          problems.append(name + ": contents differ")
+        data.release()
+  return problems
+
+def main():
+  parser = argparse.ArgumentParser(description="Write, list or verify resource packs.")
+  sub = parser.add_subparsers(dest="command", required=True)
+  pack = sub.add_parser("pack", help="Pack resource files.")
+  pack.add_argument("pack")
+  pack.add_argument("inputs", nargs="+")
+  pack.add_argument("--page-size", type=int, default=DEFAULT_PAGE_SIZE)
+  pack.add_argument("--alignment", type=int, default=DEFAULT_ALIGNMENT)
+  listing = sub.add_parser("list", help="List the resources in a pack.")
+  listing.add_argument("pack")
+  check = sub.add_parser("verify", help="Check a pack against its input files.")
+  check.add_argument("pack")
+  check.add_argument("inputs", nargs="+")
+  args = parser.parse_args()
+
+  try:
+    if args.command == "pack":
+      written = write_pack(args.pack, [p for p in args.inputs if os.path.exists(p)], args.page_size, args.alignment)
+      print(("wrote " if written else "up to date: ") + args.pack)
+    elif args.command == "list":
+      with ResourcePack(args.pack) as pack:
+        for i in range(pack.count):
+          name, offset, size = pack.entry(i)
+          print("%10d %10d  %s" % (offset, size, name.decode("utf-8")))
+    else:
+      problems = verify(args.pack, [p for p in args.inputs if os.path.exists(p)])
+      for problem in problems:
+        print("error: " + problem)
+      if problems:
+        sys.exit(1)
+      print("ok")
+  except ValueError as e:
+    print("error: " + str(e))
+    sys.exit(1)
+
+if __name__ == '__main__':
+  main()
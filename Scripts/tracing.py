@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+
+# shared tracing and logging for the iPlug2OOS tooling scripts
+#
+# IPLUG_TRACE=trace.json   record spans (phase, file, bytes read/written, subprocess time) and append them to
+#                          trace.json in Chrome's JSON array trace format - open it in chrome://tracing or
+#                          https://ui.perfetto.dev. Several processes can append to the same file, so scripts
+#                          launched by other scripts end up in one trace. A summary table is printed to stderr
+#                          when each process exits.
+# IPLUG_VERBOSE=1          print per-file progress (off by default)
+
+# json, subprocess and threading are only imported when they are used, so scripts pay nothing for them
+# when tracing is off
+import atexit, os, sys, time
+
+TRACE_PATH = os.environ.get("IPLUG_TRACE")
+VERBOSE = os.environ.get("IPLUG_VERBOSE", "0") not in ("", "0")
+
+_events = []
+_lock = None
+_t0 = time.perf_counter()
+_epoch_us = time.time() * 1e6
+
+def enabled():
+  return bool(TRACE_PATH)
+
+def debug(msg):
+  """Per-file progress, only printed when IPLUG_VERBOSE is set."""
+  if VERBOSE:
+    print(msg)
+
+def info(msg):
+  print(msg)
+
+def _now_us():
+  # wall clock based, so events from different processes line up in one trace
+  return _epoch_us + (time.perf_counter() - _t0) * 1e6
+
+class Span(object):
+  def __init__(self, name, cat, args):
+    self.name = name
+    self.cat = cat
+    self.args = args
+
+  def read(self, nbytes):
+    self.args["bytes_read"] = self.args.get("bytes_read", 0) + nbytes
+
+  def wrote(self, nbytes):
+    self.args["bytes_written"] = self.args.get("bytes_written", 0) + nbytes
+
+  def __enter__(self):
+    self.start = _now_us()
+    return self
+
+  def __exit__(self, exc_type, exc, tb):
+    if exc_type is not None:
+      self.args["error"] = exc_type.__name__
+    event = {"name": self.name, "cat": self.cat, "ph": "X", "ts": self.start, "dur": _now_us() - self.start,
+      "pid": os.getpid(), "tid": threading.get_ident(), "args": self.args}
+    with _lock:
+      _events.append(event)
+    return False
+
+class _NullSpan(object):
+  args = {}
+
+  def read(self, nbytes):
+    pass
+
+  def wrote(self, nbytes):
+    pass
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, exc_type, exc, tb):
+    return False
+
+_NULL_SPAN = _NullSpan()
+
+def span(name, cat="phase", **args):
+  """Context manager timing a block. Use span.read()/span.wrote() to attribute bytes to it."""
+  if not TRACE_PATH:
+    return _NULL_SPAN
+  return Span(name, cat, args)
+
+def run(args, **kwargs):
+  """subprocess.run, recorded as a subprocess span."""
+  import subprocess
+  with span(os.path.basename(args[0]), "subprocess", command=" ".join(args)):
+    return subprocess.run(args, **kwargs)
+
+def system(command):
+  """os.system, recorded as a subprocess span."""
+  with span(command, "subprocess"):
+    return os.system(command)
+
+def summary(events):
+  rows = {}
+  for e in events:
+    key = (e["cat"], e["name"])
+    row = rows.setdefault(key, [0, 0.0, 0, 0])
+    row[0] += 1
+    row[1] += e["dur"] / 1000.0
+    row[2] += e["args"].get("bytes_read", 0)
+    row[3] += e["args"].get("bytes_written", 0)
+
+  lines = ["%-10s %-48s %6s %10s %12s %12s" % ("category", "span", "count", "total ms", "read", "written")]
+  for (cat, name), (count, ms, nread, nwritten) in sorted(rows.items(), key=lambda r: -r[1][1]):
+    lines.append("%-10s %-48s %6d %10.1f %12d %12d" % (cat, name[:48], count, ms, nread, nwritten))
+  return "\n".join(lines)
+
+def _write_trace():
+  if not _events:
+    return
+  import json
+  process = {"name": "process_name", "ph": "M", "pid": os.getpid(), "args": {"name": os.path.basename(sys.argv[0])}}
+  text = "".join(json.dumps(e) + ",\n" for e in [process] + _events)
+
+  with open(TRACE_PATH, "a", encoding="utf-8") as f:
+    try:
+      import fcntl
+      fcntl.flock(f, fcntl.LOCK_EX)
+    except ImportError:
+      pass
+    f.seek(0, os.SEEK_END)
+    # the JSON array trace format allows a missing closing bracket, so processes can just append
+    if f.tell() == 0:
+      f.write("[\n")
+    f.write(text)
+
+  sys.stderr.write("\ntrace summary for " + os.path.basename(sys.argv[0]) + " (" + TRACE_PATH + ")\n" + summary(_events) + "\n")
+
+if TRACE_PATH:
+  import threading
+  _lock = threading.Lock()
+  # child processes may run from another directory
+  TRACE_PATH = os.environ["IPLUG_TRACE"] = os.path.abspath(TRACE_PATH)
+  atexit.register(_write_trace)
@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+
+# packages a project's bitmaps for the web build in per-density chunks, replacing the two monolithic
+# imgs.data / imgs@2x.data preloads. images are split into 1x and 2x chunks of at most --max-chunk-size
+# bytes (1x images without an @2x version go into "any" chunks, needed at every density). writes:
+#
+#   <name>-<density>-<n>-<hash>.data   the chunks, named by content, so they can be cached forever
+#   <name>-manifest.json               which images each chunk holds, with offsets, sizes and SHA-256s
+#   scripts/<name>.js                  the loader, a drop-in for the file_packager output: before the module
+#                                      runs it fetches the chunks the screen's devicePixelRatio needs and adds
+#                                      them to the FS with the preload plugins, the other density is
+#                                      prefetched when the browser is idle after the first frame
+#
+# USAGE:
+# web_image_chunks.py <img folder> <output folder> [--name imgs] [--max-chunk-size bytes] [--fs-path /resources/img]
+
+import argparse, glob, hashlib, json, os, sys
+
+import tracing
+
+MANIFEST_VERSION = 1
+DEFAULT_MAX_CHUNK_SIZE = 512 << 10
+
+LOADER = """// generated by web_image_chunks.py, do not edit
+var Module = typeof Module !== 'undefined' ? Module : {};
+
+(function() {
+  var manifest = MANIFEST_PLACEHOLDER;
+  var density = (typeof window !== 'undefined' && window.devicePixelRatio > 1) ? '2x' : '1x';
+
+  function fetchChunk(chunk) {
+    return fetch(chunk.file).then(function(response) {
+      if (!response.ok) throw new Error(chunk.file + ': ' + response.status);
+      return response.arrayBuffer();
+    });
+  }
+
+  function install(chunk, buffer) {
+    var data = new Uint8Array(buffer);
+    chunk.images.forEach(function(image) {
+      Module['FS_createPreloadedFile'](manifest.path, image.name, data.subarray(image.offset, image.offset + image.size),
+        true, true, null, function() { console.error('NAME_PLACEHOLDER.js: could not load ' + image.name); }, false, false);
+    });
+  }
+
+  function load() {
+    var parent = '/';
+    manifest.path.split('/').filter(Boolean).forEach(function(part) {
+      Module['FS_createPath'](parent, part, true, true);
+      parent += part + '/';
+    });
+
+    var later = [];
+    manifest.chunks.forEach(function(chunk) {
+      if (chunk.density !== 'any' && chunk.density !== density) {
+        later.push(chunk);
+        return;
+      }
+      var dependency = 'NAME_PLACEHOLDER ' + chunk.file;
+      Module['addRunDependency'](dependency);
+      fetchChunk(chunk).then(function(buffer) {
+        install(chunk, buffer);
+        Module['removeRunDependency'](dependency);
+      }).catch(function(e) {
+        console.error('NAME_PLACEHOLDER.js: ' + e);
+        Module['removeRunDependency'](dependency);
+      });
+    });
+
+    // images for the other density, in case the window moves to another screen. fetched one chunk at a
+    // time once the module has drawn its first frame and the browser is idle
+    function prefetch() {
+      var chunk = later.shift();
+      if (!chunk) return;
+      fetchChunk(chunk).then(function(buffer) { install(chunk, buffer); }).catch(function() {}).then(idle);
+    }
+    function idle() {
+      if (later.length === 0) return;
+      if (typeof requestIdleCallback !== 'undefined') requestIdleCallback(prefetch);
+      else setTimeout(prefetch, 200);
+    }
+    Module['postRun'] = Module['postRun'] || [];
+    Module['postRun'].push(function() {
+      if (typeof requestAnimationFrame !== 'undefined') requestAnimationFrame(function() { setTimeout(idle, 0); });
+      else idle();
+    });
+  }
+
+  if (Module['calledRun']) load();
+  else (Module['preRun'] = Module['preRun'] || []).push(load);
+})();
+"""
+
+def sha256(data):
+  return hashlib.sha256(data).hexdigest()
+
+def image_densities(folder):
+  """{density: [paths]} for the images in folder (everything but SVGs). 1x images without an @2x version are
+  needed at any density."""
+  names = sorted(n for n in os.listdir(folder) if os.path.isfile(os.path.join(folder, n)) and not n.endswith(".svg") and n != ".DS_Store")
+  retina = set(n for n in names if os.path.splitext(n)[0].endswith("@2x"))
+  densities = {"any": [], "1x": [], "2x": []}
+  for name in names:
+    stem, ext = os.path.splitext(name)
+    if name in retina:
+      densities["2x"].append(os.path.join(folder, name))
+    elif stem + "@2x" + ext in retina:
+      densities["1x"].append(os.path.join(folder, name))
+    else:
+      densities["any"].append(os.path.join(folder, name))
+  return densities
+
+def split_chunks(paths, max_size):
+  """Group paths, in order, into lists totalling at most max_size bytes (a larger image gets a chunk to itself)."""
+  chunks = []
+  size = 0
+  for path in paths:
+    file_size = os.path.getsize(path)
+    if not chunks or size + file_size > max_size:
+      chunks.append([])
+      size = 0
+    chunks[-1].append(path)
+    size += file_size
+  return chunks
+
+def package(folder, output, name="imgs", max_chunk_size=DEFAULT_MAX_CHUNK_SIZE, fs_path="/resources/img"):
+  """Write the chunks, manifest and loader for the images in folder. Returns the manifest."""
+  # chunks of an earlier build have other names, remove them so they aren't deployed
+  for old in glob.glob(os.path.join(output, glob.escape(name) + "-*.data")):
+    os.remove(old)
+
+  manifest = {"version": MANIFEST_VERSION, "path": fs_path, "chunks": []}
+  for density, paths in image_densities(folder).items():
+    for index, chunk_paths in enumerate(split_chunks(paths, max_chunk_size)):
+      data = bytearray()
+      images = []
+      for path in chunk_paths:
+        with open(path, "rb") as f:
+          image = f.read()
+        images.append({"name": os.path.basename(path), "offset": len(data), "size": len(image), "sha256": sha256(image)})
+        data += image
+
+      digest = sha256(data)
+      file = name + "-" + density + "-" + str(index) + "-" + digest[:12] + ".data"
+      with tracing.span("write chunk", "file", file=file) as span:
+        with open(os.path.join(output, file), "wb") as f:
+          f.write(data)
+        span.wrote(len(data))
+      manifest["chunks"].append({"file": file, "density": density, "size": len(data), "sha256": digest, "images": images})
+      tracing.debug(file + ": " + ", ".join(i["name"] for i in images))
+
+  with open(os.path.join(output, name + "-manifest.json"), "w", encoding="utf-8") as f:
+    json.dump(manifest, f, indent=2)
+    f.write("\n")
+
+  # the loader only needs what it fetches and where it goes
+  runtime = {"path": fs_path, "chunks": [dict((k, c[k]) for k in ("file", "density")) for c in manifest["chunks"]]}
+  for chunk, source in zip(runtime["chunks"], manifest["chunks"]):
+    chunk["images"] = [dict((k, i[k]) for k in ("name", "offset", "size")) for i in source["images"]]
+  loader = LOADER.replace("MANIFEST_PLACEHOLDER", json.dumps(runtime, separators=(",", ":"))).replace("NAME_PLACEHOLDER", name)
+  os.makedirs(os.path.join(output, "scripts"), exist_ok=True)
+  with open(os.path.join(output, "scripts", name + ".js"), "w", encoding="utf-8") as f:
+    f.write(loader)
+
+  return manifest
+
+def main():
+  parser = argparse.ArgumentParser(description="Package images for the web build in per-density, size-bounded chunks.")
+  parser.add_argument("folder", help="Folder with the images (e.g. resources/img).")
+  parser.add_argument("output", help="Web build folder (e.g. build-web-wasm).")
+  parser.add_argument("--name", default="imgs", help="Base name of the chunks, manifest and loader script.")
+  parser.add_argument("--max-chunk-size", type=int, default=DEFAULT_MAX_CHUNK_SIZE, help="Maximum chunk size in bytes.")
+  parser.add_argument("--fs-path", default="/resources/img", help="Folder the images are added to in the module's FS.")
+  args = parser.parse_args()
+
+  if not os.path.isdir(args.folder):
+    print("error: " + args.folder + " is not a folder")
+    sys.exit(1)
+
+  manifest = package(args.folder, args.output, args.name, args.max_chunk_size, args.fs_path)
+  for density in ("any", "1x", "2x"):
+    chunks = [c for c in manifest["chunks"] if c["density"] == density]
+    if chunks:
+      print(density + ": " + str(sum(len(c["images"]) for c in chunks)) + " images in " + str(len(chunks)) + " chunks, " +
+        str(sum(c["size"] for c in chunks)) + " bytes")
+
+if __name__ == '__main__':
+  main()
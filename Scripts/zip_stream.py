@@ -0,0 +1,339 @@
+#!/usr/bin/env python3
+
+# send zip archives to a pipe or socket while they are being written, so an upload or a copy to a mirror
+# overlaps compression instead of waiting for the finished file. zipfile writes to streams that can't seek
+# (members whose size isn't known up front get a data descriptor after their data).
+#
+# writes go through a bounded queue to a sender thread: the writer blocks when the receiver falls behind
+# (back-pressure), and memory use stays bounded. several archives can follow each other on one stream,
+# each preceded by a line with its name.
+#
+# destinations (and sources for receive): "-" (stdout/stdin), "tcp:host:port", or a path (file or named pipe)
+#
+# USAGE:
+# zip_stream.py receive <source> [-o dir]    reassemble the archives in a stream into dir, checking every
+#                                            member's CRC and size and the central directory as they arrive
+
+import argparse, hashlib, os, queue, socket, struct, sys, threading, zlib
+
+CHUNK_SIZE = 1 << 20
+DEFAULT_BUFFER_SIZE = 64 << 20
+HEADER = b"IPLUG-ZIP "
+
+def parse_address(dest):
+  host, _, port = dest[len("tcp:"):].rpartition(":")
+  return host, int(port)
+
+class Sink(object):
+  """Raw bytes to a destination."""
+
+  def __init__(self, dest):
+    self.sock = self.file = None
+    if dest == "-":
+      # the real stdout, even when sys.stdout has been pointed elsewhere for messages
+      self.file = sys.__stdout__.buffer
+    elif dest.startswith("tcp:"):
+      self.sock = socket.create_connection(parse_address(dest))
+    else:
+      self.file = open(dest, "wb")
+
+  def write(self, data):
+    if self.sock:
+      self.sock.sendall(data)
+    else:
+      self.file.write(data)
+
+  def close(self):
+    if self.sock:
+      self.sock.shutdown(socket.SHUT_WR)
+      self.sock.close()
+    elif self.file is sys.__stdout__.buffer:
+      self.file.flush()
+    else:
+      self.file.close()
+
+class Sender(object):
+  """Sends what is written to a destination from a background thread, buffering at most buffer_size bytes."""
+
+  def __init__(self, dest, buffer_size=DEFAULT_BUFFER_SIZE):
+    self.sink = Sink(dest)
+    self.queue = queue.Queue(max(1, buffer_size // CHUNK_SIZE))
+    self.pending = bytearray()
+    self.error = None
+    self.thread = threading.Thread(target=self.run, name="zip_stream sender", daemon=True)
+    self.thread.start()
+
+  def run(self):
+    while True:
+      chunk = self.queue.get()
+      if chunk is None:
+        return
+      if self.error:
+        # keep draining, so a writer blocked on the full queue wakes up and sees the error
+        continue
+      try:
+        self.sink.write(chunk)
+      except OSError as e:
+        self.error = e
+
+  def write(self, data):
+    if self.error:
+      raise self.error
+    self.pending += data
+    while len(self.pending) >= CHUNK_SIZE:
+      self.queue.put(bytes(self.pending[:CHUNK_SIZE]))
+      del self.pending[:CHUNK_SIZE]
+    return len(data)
+
+  def flush(self):
+    if self.pending:
+      self.queue.put(bytes(self.pending))
+      self.pending = bytearray()
+
+  def archive(self, name):
+    """A file object for the next archive on the stream."""
+    self.write(HEADER + name.encode("utf-8") + b"\n")
+    return ArchiveStream(self)
+
+  def close(self):
+    self.flush()
+    self.queue.put(None)
+    self.thread.join()
+    self.sink.close()
+    if self.error:
+      raise self.error
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, exc_type, exc, tb):
+    self.close()
+
+class ArchiveStream(object):
+  """Write-only, unseekable file object for one archive, hashing what goes through it (for release manifests)."""
+
+  def __init__(self, sender):
+    self.sender = sender
+    self.sha256 = hashlib.sha256()
+    self.size = 0
+
+  def write(self, data):
+    self.sha256.update(data)
+    self.size += len(data)
+    return self.sender.write(data)
+
+  def flush(self):
+    self.sender.flush()
+
+  def digest(self):
+    return self.sha256.hexdigest(), self.size
+
+# receiving
+
+class Reader(object):
+  """Exact reads from a stream, with everything read also written to out and hashed."""
+
+  def __init__(self, stream):
+    self.stream = stream
+    self.buffer = b""
+    self.out = None
+    self.sha256 = hashlib.sha256()
+
+  def fill(self, n):
+    while len(self.buffer) < n:
+      data = self.stream.read(max(CHUNK_SIZE, n - len(self.buffer)))
+      if not data:
+        return False
+      self.buffer += data
+    return True
+
+  def take(self, n):
+    data = self.buffer[:n]
+    self.buffer = self.buffer[n:]
+    if self.out:
+      self.out.write(data)
+      self.sha256.update(data)
+    return data
+
+  def read(self, n):
+    if not self.fill(n):
+      raise ValueError("stream ended in the middle of an archive")
+    return self.take(n)
+
+  def peek(self):
+    """Up to CHUNK_SIZE bytes without consuming them, call take() with how many were used."""
+    if not self.buffer and not self.fill(1):
+      raise ValueError("stream ended in the middle of an archive")
+    return self.buffer[:CHUNK_SIZE]
+
+  def readline(self):
+    while b"\n" not in self.buffer:
+      data = self.stream.read(CHUNK_SIZE)
+      if not data:
+        if self.buffer:
+          raise ValueError("stream ended in the middle of a header")
+        return None
+      self.buffer += data
+    line, _, self.buffer = self.buffer.partition(b"\n")
+    return line
+
+def zip64_sizes(extra, usize, csize):
+  """Sizes from a zip64 extra field, for the ones the header set to 0xFFFFFFFF."""
+  pos = 0
+  while pos + 4 <= len(extra):
+    tag, size = struct.unpack_from("<HH", extra, pos)
+    if tag == 1:
+      values = list(struct.unpack_from("<" + "Q" * (size // 8), extra, pos + 4))
+      if usize == 0xFFFFFFFF:
+        usize = values.pop(0)
+      if csize == 0xFFFFFFFF and values:
+        csize = values.pop(0)
+      return usize, csize, True
+    pos += 4 + size
+  return usize, csize, False
+
+def read_member(reader):
+  """Read one member after its local header signature, checking its CRC and size. Returns (name, size)."""
+  _, flags, method, _, _, crc, csize, usize, nlen, xlen = struct.unpack("<HHHHHIIIHH", reader.read(26))
+  name = reader.read(nlen).decode("utf-8" if flags & 0x800 else "cp437")
+  usize, csize, zip64 = zip64_sizes(reader.read(xlen), usize, csize)
+  descriptor = flags & 0x08
+
+  if method not in (0, 8):
+    raise ValueError(name + ": unsupported compression method " + str(method))
+  if method == 0 and descriptor:
+    raise ValueError(name + ": stored member with a data descriptor can't be streamed")
+
+  actual_crc = actual_size = 0
+  decompressor = zlib.decompressobj(-15) if method == 8 else None
+  remaining = None if descriptor else csize
+  while remaining is None or remaining > 0:
+    if remaining is None:
+      # the deflate stream ends by itself, which is the only way to find the end of a member with a descriptor
+      data = reader.peek()
+      output = decompressor.decompress(data)
+      reader.take(len(data) - len(decompressor.unused_data))
+      data = output
+    else:
+      data = reader.read(min(remaining, CHUNK_SIZE))
+      remaining -= len(data)
+      if decompressor:
+        if decompressor.eof:
+          raise ValueError(name + ": compressed data is longer than its size")
+        data = decompressor.decompress(data)
+    actual_crc = zlib.crc32(data, actual_crc)
+    actual_size += len(data)
+    if remaining is None and decompressor.eof:
+      break
+
+  if decompressor and not decompressor.eof:
+    raise ValueError(name + ": compressed data is truncated")
+
+  if descriptor:
+    head = reader.read(4)
+    if head == b"PK\x07\x08":
+      head = reader.read(4)
+    crc, = struct.unpack("<I", head)
+    csize, usize = struct.unpack("<QQ" if zip64 else "<II", reader.read(16 if zip64 else 8))
+
+  if actual_crc != crc or actual_size != usize:
+    raise ValueError(name + ": CRC or size mismatch")
+  return name, usize
+
+def read_archive(reader, path):
+  """Reassemble one archive from reader into path. Returns (members, sha256, size)."""
+  temp_path = path + ".tmp"
+  members = []
+  entries = 0
+  try:
+    with open(temp_path, "wb") as out:
+      reader.out = out
+      reader.sha256 = hashlib.sha256()
+      while True:
+        signature = reader.read(4)
+        if signature == b"PK\x03\x04":
+          members.append(read_member(reader))
+        elif signature == b"PK\x01\x02":
+          lengths = struct.unpack_from("<HHH", reader.read(42), 24)
+          reader.read(sum(lengths))
+          entries += 1
+        elif signature == b"PK\x06\x06":
+          size, = struct.unpack("<Q", reader.read(8))
+          reader.read(size)
+        elif signature == b"PK\x06\x07":
+          reader.read(16)
+        elif signature == b"PK\x05\x06":
+          comment_length, = struct.unpack_from("<H", reader.read(18), 16)
+          reader.read(comment_length)
+          break
+        else:
+          raise ValueError("unexpected data in the archive")
+      size = out.tell()
+    if entries != len(members):
+      raise ValueError(os.path.basename(path) + ": central directory lists " + str(entries) + " members, " + str(len(members)) + " were sent")
+  except BaseException:
+    os.remove(temp_path)
+    raise
+  finally:
+    reader.out = None
+
+  os.replace(temp_path, path)
+  return members, reader.sha256.hexdigest(), size
+
+def check_name(name):
+  if os.path.basename(name) != name or name in ("", ".", ".."):
+    raise ValueError("invalid archive name " + name)
+  return name
+
+def receive_stream(stream, directory):
+  """Reassemble every archive in a stream into directory. Returns [(name, members, sha256, size)]."""
+  reader = Reader(stream)
+  received = []
+  while True:
+    line = reader.readline()
+    if line is None:
+      return received
+    if not line.startswith(HEADER):
+      raise ValueError("not an archive stream")
+    name = check_name(line[len(HEADER):].decode("utf-8"))
+    received.append((name,) + read_archive(reader, os.path.join(directory, name)))
+
+def receive(source, directory, report=print):
+  os.makedirs(directory, exist_ok=True)
+
+  def handle(stream):
+    for name, members, digest, size in receive_stream(stream, directory):
+      report("received " + name + ": " + str(len(members)) + " members, " + str(size) + " bytes, sha256 " + digest)
+
+  if source == "-":
+    handle(sys.stdin.buffer)
+  elif source.startswith("tcp:"):
+    server = socket.create_server(parse_address(source))
+    report("listening on " + source)
+    while True:
+      conn, _ = server.accept()
+      with conn, conn.makefile("rb") as stream:
+        try:
+          handle(stream)
+        except ValueError as e:
+          report("error: " + str(e))
+  else:
+    with open(source, "rb") as stream:
+      handle(stream)
+
+def main():
+  parser = argparse.ArgumentParser(description="Receive and verify zip archives sent by makezip-win.py --stream.")
+  sub = parser.add_subparsers(dest="command", required=True)
+  receiver = sub.add_parser("receive", help="Reassemble archives from a stream.")
+  receiver.add_argument("source", help="-, tcp:[host]:port (listen) or a file or named pipe.")
+  receiver.add_argument("-o", "--output", default=".", help="Folder to write the archives to.")
+  args = parser.parse_args()
+
+  try:
+    receive(args.source, args.output)
+  except ValueError as e:
+    print("error: " + str(e))
+    sys.exit(1)
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+
+# tar archives compressed with the zstd command line tool (https://facebook.github.io/zstd/), an alternative
+# to zip for internal distribution: zstd compresses on every core (-T0), decompresses several times faster
+# than deflate and, with long distance matching, finds repeats across members (e.g. the x64 and ARM64EC
+# builds of the same code). a dictionary trained on similar binaries improves the ratio further.
+#
+# archives that use a dictionary need it to be decompressed, it is written next to them as <archive>.dict
+#
+# USAGE:
+# zstd_archive.py train <dictionary> <files...> [--size bytes]   train a dictionary on files
+# zstd_archive.py extract <archive> [dir]                         unpack an archive (with <archive>.dict if present)
+
+import argparse, os, shutil, subprocess, sys, tarfile
+
+import tracing
+
+EXTENSION = ".tar.zst"
+DEFAULT_LEVEL = 19
+# 2^27 = 128 MB match window, the largest zstd decompresses without --long
+DEFAULT_WINDOW_LOG = 27
+DEFAULT_DICT_SIZE = 112640
+# files are cut into blocks of this size when training, so a few large binaries give enough samples
+TRAIN_BLOCK_SIZE = 128 << 10
+CHUNK_SIZE = 1 << 20
+
+def find_zstd():
+  zstd = shutil.which("zstd")
+  if not zstd:
+    raise RuntimeError("zstd not found, install it (https://github.com/facebook/zstd/releases) or use zip archives")
+  return zstd
+
+def dictionary_path(archive_path):
+  return archive_path + ".dict"
+
+def compress_args(level=DEFAULT_LEVEL, window_log=DEFAULT_WINDOW_LOG, dictionary=None):
+  args = [find_zstd(), "-q", "-f", "-T0", "-" + str(level)]
+  if level > 19:
+    args.append("--ultra")
+  if window_log:
+    args.append("--long=" + str(window_log))
+  if dictionary:
+    args += ["-D", dictionary]
+  return args
+
+def decompress_args(dictionary=None):
+  # --long=31 allows any window size the archive was written with
+  args = [find_zstd(), "-q", "-d", "-c", "--long=31"]
+  if dictionary:
+    args += ["-D", dictionary]
+  return args
+
+def write(path, members, level=DEFAULT_LEVEL, window_log=DEFAULT_WINDOW_LOG, dictionary=None):
+  """Write (source, arcname) members to a .tar.zst archive at path.
+
+  The tar stream is piped straight into zstd, nothing is staged on disk. If dictionary is given it
+  is copied next to the archive (see dictionary_path()). Returns the paths written.
+  """
+  temp_path = path + "." + str(os.getpid()) + ".tmp"
+  read = 0
+
+  with tracing.span("zstd archive", "file", file=os.path.basename(path), level=level, window_log=window_log) as span:
+    proc = subprocess.Popen(compress_args(level, window_log, dictionary) + ["-o", temp_path], stdin=subprocess.PIPE)
+    try:
+      try:
+        with tarfile.open(fileobj=proc.stdin, mode="w|", format=tarfile.PAX_FORMAT) as tar:
+          for file_path, arcname in members:
+            tracing.debug("adding " + file_path + " as " + arcname + " to " + os.path.basename(path))
+            info = tar.gettarinfo(file_path, arcname.replace(os.sep, "/"))
+            # the archive shouldn't depend on who built it
+            info.uid = info.gid = 0
+            info.uname = info.gname = ""
+            with open(file_path, "rb") as f:
+              tar.addfile(info, f)
+            read += info.size
+      finally:
+        proc.stdin.close()
+        code = proc.wait()
+      if code != 0:
+        raise RuntimeError("zstd failed writing " + path + " (exit code " + str(code) + ")")
+    except BaseException:
+      # e.g. a member that couldn't be read, don't leave a partial archive behind
+      if os.path.exists(temp_path):
+        os.remove(temp_path)
+      raise
+
+    os.replace(temp_path, path)
+    span.read(read)
+    span.wrote(os.path.getsize(path))
+
+  written = [path]
+  if dictionary:
+    shutil.copyfile(dictionary, dictionary_path(path))
+    written.append(dictionary_path(path))
+  elif os.path.exists(dictionary_path(path)):
+    # left from an earlier build, it would be used to decompress this archive
+    os.remove(dictionary_path(path))
+  return written
+
+def train(dictionary, samples, size=DEFAULT_DICT_SIZE):
+  """Train a zstd dictionary on the sample files. Returns False if zstd couldn't train one (e.g. too little data)."""
+  samples = [s for s in samples if os.path.getsize(s) > 0]
+  if not samples:
+    return False
+
+  with tracing.span("train zstd dictionary", file=os.path.basename(dictionary), samples=len(samples)) as span:
+    args = [find_zstd(), "-q", "-f", "--train", "-B" + str(TRAIN_BLOCK_SIZE), "--maxdict=" + str(size), "-o", dictionary]
+    result = tracing.run(args + samples, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+    if result.returncode != 0:
+      print("warning: couldn't train a zstd dictionary: " + result.stdout.decode("utf-8", "replace").strip())
+      return False
+    span.wrote(os.path.getsize(dictionary))
+  return True
+
+def open_members(path):
+  """Yield (TarInfo, file object) for each file in a .tar.zst archive, decompressed as it is read."""
+  dictionary = dictionary_path(path)
+  proc = subprocess.Popen(decompress_args(dictionary if os.path.exists(dictionary) else None) + [path], stdout=subprocess.PIPE)
+  error = None
+  try:
+    with tarfile.open(fileobj=proc.stdout, mode="r|") as tar:
+      for info in tar:
+        if info.isfile():
+          yield info, tar.extractfile(info)
+  except tarfile.TarError as e:
+    # usually a consequence of zstd failing, which is reported below
+    error = e
+  finally:
+    proc.stdout.close()
+    code = proc.wait()
+  if error and code == 0:
+    raise RuntimeError(path + ": " + str(error))
+  if code != 0:
+    raise RuntimeError("zstd failed reading " + path + " (exit code " + str(code) + ")")
+
+def extract(path, directory):
+  count = 0
+  for info, f in open_members(path):
+    target = os.path.join(directory, *info.name.split("/"))
+    if not os.path.abspath(target).startswith(os.path.abspath(directory) + os.sep):
+      raise RuntimeError(path + ": member " + info.name + " is outside the archive")
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    with open(target, "wb") as out:
+      shutil.copyfileobj(f, out, CHUNK_SIZE)
+    os.utime(target, (info.mtime, info.mtime))
+    count += 1
+  return count
+
+def main():
+  parser = argparse.ArgumentParser(description="Train zstd dictionaries and unpack .tar.zst archives.")
+  sub = parser.add_subparsers(dest="command", required=True)
+
+  trainer = sub.add_parser("train", help="Train a dictionary on a set of files.")
+  trainer.add_argument("dictionary")
+  trainer.add_argument("files", nargs="+")
+  trainer.add_argument("--size", type=int, default=DEFAULT_DICT_SIZE, help="Maximum dictionary size in bytes.")
+
+  extractor = sub.add_parser("extract", help="Unpack an archive.")
+  extractor.add_argument("archive")
+  extractor.add_argument("directory", nargs="?", default=".")
+
+  args = parser.parse_args()
+
+  try:
+    if args.command == "train":
+      if not train(args.dictionary, args.files, args.size):
+        sys.exit(1)
+      print("wrote " + args.dictionary)
+    else:
+      print("extracted " + str(extract(args.archive, args.directory)) + " files")
+  except RuntimeError as e:
+    print("error: " + str(e))
+    sys.exit(1)
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,8 @@
+// compiles the sources written by scripts/embed_resources.py as their own translation unit, so
+// TemplateProject.cpp only includes the index header and isn't rebuilt when a resource changes
+
+#include "config.h"
+
+#if EMBED_RESOURCES
+#include "resources/embedded/embedded_resources_unity.cpp"
+#endif
@@ -0,0 +1,189 @@
+#pragma once
+
+/**
+ * @file ResourcePack.h
+ * @brief Reader for the resource packs written by Scripts/resource_pack.py
+ *
+ * The pack is memory mapped, resources are returned as views into the mapping, no copies are made.
+ * See Scripts/resource_pack.py for the file layout.
+ */
+
+#include <cstddef>
+#include <cstdint>
+#include <cstring>
+
+#ifdef _WIN32
+#ifndef NOMINMAX
+#define NOMINMAX
+#endif
+#include <windows.h>
+#else
+#include <fcntl.h>
+#include <sys/mman.h>
+#include <sys/stat.h>
+#include <unistd.h>
+#endif
+
+class ResourcePack
+{
+public:
+  /** A resource's bytes, valid while the pack is open. The byte after the last one is always 0 */
+  struct View
+  {
+    const uint8_t* data = nullptr;
+    size_t size = 0;
+
+    explicit operator bool() const { return data != nullptr; }
+  };
+
+  ResourcePack() = default;
+  ResourcePack(const ResourcePack&) = delete;
+  ResourcePack& operator=(const ResourcePack&) = delete;
+  ~ResourcePack() { Close(); }
+
+  /** Map a pack file. Returns false if it can't be opened or isn't a valid pack */
+  bool Open(const char* path)
+  {
+    Close();
+    if (!Map(path))
+      return false;
+
+    if (mSize < kHeaderSize || std::memcmp(mData, "IPLUGPAK", 8) != 0 || Read32(8) != kVersion
+        || Read64(32) != mSize || kHeaderSize + uint64_t(Read32(12)) * kEntrySize > mSize)
+    {
+      Close();
+      return false;
+    }
+
+    // Get() and GetName() read the names without further checks
+    const uint32_t count = Read32(12);
+    for (uint32_t i = 0; i < count; i++)
+    {
+      const size_t entry = EntryOffset(static_cast<int>(i));
+      if (uint64_t(Read32(entry + 16)) + Read32(entry + 20) > mSize)
+      {
+        Close();
+        return false;
+      }
+    }
+
+    mCount = count;
+    return true;
+  }
+
+  void Close()
+  {
+#ifdef _WIN32
+    if (mData)
+      UnmapViewOfFile(mData);
+#else
+    if (mData)
+      munmap(const_cast<uint8_t*>(mData), mSize);
+#endif
+    mData = nullptr;
+    mSize = 0;
+    mCount = 0;
+  }
+
+  bool IsOpen() const { return mData != nullptr; }
+
+  /** Number of resources in the pack */
+  int NResources() const { return static_cast<int>(mCount); }
+
+  /** Name of resource i, resources are sorted by name */
+  const char* GetName(int i) const
+  {
+    return reinterpret_cast<const char*>(mData + Read32(EntryOffset(i) + 16));
+  }
+
+  /** Find a resource by file name (binary search), e.g. "Roboto-Regular.ttf". The view is empty if there is none */
+  View Get(const char* name) const
+  {
+    const size_t nameLen = std::strlen(name);
+    size_t lo = 0, hi = mCount;
+
+    while (lo < hi)
+    {
+      const size_t mid = (lo + hi) / 2;
+      const size_t entry = EntryOffset(static_cast<int>(mid));
+      const uint32_t entryNameLen = Read32(entry + 20);
+      int cmp = std::memcmp(mData + Read32(entry + 16), name, entryNameLen < nameLen ? entryNameLen : nameLen);
+      if (cmp == 0)
+        cmp = entryNameLen < nameLen ? -1 : (entryNameLen > nameLen ? 1 : 0);
+
+      if (cmp == 0)
+      {
+        const uint64_t offset = Read64(entry), size = Read64(entry + 8);
+        if (offset > mSize || size > mSize - offset)
+          return View{};
+        return View{mData + offset, static_cast<size_t>(size)};
+      }
+      if (cmp < 0)
+        lo = mid + 1;
+      else
+        hi = mid;
+    }
+
+    return View{};
+  }
+
+private:
+  static constexpr uint32_t kVersion = 1;
+  static constexpr size_t kHeaderSize = 40;
+  static constexpr size_t kEntrySize = 24;
+
+  size_t EntryOffset(int i) const { return kHeaderSize + static_cast<size_t>(i) * kEntrySize; }
+
+  // the pack is little-endian, like every platform iPlug2 targets. memcpy avoids unaligned reads
+  uint32_t Read32(size_t offset) const { uint32_t v; std::memcpy(&v, mData + offset, sizeof(v)); return v; }
+  uint64_t Read64(size_t offset) const { uint64_t v; std::memcpy(&v, mData + offset, sizeof(v)); return v; }
+
+  bool Map(const char* path)
+  {
+#ifdef _WIN32
+    const int wideLen = MultiByteToWideChar(CP_UTF8, 0, path, -1, nullptr, 0);
+    if (wideLen <= 0)
+      return false;
+    wchar_t* widePath = new wchar_t[wideLen];
+    MultiByteToWideChar(CP_UTF8, 0, path, -1, widePath, wideLen);
+    HANDLE file = CreateFileW(widePath, GENERIC_READ, FILE_SHARE_READ | FILE_SHARE_DELETE, nullptr, OPEN_EXISTING, FILE_ATTRIBUTE_NORMAL, nullptr);
+    delete[] widePath;
+    if (file == INVALID_HANDLE_VALUE)
+      return false;
+
+    LARGE_INTEGER size;
+    HANDLE mapping = nullptr;
+    if (GetFileSizeEx(file, &size) && size.QuadPart > 0)
+      mapping = CreateFileMappingW(file, nullptr, PAGE_READONLY, 0, 0, nullptr);
+    CloseHandle(file);
+    if (!mapping)
+      return false;
+
+    // the view keeps the mapping alive
+    mData = static_cast<const uint8_t*>(MapViewOfFile(mapping, FILE_MAP_READ, 0, 0, 0));
+    CloseHandle(mapping);
+    mSize = mData ? static_cast<size_t>(size.QuadPart) : 0;
+#else
+    const int fd = open(path, O_RDONLY | O_CLOEXEC);
+    if (fd < 0)
+      return false;
+
+    struct stat st;
+    void* data = MAP_FAILED;
+    if (fstat(fd, &st) == 0 && st.st_size > 0)
+      data = mmap(nullptr, static_cast<size_t>(st.st_size), PROT_READ, MAP_PRIVATE, fd, 0);
+    // the mapping stays valid after the descriptor is closed
+    close(fd);
+    if (data == MAP_FAILED)
+      return false;
+
+    mData = static_cast<const uint8_t*>(data);
+    mSize = static_cast<size_t>(st.st_size);
+#endif
+    return mData != nullptr;
+  }
+
+  const uint8_t* mData = nullptr;
+  size_t mSize = 0;
+  uint32_t mCount = 0;
+};
@@ -5,10 +5,18 @@
 #include "IControls.h"
 #endif
 
+#if EMBED_RESOURCES
+#include "resources/embedded/embedded_resources.h"
+#endif
+
 TemplateProject::TemplateProject(const InstanceInfo& info)
 : iplug::Plugin(info, MakeConfig(kNumParams, kNumPresets))
 {
-  GetParam(kParamGain)->InitDouble("Gain", 0., 0., 100.0, 0.01, "%");
+  for (int i = 0; i < kNumParams; i++)
+  {
+    const ParamDef& def = kParamDefs[i];
+    GetParam(i)->InitDouble(def.name, def.defaultValue, def.min, def.max, def.step, def.label);
+  }
 
 #if IPLUG_EDITOR // http://bit.ly/2S64BDd
   mMakeGraphicsFunc = [&]() {
@@ -32,7 +40,25 @@ TemplateProject::TemplateProject(const InstanceInfo& info)
 
     pGraphics->SetLayoutOnResize(true);
     pGraphics->AttachCornerResizer(EUIResizerMode::Size, true);
+#if EMBED_RESOURCES
+    const EmbeddedResource* pFont = FindEmbeddedResource(ROBOTO_FN);
+    pGraphics->LoadFont("Roboto-Regular", const_cast<unsigned char*>(pFont->data), static_cast<int>(pFont->size));
+#elif PACK_RESOURCES && defined OS_MAC
+    if (!mResourcePack.IsOpen()) {
+      WDL_String packPath;
+      BundleResourcePath(packPath, GetBundleID());
+      packPath.Append("/resources.pak");
+      if (!mResourcePack.Open(packPath.Get()))
+        DBGMSG("could not open %s, loading resources from the bundle\n", packPath.Get());
+    }
+    const ResourcePack::View font = mResourcePack.Get(ROBOTO_FN);
+    if (font)
+      pGraphics->LoadFont("Roboto-Regular", const_cast<uint8_t*>(font.data), static_cast<int>(font.size));
+    else
+      pGraphics->LoadFont("Roboto-Regular", ROBOTO_FN);
+#else
     pGraphics->LoadFont("Roboto-Regular", ROBOTO_FN);
+#endif
     pGraphics->AttachPanelBackground(COLOR_LIGHT_GRAY);
     pGraphics->AttachControl(new IVSliderControl(sliderBounds, kParamGain), kCtrlTagSlider);
     pGraphics->AttachControl(new ITextControl(titleBounds, "TemplateProject", IText(30)), kCtrlTagTitle);
@@ -46,13 +72,15 @@ TemplateProject::TemplateProject(const InstanceInfo& info)
 #if IPLUG_DSP
 void TemplateProject::ProcessBlock(sample** inputs, sample** outputs, int nFrames)
 { 
-  const int nChans = NOutChansConnected();
-  const double gain = GetParam(kParamGain)->Value() / 100.;
-  
-  for (int s = 0; s < nFrames; s++) {
-    for (int c = 0; c < nChans; c++) {
-      outputs[c][s] = inputs[c][s] * gain;
-    }
-  }
+  for (int i = 0; i < kNumParams; i++)
+    ApplyParam(mDSP, i, GetParam(i)->Value());
+  mDSP.ProcessBlock(inputs, outputs, NOutChansConnected(), nFrames);
+}
+
+void TemplateProject::OnReset()
+{
+  for (int i = 0; i < kNumParams; i++)
+    ApplyParam(mDSP, i, GetParam(i)->Value());
+  mDSP.Reset(GetSampleRate());
 }
 #endif
@@ -1,14 +1,14 @@
 #pragma once
 
 #include "IPlug_include_in_plug_hdr.h"
+#include "TemplateProject_DSP.h"
+#include "TemplateProject_Params.h"
 
-const int kNumPresets = 1;
+#if PACK_RESOURCES
+#include "ResourcePack.h"
+#endif
 
-enum EParams
-{
-  kParamGain = 0,
-  kNumParams
-};
+const int kNumPresets = 1;
 
 enum ECtrlTags
 {
@@ -31,5 +31,14 @@ public:
   
 #if IPLUG_DSP // http://bit.ly/2S64BDd
   void ProcessBlock(sample** inputs, sample** outputs, int nFrames) override;
+  void OnReset() override;
+#endif
+
+private:
+#if IPLUG_DSP
+  TemplateProjectDSP<sample> mDSP;
+#endif
+#if PACK_RESOURCES
+  ResourcePack mResourcePack;
 #endif
 };
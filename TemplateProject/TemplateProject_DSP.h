@@ -0,0 +1,112 @@
+#pragma once
+
+/**
+ * @file TemplateProject_DSP.h
+ * @brief TemplateProject's audio processing, without any iPlug2 dependencies
+ *
+ * TemplateProject::ProcessBlock forwards to this class, so the same code can be rendered and
+ * benchmarked headless by bench/TemplateProjectBench.cpp.
+ *
+ * Channels are processed one at a time, each as a contiguous loop over __restrict pointers, which
+ * compilers auto-vectorize. Gain changes are ramped linearly, the ramp is a function of the sample
+ * index rather than a running sum, so it vectorizes too. Buffers processed in place take a separate path,
+ * as the __restrict loops would be wrong for them.
+ */
+
+#include <algorithm>
+
+template <typename T>
+class TemplateProjectDSP
+{
+public:
+  /** Duration of the ramp to a new gain, long enough to avoid zipper noise */
+  static constexpr double kRampTimeMs = 20.;
+
+  /** Call before processing and when the sample rate changes. Jumps straight to the gain last set */
+  void Reset(double sampleRate)
+  {
+    mRampLength = std::max(1, static_cast<int>(sampleRate * kRampTimeMs / 1000.));
+    mCurrentGain = mTargetGain;
+    mRampRemaining = 0;
+  }
+
+  /** @param gain Linear gain, 1 = unity. Ramped to over kRampTimeMs */
+  void SetGain(double gain)
+  {
+    if (gain != mTargetGain)
+    {
+      mTargetGain = gain;
+      mStep = (mTargetGain - mCurrentGain) / mRampLength;
+      mRampRemaining = mRampLength;
+    }
+  }
+
+  double GetGain() const { return mTargetGain; }
+
+  void ProcessBlock(T** inputs, T** outputs, int nChans, int nFrames)
+  {
+    // the first nRamp frames are ramped, the rest use a constant gain
+    const int nRamp = std::min(nFrames, mRampRemaining);
+    const double start = mCurrentGain;
+    const double end = nRamp == mRampRemaining ? mTargetGain : start + mStep * nRamp;
+
+    for (int c = 0; c < nChans; c++)
+    {
+      if (inputs[c] == outputs[c])
+      {
+        RampInPlace(outputs[c], nRamp, start, mStep);
+        ScaleInPlace(outputs[c] + nRamp, nFrames - nRamp, end);
+      }
+      else
+      {
+        Ramp(inputs[c], outputs[c], nRamp, start, mStep);
+        Scale(inputs[c] + nRamp, outputs[c] + nRamp, nFrames - nRamp, end);
+      }
+    }
+
+    mCurrentGain = end;
+    mRampRemaining -= nRamp;
+  }
+
+private:
+  static void Ramp(const T* __restrict in, T* __restrict out, int nFrames, double start, double step)
+  {
+    const T g = static_cast<T>(start), dg = static_cast<T>(step);
+    for (int s = 0; s < nFrames; s++)
+      out[s] = in[s] * (g + dg * static_cast<T>(s));
+  }
+
+  static void RampInPlace(T* buffer, int nFrames, double start, double step)
+  {
+    const T g = static_cast<T>(start), dg = static_cast<T>(step);
+    for (int s = 0; s < nFrames; s++)
+      buffer[s] *= g + dg * static_cast<T>(s);
+  }
+
+  static void Scale(const T* __restrict in, T* __restrict out, int nFrames, double gain)
+  {
+    if (gain == 1.)
+    {
+      std::copy(in, in + nFrames, out);
+      return;
+    }
+    const T g = static_cast<T>(gain);
+    for (int s = 0; s < nFrames; s++)
+      out[s] = in[s] * g;
+  }
+
+  static void ScaleInPlace(T* buffer, int nFrames, double gain)
+  {
+    if (gain == 1.)
+      return;
+    const T g = static_cast<T>(gain);
+    for (int s = 0; s < nFrames; s++)
+      buffer[s] *= g;
+  }
+
+  double mTargetGain = 0.;
+  double mCurrentGain = 0.;
+  double mStep = 0.;
+  int mRampLength = 1;
+  int mRampRemaining = 0;
+};
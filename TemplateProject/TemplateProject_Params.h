@@ -0,0 +1,51 @@
+#pragma once
+
+/**
+ * @file TemplateProject_Params.h
+ * @brief TemplateProject's parameters, without any iPlug2 dependencies
+ *
+ * The plugin initializes its parameters from kParamDefs and both it and bench/TemplateProjectBench.cpp
+ * hand their values to the DSP with ApplyParam(), so the two can't disagree. When adding a parameter,
+ * add it to EParams, kParamDefs and ApplyParam().
+ */
+
+#include <cassert>
+
+#include "TemplateProject_DSP.h"
+
+enum EParams
+{
+  kParamGain = 0,
+  kNumParams
+};
+
+/** A parameter's range and display, in the plugin's units */
+struct ParamDef
+{
+  const char* name; // shown by the host
+  const char* id; // lower case, for -p and automation files in the bench
+  double defaultValue, min, max, step;
+  const char* label;
+};
+
+/** In EParams order */
+static constexpr ParamDef kParamDefs[] = {
+  {"Gain", "gain", 0., 0., 100., 0.01, "%"},
+};
+
+static_assert(sizeof(kParamDefs) / sizeof(kParamDefs[0]) == kNumParams, "kParamDefs needs one entry per EParams value");
+
+/** Hand a parameter's value, in the plugin's units, to the DSP */
+template <typename T>
+void ApplyParam(TemplateProjectDSP<T>& dsp, int paramIdx, double value)
+{
+  switch (paramIdx)
+  {
+    case kParamGain:
+      dsp.SetGain(value / 100.);
+      break;
+    default:
+      assert(false && "ApplyParam() is missing a parameter");
+      break;
+  }
+}
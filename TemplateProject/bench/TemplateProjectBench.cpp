@@ -0,0 +1,729 @@
+/**
+ * @file TemplateProjectBench.cpp
+ * @brief Headless offline renderer, throughput benchmark and stress test for TemplateProject's DSP
+ *
+ * USAGE:
+ * TemplateProjectBench render [options] -o <outputdir> <input.wav> [...]
+ *   -p name=value      set a parameter, in the plugin's units (e.g. -p gain=50), can be repeated
+ *   -a automation.csv  parameter automation, lines of "seconds,name,value", applied sample accurately (and
+ *                      ramped by the DSP, like host automation)
+ *   -b blocksize       block size (default 512)
+ *   -j jobs            files rendered in parallel (default: number of cores)
+ *
+ * TemplateProjectBench bench [options] [input.wav]
+ *   -p name=value      set a parameter, as above
+ *   -s seconds         audio rendered per measurement (default 10), white noise unless an input file is given
+ *   -c channels        channels of the noise (default 2)
+ *   -r samplerate      sample rate of the noise (default 44100)
+ *   -n repeats         measurements per block size, the fastest is reported (default 5)
+ *   -j jobs            instances processing at the same time, each on its own thread (default 1)
+ *   --in-place         process with the inputs and outputs in the same buffers, like most hosts do
+ *   --json file        also write the results as JSON
+ *   --baseline file    compare with a previous --json file, exit code 1 if a block size got slower
+ *   --tolerance pct    slowdown allowed by --baseline (default 10)
+ *
+ * TemplateProjectBench stress [options]
+ *   -i instances       number of instances (default 64)
+ *   -j threads         audio threads the instances are spread over, round robin (default: number of cores)
+ *   -b blocksize       block size (default 512)
+ *   -r samplerate      sample rate (default 44100)
+ *   -c channels        channels per instance (default 2)
+ *   -s seconds         duration (default 10)
+ *   --param-rate hz    parameter changes per second, made from a separate thread like a host's UI or
+ *                      automation thread (default 1000, 0 for none)
+ *   --free-run         process blocks back to back instead of once per block period
+ *   --pin              pin each audio thread to a core (Linux)
+ *   --in-place         process with the inputs and outputs in the same buffers
+ *   --json file        also write the results as JSON
+ *
+ * ns/sample is the processing time per sample frame (all channels), realtime x is how many times faster
+ * than real time the audio was processed. Block sizes are the powers of two from 16 to 4096.
+ *
+ * stress runs every audio thread like a host's audio callback: once per block period, it processes all of
+ * its instances. A callback that isn't finished by the end of its period is a deadline miss - this includes
+ * the threads waking up late, as they aren't real time threads. Instances per core is the block period
+ * divided by the time one instance takes to process a block.
+ */
+
+#include <algorithm>
+#include <atomic>
+#include <chrono>
+#include <cstdio>
+#include <cstdlib>
+#include <cstring>
+#include <filesystem>
+#include <fstream>
+#include <memory>
+#include <mutex>
+#include <numeric>
+#include <random>
+#include <sstream>
+#include <string>
+#include <thread>
+#include <vector>
+
+#ifdef __linux__
+#include <pthread.h>
+#include <sched.h>
+#endif
+
+#include "../TemplateProject_DSP.h"
+#include "../TemplateProject_Params.h"
+#include "WavFile.h"
+
+#ifdef SAMPLE_TYPE_FLOAT
+using sample = float;
+#else
+using sample = double;
+#endif
+
+using DSP = TemplateProjectDSP<sample>;
+
+struct ParamEvent
+{
+  double time; // seconds
+  int param;
+  double value;
+};
+
+struct Options
+{
+  std::string mode;
+  std::vector<std::string> inputs;
+  std::string outputDir;
+  std::vector<double> paramValues;
+  std::vector<ParamEvent> automation;
+  int blockSize = 512;
+  int jobs = 0;
+  double seconds = 10.;
+  int channels = 2;
+  int sampleRate = 44100;
+  int repeats = 5;
+  std::string jsonPath;
+  std::string baselinePath;
+  double tolerance = 10.;
+  bool inPlace = false;
+  int instances = 64;
+  double paramRate = 1000.;
+  bool freeRun = false;
+  bool pin = false;
+};
+
+static void Fail(const std::string& msg)
+{
+  std::fprintf(stderr, "error: %s\n", msg.c_str());
+  std::exit(1);
+}
+
+static int FindParam(const std::string& name)
+{
+  for (int i = 0; i < kNumParams; i++)
+  {
+    if (name == kParamDefs[i].id)
+      return i;
+  }
+  Fail("unknown parameter " + name);
+  return -1;
+}
+
+static double ClampParam(int param, double value)
+{
+  return std::max(kParamDefs[param].min, std::min(kParamDefs[param].max, value));
+}
+
+static void ReadAutomation(const std::string& path, std::vector<ParamEvent>& events)
+{
+  std::ifstream f(path);
+  if (!f)
+    Fail("can't open " + path);
+
+  std::string line;
+  int lineNumber = 0;
+  while (std::getline(f, line))
+  {
+    lineNumber++;
+    if (line.empty() || line[0] == '#')
+      continue;
+
+    std::stringstream ss(line);
+    std::string time, name, value;
+    if (!std::getline(ss, time, ',') || !std::getline(ss, name, ',') || !std::getline(ss, value))
+      Fail(path + ":" + std::to_string(lineNumber) + ": expected seconds,name,value");
+
+    const int param = FindParam(name);
+    events.push_back({std::atof(time.c_str()), param, ClampParam(param, std::atof(value.c_str()))});
+  }
+
+  std::stable_sort(events.begin(), events.end(), [](const ParamEvent& a, const ParamEvent& b) { return a.time < b.time; });
+}
+
+static Options ParseArgs(int argc, char** argv)
+{
+  Options options;
+  if (argc < 2 || (std::strcmp(argv[1], "render") != 0 && std::strcmp(argv[1], "bench") != 0 && std::strcmp(argv[1], "stress") != 0))
+    Fail("usage: TemplateProjectBench render|bench|stress [options] [input.wav ...], see the top of TemplateProjectBench.cpp");
+
+  options.mode = argv[1];
+  for (int i = 0; i < kNumParams; i++)
+    options.paramValues.push_back(kParamDefs[i].defaultValue);
+
+  for (int i = 2; i < argc; i++)
+  {
+    const std::string arg = argv[i];
+    auto value = [&]() -> std::string {
+      if (i + 1 >= argc)
+        Fail(arg + " needs a value");
+      return argv[++i];
+    };
+
+    if (arg == "-p")
+    {
+      const std::string assignment = value();
+      const size_t eq = assignment.find('=');
+      if (eq == std::string::npos)
+        Fail("expected -p name=value");
+      const int param = FindParam(assignment.substr(0, eq));
+      options.paramValues[param] = ClampParam(param, std::atof(assignment.c_str() + eq + 1));
+    }
+    else if (arg == "-a")
+      ReadAutomation(value(), options.automation);
+    else if (arg == "-o")
+      options.outputDir = value();
+    else if (arg == "-b")
+      options.blockSize = std::atoi(value().c_str());
+    else if (arg == "-j")
+      options.jobs = std::atoi(value().c_str());
+    else if (arg == "-s")
+      options.seconds = std::atof(value().c_str());
+    else if (arg == "-c")
+      options.channels = std::atoi(value().c_str());
+    else if (arg == "-r")
+      options.sampleRate = std::atoi(value().c_str());
+    else if (arg == "-n")
+      options.repeats = std::atoi(value().c_str());
+    else if (arg == "--json")
+      options.jsonPath = value();
+    else if (arg == "--baseline")
+      options.baselinePath = value();
+    else if (arg == "--tolerance")
+      options.tolerance = std::atof(value().c_str());
+    else if (arg == "--in-place")
+      options.inPlace = true;
+    else if (arg == "-i")
+      options.instances = std::atoi(value().c_str());
+    else if (arg == "--param-rate")
+      options.paramRate = std::atof(value().c_str());
+    else if (arg == "--free-run")
+      options.freeRun = true;
+    else if (arg == "--pin")
+      options.pin = true;
+    else if (arg.size() > 1 && arg[0] == '-')
+      Fail("unknown option " + arg);
+    else
+      options.inputs.push_back(arg);
+  }
+
+  if (options.blockSize <= 0 || options.channels <= 0 || options.sampleRate <= 0 || options.repeats <= 0 || options.seconds <= 0. || options.instances <= 0)
+    Fail("block size, channels, sample rate, repeats, seconds and instances must be positive");
+  return options;
+}
+
+/** Process a whole file through the DSP in blocks, applying automation events at their exact sample */
+static void Render(const Options& options, const WavFile& input, WavFile& output)
+{
+  const int nChans = input.NChannels();
+  const size_t nFrames = input.NFrames();
+  output.sampleRate = input.sampleRate;
+  output.channels.assign(nChans, std::vector<double>(nFrames));
+
+  DSP dsp;
+  for (int i = 0; i < kNumParams; i++)
+    ApplyParam(dsp, i, options.paramValues[i]);
+  dsp.Reset(input.sampleRate);
+
+  std::vector<std::vector<sample>> in(nChans, std::vector<sample>(options.blockSize));
+  std::vector<std::vector<sample>> out(nChans, std::vector<sample>(options.blockSize));
+  std::vector<sample*> inPtrs(nChans), outPtrs(nChans);
+
+  size_t nextEvent = 0;
+  for (size_t pos = 0; pos < nFrames;)
+  {
+    // apply the events due now, then stop the block at the next one
+    size_t end = std::min(nFrames, pos + options.blockSize);
+    while (nextEvent < options.automation.size())
+    {
+      const ParamEvent& event = options.automation[nextEvent];
+      const size_t eventFrame = static_cast<size_t>(std::max(0., event.time) * input.sampleRate + 0.5);
+      if (eventFrame > pos)
+      {
+        end = std::min(end, eventFrame);
+        break;
+      }
+      ApplyParam(dsp, event.param, event.value);
+      nextEvent++;
+    }
+
+    const int n = static_cast<int>(end - pos);
+    for (int c = 0; c < nChans; c++)
+    {
+      std::copy(input.channels[c].begin() + pos, input.channels[c].begin() + end, in[c].begin());
+      inPtrs[c] = in[c].data();
+      outPtrs[c] = out[c].data();
+    }
+
+    dsp.ProcessBlock(inPtrs.data(), outPtrs.data(), nChans, n);
+
+    for (int c = 0; c < nChans; c++)
+      std::copy(out[c].begin(), out[c].begin() + n, output.channels[c].begin() + pos);
+    pos = end;
+  }
+}
+
+static int DefaultJobs()
+{
+  return std::max(1u, std::thread::hardware_concurrency());
+}
+
+/** Run work(i) for i in [0, count) on a pool of jobs threads */
+template <typename Work>
+static void RunPool(int jobs, size_t count, Work work)
+{
+  std::atomic<size_t> next{0};
+  std::vector<std::thread> threads;
+  for (size_t t = 0; t < std::min<size_t>(jobs, count); t++)
+  {
+    threads.emplace_back([&]() {
+      for (size_t i; (i = next++) < count;)
+        work(i);
+    });
+  }
+  for (auto& thread : threads)
+    thread.join();
+}
+
+static int RunRender(const Options& options)
+{
+  if (options.outputDir.empty())
+    Fail("render needs an output folder (-o)");
+  if (options.inputs.empty())
+    Fail("render needs input files");
+
+  std::error_code ec;
+  std::filesystem::create_directories(options.outputDir, ec);
+  if (ec)
+    Fail("can't create " + options.outputDir + ": " + ec.message());
+
+  std::mutex printMutex;
+  std::atomic<int> failures{0};
+
+  RunPool(options.jobs > 0 ? options.jobs : DefaultJobs(), options.inputs.size(), [&](size_t i) {
+    const std::string& path = options.inputs[i];
+    const size_t slash = path.find_last_of("/\\");
+    const std::string outputPath = options.outputDir + "/" + (slash == std::string::npos ? path : path.substr(slash + 1));
+
+    WavFile input, output;
+    std::string error;
+    double seconds = 0.;
+    bool ok = wav::Read(path, input, error);
+    if (ok)
+    {
+      const auto start = std::chrono::steady_clock::now();
+      Render(options, input, output);
+      seconds = std::chrono::duration<double>(std::chrono::steady_clock::now() - start).count();
+      ok = wav::Write(outputPath, output, error);
+    }
+
+    std::lock_guard<std::mutex> lock(printMutex);
+    if (ok)
+    {
+      const double duration = double(input.NFrames()) / input.sampleRate;
+      std::printf("wrote %s (%.1f s of audio, %.0fx realtime)\n", outputPath.c_str(), duration, seconds > 0. ? duration / seconds : 0.);
+    }
+    else
+    {
+      std::fprintf(stderr, "error: %s\n", error.c_str());
+      failures++;
+    }
+  });
+
+  return failures > 0 ? 1 : 0;
+}
+
+struct BenchResult
+{
+  int blockSize;
+  double nsPerSample;
+  double realtimeFactor;
+};
+
+/** Processing time of the whole buffer in blocks of blockSize, in seconds. In place, output has to be a copy of input */
+static double TimeBlocks(DSP& dsp, const std::vector<std::vector<sample>>& input, std::vector<std::vector<sample>>& output, int blockSize, double gain, bool inPlace)
+{
+  const int nChans = static_cast<int>(input.size());
+  const size_t nFrames = input[0].size();
+  std::vector<sample*> inPtrs(nChans), outPtrs(nChans);
+
+  const auto start = std::chrono::steady_clock::now();
+  for (size_t pos = 0; pos < nFrames; pos += blockSize)
+  {
+    const int n = static_cast<int>(std::min<size_t>(blockSize, nFrames - pos));
+    for (int c = 0; c < nChans; c++)
+    {
+      outPtrs[c] = output[c].data() + pos;
+      inPtrs[c] = inPlace ? outPtrs[c] : const_cast<sample*>(input[c].data()) + pos;
+    }
+    // parameters are read once per block in the plugin too
+    dsp.SetGain(gain);
+    dsp.ProcessBlock(inPtrs.data(), outPtrs.data(), nChans, n);
+  }
+  return std::chrono::duration<double>(std::chrono::steady_clock::now() - start).count();
+}
+
+static std::vector<BenchResult> ReadResults(const std::string& path)
+{
+  // reads back the JSON WriteResults() writes, one result per line
+  std::ifstream f(path);
+  if (!f)
+    Fail("can't open " + path);
+
+  std::vector<BenchResult> results;
+  std::string line;
+  while (std::getline(f, line))
+  {
+    BenchResult r;
+    if (std::sscanf(line.c_str(), " {\"blockSize\": %d, \"nsPerSample\": %lf, \"realtimeFactor\": %lf", &r.blockSize, &r.nsPerSample, &r.realtimeFactor) == 3)
+      results.push_back(r);
+  }
+  return results;
+}
+
+static void WriteResults(const std::string& path, const Options& options, int nChans, int sampleRate, const std::vector<BenchResult>& results)
+{
+  std::ofstream f(path);
+  if (!f)
+    Fail("can't write " + path);
+
+  f << "{\n  \"sampleType\": \"" << (sizeof(sample) == 4 ? "float" : "double") << "\", \"channels\": " << nChans
+    << ", \"sampleRate\": " << sampleRate << ", \"jobs\": " << std::max(1, options.jobs)
+    << ", \"inPlace\": " << (options.inPlace ? "true" : "false") << ",\n  \"results\": [\n";
+  for (size_t i = 0; i < results.size(); i++)
+  {
+    char line[160];
+    std::snprintf(line, sizeof(line), "    {\"blockSize\": %d, \"nsPerSample\": %.4f, \"realtimeFactor\": %.1f}%s\n",
+                  results[i].blockSize, results[i].nsPerSample, results[i].realtimeFactor, i + 1 < results.size() ? "," : "");
+    f << line;
+  }
+  f << "  ]\n}\n";
+}
+
+static int RunBench(const Options& options)
+{
+  std::vector<std::vector<sample>> input;
+  int sampleRate = options.sampleRate;
+
+  if (!options.inputs.empty())
+  {
+    WavFile wav;
+    std::string error;
+    if (!wav::Read(options.inputs[0], wav, error))
+      Fail(error);
+    sampleRate = wav.sampleRate;
+    for (auto& channel : wav.channels)
+      input.emplace_back(channel.begin(), channel.end());
+  }
+  else
+  {
+    std::mt19937 rng(1);
+    std::uniform_real_distribution<double> noise(-1., 1.);
+    const size_t nFrames = static_cast<size_t>(options.seconds * sampleRate);
+    input.assign(options.channels, std::vector<sample>(std::max<size_t>(nFrames, 1)));
+    for (auto& channel : input)
+      std::generate(channel.begin(), channel.end(), [&]() { return static_cast<sample>(noise(rng)); });
+  }
+
+  const int nChans = static_cast<int>(input.size());
+  const size_t nFrames = input[0].size();
+  const double duration = double(nFrames) / sampleRate;
+  const int jobs = std::max(1, options.jobs);
+
+  DSP reference;
+  for (int i = 0; i < kNumParams; i++)
+    ApplyParam(reference, i, options.paramValues[i]);
+  const double gain = reference.GetGain();
+
+  std::printf("%d channels, %.1f s at %d Hz, %s samples%s, %d instance%s, best of %d\n", nChans, duration, sampleRate,
+              sizeof(sample) == 4 ? "float" : "double", options.inPlace ? " in place" : "", jobs, jobs > 1 ? "s" : "", options.repeats);
+  std::printf("%6s %12s %12s\n", "block", "ns/sample", "realtime x");
+
+  std::vector<BenchResult> results;
+  volatile double sink = 0.;
+
+  for (int blockSize = 16; blockSize <= 4096; blockSize *= 2)
+  {
+    double best = 0.;
+    for (int repeat = 0; repeat < options.repeats; repeat++)
+    {
+      // every instance has its own output, like separate plugin instances. the slowest instance counts
+      std::vector<double> times(jobs);
+      std::vector<std::vector<std::vector<sample>>> outputs(jobs, options.inPlace ? input : std::vector<std::vector<sample>>(nChans, std::vector<sample>(nFrames)));
+      RunPool(jobs, jobs, [&](size_t i) {
+        DSP dsp;
+        dsp.SetGain(gain);
+        dsp.Reset(sampleRate);
+        times[i] = TimeBlocks(dsp, input, outputs[i], blockSize, gain, options.inPlace);
+      });
+      for (auto& output : outputs)
+        sink = sink + output[0][nFrames / 2];
+
+      const double slowest = *std::max_element(times.begin(), times.end());
+      best = repeat == 0 ? slowest : std::min(best, slowest);
+    }
+
+    const BenchResult result{blockSize, best * 1e9 / nFrames, best > 0. ? duration / best : 0.};
+    results.push_back(result);
+    std::printf("%6d %12.3f %12.1f\n", result.blockSize, result.nsPerSample, result.realtimeFactor);
+  }
+
+  if (!options.jsonPath.empty())
+    WriteResults(options.jsonPath, options, nChans, sampleRate, results);
+
+  int status = 0;
+  if (!options.baselinePath.empty())
+  {
+    for (const BenchResult& baseline : ReadResults(options.baselinePath))
+    {
+      for (const BenchResult& result : results)
+      {
+        if (result.blockSize == baseline.blockSize && result.nsPerSample > baseline.nsPerSample * (1. + options.tolerance / 100.))
+        {
+          std::printf("regression: block size %d takes %.3f ns/sample, baseline %.3f\n", result.blockSize, result.nsPerSample, baseline.nsPerSample);
+          status = 1;
+        }
+      }
+    }
+    if (status == 0)
+      std::printf("no regressions against %s (tolerance %.0f%%)\n", options.baselinePath.c_str(), options.tolerance);
+  }
+
+  return status;
+}
+
+/** One plugin instance of the stress test, with the parameter value a host would write to */
+struct StressInstance
+{
+  DSP dsp;
+  std::atomic<double> gain{0.};
+  std::vector<std::vector<sample>> inputs, outputs;
+  std::vector<sample*> inPtrs, outPtrs;
+};
+
+struct StressThreadStats
+{
+  std::vector<double> callbackNs; // time to process all the thread's instances, per period
+  std::vector<double> instanceNs; // time to process one instance's block
+  int deadlineMisses = 0;
+};
+
+static double Percentile(std::vector<double>& values, double pct)
+{
+  if (values.empty())
+    return 0.;
+  const size_t i = std::min(values.size() - 1, static_cast<size_t>(pct / 100. * values.size()));
+  std::nth_element(values.begin(), values.begin() + i, values.end());
+  return values[i];
+}
+
+static void PinToCore(int core)
+{
+#ifdef __linux__
+  cpu_set_t set;
+  CPU_ZERO(&set);
+  CPU_SET(core % std::max(1u, std::thread::hardware_concurrency()), &set);
+  if (pthread_setaffinity_np(pthread_self(), sizeof(set), &set) != 0)
+    std::fprintf(stderr, "warning: couldn't pin a thread to core %d\n", core);
+#else
+  (void) core;
+#endif
+}
+
+static int RunStress(const Options& options)
+{
+  using Clock = std::chrono::steady_clock;
+
+  const int nThreads = options.jobs > 0 ? options.jobs : DefaultJobs();
+  const int nChans = options.channels;
+  const int blockSize = options.blockSize;
+  const double periodNs = 1e9 * blockSize / options.sampleRate;
+  const long nCycles = std::max(1L, static_cast<long>(options.seconds * options.sampleRate / blockSize));
+
+  std::mt19937 rng(1);
+  std::uniform_real_distribution<double> noise(-1., 1.);
+  std::vector<std::unique_ptr<StressInstance>> instances;
+  for (int i = 0; i < options.instances; i++)
+  {
+    auto instance = std::make_unique<StressInstance>();
+    instance->gain = options.paramValues[kParamGain];
+    instance->inputs.assign(nChans, std::vector<sample>(blockSize));
+    instance->outputs.assign(nChans, std::vector<sample>(blockSize));
+    for (int c = 0; c < nChans; c++)
+    {
+      std::generate(instance->inputs[c].begin(), instance->inputs[c].end(), [&]() { return static_cast<sample>(noise(rng)); });
+      instance->outPtrs.push_back(instance->outputs[c].data());
+      instance->inPtrs.push_back(options.inPlace ? instance->outputs[c].data() : instance->inputs[c].data());
+    }
+    ApplyParam(instance->dsp, kParamGain, instance->gain);
+    instance->dsp.Reset(options.sampleRate);
+    instances.push_back(std::move(instance));
+  }
+
+  std::printf("%d instances on %d threads, %d channels, %d samples at %d Hz (%.1f us period), %.1f s%s, %.0f parameter changes/s\n",
+              options.instances, nThreads, nChans, blockSize, options.sampleRate, periodNs / 1000., options.seconds,
+              options.freeRun ? " free running" : "", options.paramRate);
+
+  // host side: parameter changes arrive from another thread while the audio threads process
+  std::atomic<bool> done{false};
+  std::atomic<long> paramChanges{0};
+  std::thread paramThread;
+  if (options.paramRate > 0.)
+  {
+    paramThread = std::thread([&]() {
+      std::mt19937 paramRng(2);
+      std::uniform_int_distribution<int> pick(0, options.instances - 1);
+      std::uniform_real_distribution<double> value(kParamDefs[kParamGain].min, kParamDefs[kParamGain].max);
+      const auto interval = std::chrono::duration<double>(1. / options.paramRate);
+      auto next = Clock::now();
+      while (!done)
+      {
+        instances[pick(paramRng)]->gain.store(value(paramRng), std::memory_order_relaxed);
+        paramChanges++;
+        next += std::chrono::duration_cast<Clock::duration>(interval);
+        std::this_thread::sleep_until(next);
+      }
+    });
+  }
+
+  std::vector<StressThreadStats> stats(nThreads);
+  const auto start = Clock::now() + std::chrono::milliseconds(20);
+  const auto period = std::chrono::duration_cast<Clock::duration>(std::chrono::duration<double, std::nano>(periodNs));
+
+  std::vector<std::thread> threads;
+  for (int t = 0; t < nThreads; t++)
+  {
+    threads.emplace_back([&, t]() {
+      if (options.pin)
+        PinToCore(t);
+
+      std::vector<StressInstance*> mine;
+      for (int i = t; i < options.instances; i += nThreads)
+        mine.push_back(instances[i].get());
+
+      StressThreadStats& s = stats[t];
+      s.callbackNs.reserve(nCycles);
+      s.instanceNs.reserve(nCycles * mine.size());
+
+      auto next = start;
+      std::this_thread::sleep_until(start);
+      for (long cycle = 0; cycle < nCycles; cycle++)
+      {
+        if (!options.freeRun)
+          std::this_thread::sleep_until(next);
+
+        if (options.inPlace)
+        {
+          // the host writes the next input into the shared buffers before each callback
+          for (StressInstance* instance : mine)
+            for (int c = 0; c < nChans; c++)
+              std::copy(instance->inputs[c].begin(), instance->inputs[c].end(), instance->outputs[c].begin());
+        }
+
+        const auto callbackStart = Clock::now();
+        auto t0 = callbackStart;
+        for (StressInstance* instance : mine)
+        {
+          ApplyParam(instance->dsp, kParamGain, instance->gain.load(std::memory_order_relaxed));
+          instance->dsp.ProcessBlock(instance->inPtrs.data(), instance->outPtrs.data(), nChans, blockSize);
+          const auto t1 = Clock::now();
+          s.instanceNs.push_back(std::chrono::duration<double, std::nano>(t1 - t0).count());
+          t0 = t1;
+        }
+        s.callbackNs.push_back(std::chrono::duration<double, std::nano>(t0 - callbackStart).count());
+
+        if (!options.freeRun)
+        {
+          next += period;
+          if (t0 > next)
+          {
+            s.deadlineMisses++;
+            // like a host dropping out: carry on from now rather than trying to catch up
+            if (t0 > next + period)
+              next = t0;
+          }
+        }
+      }
+    });
+  }
+
+  for (auto& thread : threads)
+    thread.join();
+  done = true;
+  if (paramThread.joinable())
+    paramThread.join();
+
+  std::vector<double> callbackNs, instanceNs;
+  int misses = 0;
+  for (StressThreadStats& s : stats)
+  {
+    callbackNs.insert(callbackNs.end(), s.callbackNs.begin(), s.callbackNs.end());
+    instanceNs.insert(instanceNs.end(), s.instanceNs.begin(), s.instanceNs.end());
+    misses += s.deadlineMisses;
+  }
+
+  const double meanInstanceNs = std::accumulate(instanceNs.begin(), instanceNs.end(), 0.) / std::max<size_t>(1, instanceNs.size());
+  const double pcts[] = {50., 90., 99., 99.9, 100.};
+  double callbackPcts[5], instancePcts[5];
+  for (int i = 0; i < 5; i++)
+  {
+    callbackPcts[i] = Percentile(callbackNs, pcts[i]);
+    instancePcts[i] = Percentile(instanceNs, pcts[i]);
+  }
+
+  std::printf("%-22s %10s %10s %10s %10s %10s\n", "us", "p50", "p90", "p99", "p99.9", "max");
+  std::printf("%-22s %10.2f %10.2f %10.2f %10.2f %10.2f\n", "callback", callbackPcts[0] / 1e3, callbackPcts[1] / 1e3, callbackPcts[2] / 1e3, callbackPcts[3] / 1e3, callbackPcts[4] / 1e3);
+  std::printf("%-22s %10.2f %10.2f %10.2f %10.2f %10.2f\n", "instance block", instancePcts[0] / 1e3, instancePcts[1] / 1e3, instancePcts[2] / 1e3, instancePcts[3] / 1e3, instancePcts[4] / 1e3);
+  std::printf("callback p99 uses %.1f%% of the period\n", 100. * callbackPcts[2] / periodNs);
+  if (!options.freeRun)
+    std::printf("deadline misses: %d of %zu callbacks (%.3f%%)\n", misses, callbackNs.size(), 100. * misses / std::max<size_t>(1, callbackNs.size()));
+  std::printf("parameter changes: %ld\n", paramChanges.load());
+  std::printf("instances per core: %.0f (mean), %.0f (p99)\n", periodNs / meanInstanceNs, periodNs / std::max(1., instancePcts[2]));
+
+  if (!options.jsonPath.empty())
+  {
+    std::ofstream f(options.jsonPath);
+    if (!f)
+      Fail("can't write " + options.jsonPath);
+    char text[1024];
+    std::snprintf(text, sizeof(text),
+                  "{\n  \"instances\": %d, \"threads\": %d, \"channels\": %d, \"blockSize\": %d, \"sampleRate\": %d, \"freeRun\": %s,\n"
+                  "  \"callbackUs\": {\"p50\": %.3f, \"p90\": %.3f, \"p99\": %.3f, \"p99.9\": %.3f, \"max\": %.3f},\n"
+                  "  \"instanceUs\": {\"p50\": %.3f, \"p90\": %.3f, \"p99\": %.3f, \"p99.9\": %.3f, \"max\": %.3f},\n"
+                  "  \"callbacks\": %zu, \"deadlineMisses\": %d, \"parameterChanges\": %ld,\n"
+                  "  \"instancesPerCoreMean\": %.1f, \"instancesPerCoreP99\": %.1f\n}\n",
+                  options.instances, nThreads, nChans, blockSize, options.sampleRate, options.freeRun ? "true" : "false",
+                  callbackPcts[0] / 1e3, callbackPcts[1] / 1e3, callbackPcts[2] / 1e3, callbackPcts[3] / 1e3, callbackPcts[4] / 1e3,
+                  instancePcts[0] / 1e3, instancePcts[1] / 1e3, instancePcts[2] / 1e3, instancePcts[3] / 1e3, instancePcts[4] / 1e3,
+                  callbackNs.size(), misses, paramChanges.load(), periodNs / meanInstanceNs, periodNs / std::max(1., instancePcts[2]));
+    f << text;
+  }
+
+  return 0;
+}
+
+int main(int argc, char** argv)
+{
+  const Options options = ParseArgs(argc, argv);
+  if (options.mode == "render")
+    return RunRender(options);
+  if (options.mode == "stress")
+    return RunStress(options);
+  return RunBench(options);
+}
@@ -0,0 +1,201 @@
+#pragma once
+
+/**
+ * @file WavFile.h
+ * @brief Minimal WAV reading/writing for the bench
+ *
+ * Reads 16/24/32 bit integer and 32/64 bit float PCM (including WAVE_FORMAT_EXTENSIBLE), writes 32 bit float.
+ * Samples are held deinterleaved, one vector per channel.
+ */
+
+#include <algorithm>
+#include <cstdint>
+#include <cstdio>
+#include <cstring>
+#include <string>
+#include <vector>
+
+struct WavFile
+{
+  int sampleRate = 44100;
+  std::vector<std::vector<double>> channels;
+
+  int NChannels() const { return static_cast<int>(channels.size()); }
+  size_t NFrames() const { return channels.empty() ? 0 : channels[0].size(); }
+};
+
+namespace wav
+{
+namespace detail
+{
+inline uint16_t Read16(const uint8_t* p) { return static_cast<uint16_t>(p[0] | (p[1] << 8)); }
+inline uint32_t Read32(const uint8_t* p) { return p[0] | (p[1] << 8) | (p[2] << 16) | (static_cast<uint32_t>(p[3]) << 24); }
+
+inline void Put16(std::vector<uint8_t>& out, uint16_t v)
+{
+  out.push_back(v & 0xFF);
+  out.push_back(v >> 8);
+}
+
+inline void Put32(std::vector<uint8_t>& out, uint32_t v)
+{
+  for (int i = 0; i < 4; i++)
+    out.push_back((v >> (8 * i)) & 0xFF);
+}
+
+inline void PutTag(std::vector<uint8_t>& out, const char* tag) { out.insert(out.end(), tag, tag + 4); }
+} // namespace detail
+
+/** Read a WAV file. Returns false and sets error if it can't be read or the format isn't supported */
+inline bool Read(const std::string& path, WavFile& wav, std::string& error)
+{
+  using namespace detail;
+
+  std::vector<uint8_t> bytes;
+  if (FILE* f = std::fopen(path.c_str(), "rb"))
+  {
+    uint8_t buffer[65536];
+    size_t n;
+    while ((n = std::fread(buffer, 1, sizeof(buffer), f)) > 0)
+      bytes.insert(bytes.end(), buffer, buffer + n);
+    std::fclose(f);
+  }
+  else
+  {
+    error = "can't open " + path;
+    return false;
+  }
+
+  if (bytes.size() < 12 || std::memcmp(bytes.data(), "RIFF", 4) != 0 || std::memcmp(bytes.data() + 8, "WAVE", 4) != 0)
+  {
+    error = path + " is not a WAV file";
+    return false;
+  }
+
+  int format = 0, nChans = 0, bits = 0;
+  const uint8_t* data = nullptr;
+  size_t dataSize = 0;
+
+  for (size_t pos = 12; pos + 8 <= bytes.size();)
+  {
+    const uint8_t* chunk = bytes.data() + pos;
+    const size_t size = Read32(chunk + 4);
+    const size_t available = std::min(size, bytes.size() - pos - 8);
+
+    if (std::memcmp(chunk, "fmt ", 4) == 0 && available >= 16)
+    {
+      format = Read16(chunk + 8);
+      nChans = Read16(chunk + 10);
+      wav.sampleRate = static_cast<int>(Read32(chunk + 12));
+      bits = Read16(chunk + 22);
+      // WAVE_FORMAT_EXTENSIBLE: the real format is the first two bytes of the sub format GUID
+      if (format == 0xFFFE && available >= 40)
+        format = Read16(chunk + 32);
+    }
+    else if (std::memcmp(chunk, "data", 4) == 0)
+    {
+      data = chunk + 8;
+      dataSize = available;
+    }
+
+    // chunks are padded to an even size
+    pos += 8 + size + (size & 1);
+  }
+
+  const bool isInt = format == 1 && (bits == 16 || bits == 24 || bits == 32);
+  const bool isFloat = format == 3 && (bits == 32 || bits == 64);
+  if (!data || nChans <= 0 || !(isInt || isFloat))
+  {
+    error = path + ": unsupported WAV format (format " + std::to_string(format) + ", " + std::to_string(bits) + " bits)";
+    return false;
+  }
+
+  const int bytesPerSample = bits / 8;
+  const size_t nFrames = dataSize / (bytesPerSample * nChans);
+  wav.channels.assign(nChans, std::vector<double>(nFrames));
+
+  for (size_t s = 0; s < nFrames; s++)
+  {
+    for (int c = 0; c < nChans; c++)
+    {
+      const uint8_t* p = data + (s * nChans + c) * bytesPerSample;
+      double v = 0.;
+
+      if (isFloat && bits == 32)
+      {
+        float f;
+        std::memcpy(&f, p, 4);
+        v = f;
+      }
+      else if (isFloat)
+        std::memcpy(&v, p, 8);
+      else if (bits == 16)
+        v = static_cast<int16_t>(Read16(p)) / 32768.;
+      else if (bits == 24)
+        v = (static_cast<int32_t>((p[0] << 8) | (p[1] << 16) | (static_cast<uint32_t>(p[2]) << 24)) >> 8) / 8388608.;
+      else
+        v = static_cast<int32_t>(Read32(p)) / 2147483648.;
+
+      wav.channels[c][s] = v;
+    }
+  }
+
+  return true;
+}
+
+/** Write a 32 bit float WAV file */
+inline bool Write(const std::string& path, const WavFile& wav, std::string& error)
+{
+  using namespace detail;
+
+  const uint32_t nChans = static_cast<uint32_t>(wav.NChannels());
+  const size_t nFrames = wav.NFrames();
+  const uint32_t dataSize = static_cast<uint32_t>(nFrames * nChans * 4);
+
+  std::vector<uint8_t> out;
+  out.reserve(58 + dataSize);
+  PutTag(out, "RIFF");
+  Put32(out, 50 + dataSize);
+  PutTag(out, "WAVE");
+  PutTag(out, "fmt ");
+  Put32(out, 18);
+  Put16(out, 3); // IEEE float
+  Put16(out, static_cast<uint16_t>(nChans));
+  Put32(out, static_cast<uint32_t>(wav.sampleRate));
+  Put32(out, static_cast<uint32_t>(wav.sampleRate) * nChans * 4);
+  Put16(out, static_cast<uint16_t>(nChans * 4));
+  Put16(out, 32);
+  Put16(out, 0);
+  // non-PCM formats should have a fact chunk with the frame count
+  PutTag(out, "fact");
+  Put32(out, 4);
+  Put32(out, static_cast<uint32_t>(nFrames));
+  PutTag(out, "data");
+  Put32(out, dataSize);
+
+  for (size_t s = 0; s < nFrames; s++)
+  {
+    for (uint32_t c = 0; c < nChans; c++)
+    {
+      const float f = static_cast<float>(wav.channels[c][s]);
+      uint32_t v;
+      std::memcpy(&v, &f, 4);
+      Put32(out, v);
+    }
+  }
+
+  FILE* f = std::fopen(path.c_str(), "wb");
+  if (!f)
+  {
+    error = "can't write " + path;
+    return false;
+  }
+  const bool ok = std::fwrite(out.data(), 1, out.size(), f) == out.size();
+  if (std::fclose(f) != 0 || !ok)
+  {
+    error = "error writing " + path;
+    return false;
+  }
+  return true;
+}
+} // namespace wav
@@ -61,3 +61,9 @@
 #define APP_SIGNAL_VECTOR_SIZE 64
 
 #define ROBOTO_FN "Roboto-Regular.ttf"
+
+// 1 to load resources from memory, generate resources/embedded with scripts/embed_resources.py first
+#define EMBED_RESOURCES 0
+
+// 1 to pack the resources into one memory mapped resources.pak in the bundle (macOS, see scripts/prepare_resources-mac.py)
+#define PACK_RESOURCES 0
@@ -5,6 +5,7 @@ IPLUG2_ROOT = ../../iPlug2
 include ../../iPlug2/common-wasm.mk
 
 SRC += $(PROJECT_ROOT)/TemplateProject.cpp
+SRC += $(PROJECT_ROOT)/EmbeddedResources.cpp
 
 # DSP module flags
 WASM_DSP_CFLAGS +=
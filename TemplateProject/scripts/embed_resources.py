@@ -0,0 +1,31 @@
+#!/usr/bin/env python3
+
+# this script will generate C++ sources embedding the project's resources (pngs, ttfs, svgs etc)
+# into resources/embedded, so they can be compiled into the binary instead of copied next to it.
+# set EMBED_RESOURCES to 1 in config.h to load them from memory.
+# only the sources of resources that changed are rewritten
+
+import os, sys
+
+scriptpath = os.path.dirname(os.path.realpath(__file__))
+projectpath = os.path.abspath(os.path.join(scriptpath, os.pardir))
+
+IPLUG2_ROOT = "../../iPlug2"
+
+sys.path.insert(0, os.path.join(scriptpath, IPLUG2_ROOT + '/../Scripts'))
+
+import bin2c
+
+def main():
+  encoding = sys.argv[1] if len(sys.argv) > 1 else "auto"
+
+  inputs = [projectpath + "/resources/img", projectpath + "/resources/fonts"]
+  written, unchanged, removed = bin2c.generate(projectpath + "/resources/embedded", [p for p in inputs if os.path.exists(p)], encoding)
+
+  for path in written:
+    print("wrote " + os.path.relpath(path, projectpath))
+  for path in removed:
+    print("removed " + os.path.relpath(path, projectpath))
+
+if __name__ == '__main__':
+  main()
@@ -393,6 +393,10 @@ if [ -f ./build-mac/$ARCHIVE_NAME.dmg ]; then
 fi
 mv ./build-mac/*.zip ./build-mac/out
 
+echo "writing release manifest"
+echo ""
+python3 $IPLUG2_ROOT/../Scripts/release_manifest.py create ./build-mac/out -o ./build-mac/out/$ARCHIVE_NAME-manifest.json
+
 #---------------------------------------------------------------------------------------------------------
 
 #if [ $DEMO == 1 ]
@@ -82,24 +82,15 @@ if [ -d ./resources/img ] && [ "$(ls -A ./resources/img/*.svg 2>/dev/null)" ]; t
   mv ./svgs.data ./build-web-wasm/svgs.data
 fi
 
-# Package @1x PNGs
+# Package bitmaps in per-density, size-bounded chunks. scripts/imgs.js fetches only the chunks the screen's
+# devicePixelRatio needs and prefetches the others later, so there is no separate imgs@2x.js any more
 FOUND_PNGS=0
-if [ -d ./resources/img ] && [ "$(ls -A ./resources/img/*.png 2>/dev/null | grep -v @2x)" ]; then
+FOUND_2XPNGS=0
+rm -f ./build-web-wasm/imgs.data ./build-web-wasm/imgs@2x.data
+if [ -d ./resources/img ] && [ "$(ls -A ./resources/img/*.png 2>/dev/null)" ]; then
   FOUND_PNGS=1
   echo "Packaging PNGs..."
-  python3 "$FILE_PACKAGER" imgs.data --use-preload-plugins --preload ./resources/img/ --use-preload-cache --indexedDB-name="/${PROJECT_NAME}_pkg" --exclude '*DS_Store' --exclude '*@2x.png' --exclude '*.svg' --js-output=./imgs.js
-  mv ./imgs.js ./build-web-wasm/scripts/imgs.js
-  mv ./imgs.data ./build-web-wasm/imgs.data
-fi
-
-# Package @2x PNGs
-FOUND_2XPNGS=0
-if [ -d ./resources/img ] && [ "$(ls -A ./resources/img/*@2x*.png 2>/dev/null)" ]; then
-  FOUND_2XPNGS=1
-  echo "Packaging @2x PNGs..."
-  mkdir -p ./build-web-wasm/2x/
-  cp ./resources/img/*@2x* ./build-web-wasm/2x/
-  (cd build-web-wasm && python3 "$FILE_PACKAGER" imgs@2x.data --use-preload-plugins --preload ./2x@/resources/img/ --use-preload-cache --indexedDB-name="/${PROJECT_NAME}_pkg" --exclude '*DS_Store' --js-output=./scripts/imgs@2x.js && rm -r ./2x)
+  python3 "$IPLUG2_ROOT/../Scripts/web_image_chunks.py" ./resources/img ./build-web-wasm
 fi
 
 echo ""
@@ -241,6 +232,9 @@ sed -i"$BAK_SUFFIX" "s/NAME_PLACEHOLDER_LC/$PROJECT_NAME_LC/g" "styles/style.css
 # Clean up backup files (only the ones we created, by our unique suffix)
 find . -maxdepth 3 -type f -name "*$BAK_SUFFIX" -delete
 
+# Hash the payload, so a deployment can be checked with release_manifest.py verify
+python3 "$IPLUG2_ROOT/../Scripts/release_manifest.py" create . -o manifest.json
+
 echo ""
 echo "============================================================"
 echo "BUILD COMPLETE"
@@ -37,12 +37,13 @@ echo ------------------------------------------------------------------
 echo Updating version numbers ...
 
 call python prepare_resources-win.py %DEMO%
-call python prepare_installer_docs.py win
+REM - run_tasks.py skips steps whose inputs haven't changed since the last run
+call python run_tasks.py --demo %DEMO% docs-win installer-win
 if %ERRORLEVEL% neq 0 (
-  echo ERROR: preparing installer docs failed
+  echo ERROR: preparing installer docs/.iss failed - run_tasks.py docs-win installer-win
+  echo run "python scripts\run_tasks.py --list" to see the steps with their inputs and outputs
   exit /B 1
 )
-call python update_installer-win.py %DEMO%
 
 cd ..\
 
@@ -1,4 +1,4 @@
-import zipfile, os, fileinput, string, sys, shutil
+import argparse, zipfile, os, fileinput, string, sys, shutil
 
 scriptpath = os.path.dirname(os.path.realpath(__file__))
 projectpath = os.path.abspath(os.path.join(scriptpath, os.pardir))
@@ -6,49 +6,161 @@ projectpath = os.path.abspath(os.path.join(scriptpath, os.pardir))
 IPLUG2_ROOT = "..\..\iPlug2"
 
 sys.path.insert(0, os.path.join(scriptpath, IPLUG2_ROOT + '\Scripts'))
+sys.path.insert(0, os.path.join(scriptpath, IPLUG2_ROOT + '\..\Scripts'))
 
 from get_archive_name import get_archive_name
-
-def add_folder_to_zip(zf, folder_path, archive_base):
-  """Add a folder and its contents to a zip file, preserving structure."""
+import release_manifest, tracing, zip_stream, zstd_archive
+
+# (source, arcname) pairs added to each archive, recorded in the release manifest
+archive_members = {}
+# files written alongside the archives (zstd dictionaries), also recorded in the manifest
+extra_files = []
+# (sha256, size) of archives that were streamed rather than written to disk
+archive_digests = {}
+
+PDB_FILES = [
+  projectpath + "\\build-win\\pdbs\\TemplateProject-vst3_x64.pdb",
+  projectpath + "\\build-win\\pdbs\\TemplateProject-vst3_ARM64EC.pdb",
+  projectpath + "\\build-win\\pdbs\\TemplateProject-app_x64.pdb",
+  projectpath + "\\build-win\\pdbs\\TemplateProject-app_ARM64EC.pdb",
+  projectpath + "\\build-win\\pdbs\\TemplateProject-clap_x64.pdb",
+  projectpath + "\\build-win\\pdbs\\TemplateProject-clap_ARM64EC.pdb"
+]
+
+def folder_members(folder_path, archive_base):
+  """List a folder's contents as zip members, preserving structure."""
+  members = []
   for root, dirs, files in os.walk(folder_path):
     for file in files:
       file_path = os.path.join(root, file)
       arcname = os.path.join(archive_base, os.path.relpath(file_path, folder_path))
-      print("adding " + file_path + " as " + arcname)
-      zf.write(file_path, arcname, zipfile.ZIP_DEFLATED)
+      members.append((file_path, arcname))
+  return members
+
+def installer_members(demo):
+  installer = "\\build-win\\installer\\TemplateProject Installer.exe"
+
+  if demo:
+    installer = "\\build-win\\installer\\TemplateProject Demo Installer.exe"
+
+  files = [
+    projectpath + installer,
+    projectpath + "\\installer\\changelog.txt",
+    projectpath + "\\installer\\known-issues.txt",
+    projectpath + "\\build-win\\manual\\TemplateProject manual.pdf"
+  ]
+
+  return [(f, os.path.basename(f)) for f in files]
+
+def plugin_members():
+  members = []
+
+  # Add VST3 bundle with folder structure preserved
+  vst3_bundle = projectpath + "\\build-win\\TemplateProject.vst3"
+  if os.path.exists(vst3_bundle):
+    members += folder_members(vst3_bundle, "TemplateProject.vst3")
+
+  # Add standalone executables
+  files = [
+    projectpath + "\\build-win\\TemplateProject_x64.exe",
+    projectpath + "\\build-win\\TemplateProject_ARM64EC.exe",
+  ]
+
+  for f in files:
+    if os.path.exists(f):
+      members.append((f, os.path.basename(f)))
+
+  # Add CLAP files - check postbuild location first, then build output
+  clap_files = [
+    # Postbuild locations
+    (projectpath + "\\build-win\\TemplateProject_x64.clap", "TemplateProject_x64.clap"),
+    (projectpath + "\\build-win\\TemplateProject_ARM64EC.clap", "TemplateProject_ARM64EC.clap"),
+    # Build output locations (fallback)
+    (projectpath + "\\build-win\\clap\\x64\\Release\\TemplateProject.clap", "TemplateProject_x64.clap"),
+    (projectpath + "\\build-win\\clap\\ARM64EC\\Release\\TemplateProject.clap", "TemplateProject_ARM64EC.clap"),
+  ]
+
+  added_claps = set()
+  for clap_path, archive_name in clap_files:
+    if os.path.exists(clap_path) and archive_name not in added_claps:
+      members.append((clap_path, archive_name))
+      added_claps.add(archive_name)
+
+  return members
+
+# archive formats, selected per archive with --format and --pdb-format
+FORMATS = {"zip": ".zip", "tar.zst": zstd_archive.EXTENSION}
+
+def write_archives(archives, zstd_options=None, sender=None):
+  """Write each archive from its (source, arcname) members.
+
+  Archives ending in .tar.zst are written with zstd_archive (zstd_options are passed on to it). With a
+  zip_stream.Sender, zip archives are sent to it as they are written instead of written to disk."""
+  for path, members in archives.items():
+    archive_members[path] = list(members)
+    if path.endswith(zstd_archive.EXTENSION):
+      # the dictionary, if any, is needed to unpack the archive
+      extra_files.extend(zstd_archive.write(path, members, **(zstd_options or {}))[1:])
+      continue
+
+    fileobj = sender.archive(os.path.basename(path)) if sender else path
+    with zipfile.ZipFile(fileobj, mode="w") as zf:
+      for file_path, arcname in members:
+        tracing.debug("adding " + file_path + " as " + arcname + " to " + os.path.basename(path))
+        with tracing.span("compress", "file", file=arcname) as span:
+          zf.write(file_path, arcname, zipfile.ZIP_DEFLATED)
+          span.read(os.path.getsize(file_path))
+          span.wrote(zf.infolist()[-1].compress_size)
+    if sender:
+      archive_digests[path] = fileobj.digest()
 
 def main():
-  if len(sys.argv) != 3:
-    print("Usage: make_zip.py demo[0/1] zip[0/1]")
-    sys.exit(1)
-  else:
-    demo=int(sys.argv[1])
-    zip=int(sys.argv[2])
+  parser = argparse.ArgumentParser(usage="make_zip.py demo[0/1] zip[0/1] [options]")
+  parser.add_argument("demo", type=int, choices=(0, 1))
+  parser.add_argument("zip", type=int, choices=(0, 1))
+  parser.add_argument("--format", choices=sorted(FORMATS), default="zip", help="Format of the plugin/installer archive.")
+  parser.add_argument("--pdb-format", choices=sorted(FORMATS), default="zip", help="Format of the PDB archive.")
+  parser.add_argument("--level", type=int, default=zstd_archive.DEFAULT_LEVEL, help="zstd compression level (1-22).")
+  parser.add_argument("--long", type=int, default=zstd_archive.DEFAULT_WINDOW_LOG, metavar="WINDOW_LOG",
+    help="zstd long distance matching window, as a power of 2 (0 disables it).")
+  parser.add_argument("--dict", help="zstd dictionary. Trained on the archived files and saved here if it doesn't exist.")
+  parser.add_argument("--stream", metavar="DEST",
+    help="Send the zip archives to DEST (-, tcp:host:port or a named pipe) while they are written, instead of to build-win\\out.")
+  args = parser.parse_args()
+
+  if args.stream == "-":
+    # stdout carries the archives (zip_stream writes to the original one), messages go to stderr
+    sys.stdout = sys.stderr
+
+  if args.stream and (args.format != "zip" or args.pdb_format != "zip"):
+    parser.error("--stream only supports zip archives")
+
+  demo = args.demo
+  zip = args.zip
 
   # Debug: list build-win contents
   build_dir = projectpath + "\\build-win"
-  print("=== Contents of build-win ===")
+  tracing.debug("=== Contents of build-win ===")
   if os.path.exists(build_dir):
     for item in os.listdir(build_dir):
       item_path = os.path.join(build_dir, item)
       if os.path.isdir(item_path):
-        print(f"  [DIR] {item}")
+        tracing.debug(f"  [DIR] {item}")
       else:
-        print(f"  {item}")
+        tracing.debug(f"  {item}")
   else:
     print("  build-win directory not found!")
 
   # Debug: check VST3 bundle structure
   vst3_bundle = build_dir + "\\TemplateProject.vst3"
-  if os.path.exists(vst3_bundle):
-    print("=== VST3 bundle structure ===")
+  if os.path.exists(vst3_bundle) and tracing.VERBOSE:
+    tracing.debug("=== VST3 bundle structure ===")
     for root, dirs, files in os.walk(vst3_bundle):
       level = root.replace(vst3_bundle, '').count(os.sep)
       indent = '  ' * level
-      print(f"{indent}{os.path.basename(root)}/")
+      tracing.debug(f"{indent}{os.path.basename(root)}/")
       for file in files:
-        print(f"{indent}  {file}")
+        tracing.debug(f"{indent}  {file}")
 
   dir = projectpath + "\\build-win\\out"
 
@@ -57,80 +169,34 @@ def main():
 
   os.makedirs(dir)
 
-  zipname = get_archive_name(projectpath, "win", "demo" if demo == 1 else "full" )
-  zf = zipfile.ZipFile(projectpath + "\\build-win\\out\\" + zipname + ".zip", mode="w")
-
-  if not zip:
-    installer = "\\build-win\\installer\\TemplateProject Installer.exe"
+  zipname = get_archive_name(projectpath, "win", "demo" if demo == 1 else "full")
+  archive = dir + "\\" + zipname + FORMATS[args.format]
+  pdb_archive = dir + "\\" + zipname + "-pdbs" + FORMATS[args.pdb_format]
 
-    if demo:
-      installer = "\\build-win\\installer\\TemplateProject Demo Installer.exe"
+  archives = {archive: plugin_members() if zip else installer_members(demo)}
+  archives[pdb_archive] = [(f, os.path.basename(f)) for f in PDB_FILES if os.path.exists(f)]
 
-    files = [
-      projectpath + installer,
-      projectpath + "\\installer\\changelog.txt",
-      projectpath + "\\installer\\known-issues.txt",
-      projectpath + "\\build-win\\manual\\TemplateProject manual.pdf"
-    ]
+  zstd_options = {"level": args.level, "window_log": args.long}
+  if args.dict:
+    zstd_sources = sorted(set(src for p, members in archives.items() if p.endswith(zstd_archive.EXTENSION) for src, _ in members))
+    if os.path.exists(args.dict) or (zstd_sources and zstd_archive.train(args.dict, zstd_sources)):
+      zstd_options["dictionary"] = args.dict
 
-    for f in files:
-      print("adding " + f)
-      zf.write(f, os.path.basename(f), zipfile.ZIP_DEFLATED)
+  if args.stream:
+    with zip_stream.Sender(args.stream) as sender:
+      write_archives(archives, zstd_options, sender)
   else:
-    # Add VST3 bundle with folder structure preserved
-    vst3_bundle = projectpath + "\\build-win\\TemplateProject.vst3"
-    if os.path.exists(vst3_bundle):
-      add_folder_to_zip(zf, vst3_bundle, "TemplateProject.vst3")
-
-    # Add standalone executables
-    files = [
-      projectpath + "\\build-win\\TemplateProject_x64.exe",
-      projectpath + "\\build-win\\TemplateProject_ARM64EC.exe",
-    ]
-
-    for f in files:
-      if os.path.exists(f):
-        print("adding " + f)
-        zf.write(f, os.path.basename(f), zipfile.ZIP_DEFLATED)
-
-    # Add CLAP files - check postbuild location first, then build output
-    clap_files = [
-      # Postbuild locations
-      (projectpath + "\\build-win\\TemplateProject_x64.clap", "TemplateProject_x64.clap"),
-      (projectpath + "\\build-win\\TemplateProject_ARM64EC.clap", "TemplateProject_ARM64EC.clap"),
-      # Build output locations (fallback)
-      (projectpath + "\\build-win\\clap\\x64\\Release\\TemplateProject.clap", "TemplateProject_x64.clap"),
-      (projectpath + "\\build-win\\clap\\ARM64EC\\Release\\TemplateProject.clap", "TemplateProject_ARM64EC.clap"),
-    ]
-
-    added_claps = set()
-    for clap_path, archive_name in clap_files:
-      if os.path.exists(clap_path) and archive_name not in added_claps:
-        print("adding " + clap_path + " as " + archive_name)
-        zf.write(clap_path, archive_name, zipfile.ZIP_DEFLATED)
-        added_claps.add(archive_name)
-
-  zf.close()
-  print("wrote " + zipname)
-
-  # Create PDB archive
-  zf = zipfile.ZipFile(projectpath + "\\build-win\\out\\" + zipname + "-pdbs.zip", mode="w")
+    write_archives(archives, zstd_options)
 
-  files = [
-    projectpath + "\\build-win\\pdbs\\TemplateProject-vst3_x64.pdb",
-    projectpath + "\\build-win\\pdbs\\TemplateProject-vst3_ARM64EC.pdb",
-    projectpath + "\\build-win\\pdbs\\TemplateProject-app_x64.pdb",
-    projectpath + "\\build-win\\pdbs\\TemplateProject-app_ARM64EC.pdb",
-    projectpath + "\\build-win\\pdbs\\TemplateProject-clap_x64.pdb",
-    projectpath + "\\build-win\\pdbs\\TemplateProject-clap_ARM64EC.pdb"
-  ]
-
-  for f in files:
-    if os.path.exists(f):
-      print("adding " + f)
-      zf.write(f, os.path.basename(f), zipfile.ZIP_DEFLATED)
+  # hash both archives and everything in them, so uploads can be verified with release_manifest.py verify
+  with tracing.span("release manifest"):
+    paths = list(archive_members) + extra_files
+    cache = release_manifest.HashCache()
+    release_manifest.write_manifest(dir + "\\" + zipname + "-manifest.json", paths, archive_members, projectpath, cache,
+      digests=archive_digests)
+    cache.save()
 
-  zf.close()
+  # makedist-win.bat takes the archive name from the last line
   print("wrote " + zipname)
 
 if __name__ == '__main__':
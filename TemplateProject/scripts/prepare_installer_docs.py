@@ -3,15 +3,20 @@
 import argparse
 import os
 import shutil
-import subprocess
+import sys
 
 
+IPLUG2_ROOT = "../../iPlug2"
 SCRIPT_DIR = os.path.dirname(os.path.realpath(__file__))
 PROJECT_DIR = os.path.abspath(os.path.join(SCRIPT_DIR, os.pardir))
 INSTALLER_DIR = os.path.join(PROJECT_DIR, "installer")
 MANUAL_DIR = os.path.join(PROJECT_DIR, "manual")
 PRODUCT_NAME = os.path.basename(PROJECT_DIR)
 
+sys.path.insert(0, os.path.join(SCRIPT_DIR, IPLUG2_ROOT + "/../Scripts"))
+
+import tracing
+
 
 def read_text(path):
   with open(path, "r", encoding="utf-8") as input_file:
@@ -31,7 +36,7 @@ def require_tool(name):
 
 def run_pandoc(args):
   require_tool("pandoc")
-  subprocess.run(["pandoc"] + args, check=True)
+  tracing.run(["pandoc"] + args, check=True)
 
 
 def pandoc_convert(source_path, target_path, output_format, extra_args=None):
@@ -83,7 +88,9 @@ def build_mac_docs():
 
   background = os.path.join(INSTALLER_DIR, PRODUCT_NAME + "-installer-bg.png")
   if os.path.exists(background):
-    shutil.copy2(background, os.path.join(target_dir, os.path.basename(background)))
+    with tracing.span("copy background", "file", file=os.path.basename(background)) as span:
+      shutil.copy2(background, os.path.join(target_dir, os.path.basename(background)))
+      span.wrote(os.path.getsize(background))
 
   print("Prepared macOS installer documents in " + target_dir)
 
@@ -108,10 +115,12 @@ def main():
   args = parser.parse_args()
 
   if args.platform in ("mac", "all"):
-    build_mac_docs()
+    with tracing.span("mac docs"):
+      build_mac_docs()
 
   if args.platform in ("win", "all"):
-    build_win_docs()
+    with tracing.span("win docs"):
+      build_win_docs()
 
 
 if __name__ == "__main__":
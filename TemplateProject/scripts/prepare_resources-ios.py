@@ -15,8 +15,16 @@ projectpath = os.path.abspath(os.path.join(scriptpath, os.pardir))
 IPLUG2_ROOT = "../../iPlug2"
 
 sys.path.insert(0, os.path.join(os.getcwd(), IPLUG2_ROOT + '/Scripts'))
+sys.path.insert(0, os.path.join(os.getcwd(), IPLUG2_ROOT + '/../Scripts'))
 
 from parse_config import parse_config, parse_xcconfig
+import tracing
+
+def copy_resource(src, dst):
+  tracing.debug("copying " + os.path.basename(src) + " to " + dst)
+  with tracing.span("copy resource", "file", file=os.path.basename(src)) as span:
+    shutil.copy(src, dst)
+    span.wrote(os.path.getsize(src))
 
 def main():
   if(len(sys.argv) == 2):
@@ -28,14 +36,12 @@ def main():
        if os.path.exists(projectpath + "/resources/img/"):
          imgs = os.listdir(projectpath + "/resources/img/")
          for img in imgs:
-           print("copying " + img + " to " + dst)
-           shutil.copy(projectpath + "/resources/img/" + img, dst)
+           copy_resource(projectpath + "/resources/img/" + img, dst)
      
        if os.path.exists(projectpath + "/resources/fonts/"):
          fonts = os.listdir(projectpath + "/resources/fonts/")
          for font in fonts:
-           print("copying " + font + " to " + dst)
-           shutil.copy(projectpath + "/resources/fonts/" + font, dst)
+           copy_resource(projectpath + "/resources/fonts/" + font, dst)
 
 if __name__ == '__main__':
   main()
@@ -5,21 +5,39 @@
 # resources can either be copied into the plug-in bundle (vst3, component etc) or into a shared path
 # since the shared path should be accesible from the mac app sandbox,
 # the path used is ~/Music/SHARED_RESOURCES_SUBPATH
-# you might also want to consider using bin2c resources
+# you might also want to consider using bin2c resources (see embed_resources.py and EMBED_RESOURCES in config.h)
 # in order to hide the resources and/or simplify this process
+# with PACK_RESOURCES 1 in config.h, the resources are written into a single memory mappable resources.pak instead,
+# the fonts are still copied as well
+#
+# build phases call it through iplug-tools (see Scripts/iplug_tools.py), which sets up sys.path and calls
+# main(). the other modules are only imported when they are needed
 
-import os, sys, shutil
+import os, sys
 
 scriptpath = os.path.dirname(os.path.realpath(__file__))
 projectpath = os.path.abspath(os.path.join(scriptpath, os.pardir))
 
 IPLUG2_ROOT = "../../iPlug2"
 
-sys.path.insert(0, os.path.join(os.getcwd(), IPLUG2_ROOT + '/Scripts'))
+RESOURCE_PACK_NAME = "resources.pak"
 
-from parse_config import parse_config
+def copy_resource(src, dst):
+  import shutil, tracing
+  tracing.debug("copying " + os.path.basename(src) + " to " + dst)
+  with tracing.span("copy resource", "file", file=os.path.basename(src)) as span:
+    shutil.copy(src, dst)
+    span.wrote(os.path.getsize(src))
+
+def config_flag(name):
+  # for settings parse_config doesn't know about
+  import re
+  with open(projectpath + "/config.h", "r") as f:
+    m = re.search(r"^\s*#define\s+" + name + r"\s+(\d+)", f.read(), re.MULTILINE)
+  return bool(m and int(m.group(1)))
 
 def main():
+  from parse_config import parse_config
   config = parse_config(projectpath)
 
   print("Copying resources ...")
@@ -32,17 +50,24 @@ def main():
   if os.path.exists(dst) == False:
     os.makedirs(dst + "/", 0o0755 )
 
-  if os.path.exists(projectpath + "/resources/img/"):
+  if config_flag("PACK_RESOURCES"):
+    import resource_pack
+    pack = os.path.join(dst, RESOURCE_PACK_NAME)
+    inputs = [projectpath + "/resources/img", projectpath + "/resources/fonts"]
+    if resource_pack.write_pack(pack, [p for p in inputs if os.path.exists(p)]):
+      print("wrote " + pack)
+  elif os.path.exists(projectpath + "/resources/img/"):
     imgs = os.listdir(projectpath + "/resources/img/")
     for img in imgs:
-      print("copying " + img + " to " + dst)
-      shutil.copy(projectpath + "/resources/img/" + img, dst)
+      copy_resource(projectpath + "/resources/img/" + img, dst)
 
+  # also copied with a pack, the plugin loads its font from the file when it can't open the pack
   if os.path.exists(projectpath + "/resources/fonts/"):
     fonts = os.listdir(projectpath + "/resources/fonts/")
     for font in fonts:
-      print("copying " + font + " to " + dst)
-      shutil.copy(projectpath + "/resources/fonts/" + font, dst)
+      copy_resource(projectpath + "/resources/fonts/" + font, dst)
 
 if __name__ == '__main__':
+  sys.path.insert(0, os.path.join(scriptpath, IPLUG2_ROOT + '/Scripts'))
+  sys.path.insert(0, os.path.join(scriptpath, IPLUG2_ROOT + '/../Scripts'))
   main()
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+
+# this module describes the scripts in this folder as build steps - which project files each
+# step reads, which files it writes and how it is invoked - so that tooling (e.g. watch.py)
+# can map a changed input onto the derived outputs it affects
+
+import fnmatch, glob, importlib.util, os, sys
+from collections import namedtuple
+
+IPLUG2_ROOT = "../../iPlug2"
+
+SCRIPT_DIR = os.path.dirname(os.path.realpath(__file__))
+PROJECT_DIR = os.path.abspath(os.path.join(SCRIPT_DIR, os.pardir))
+PRODUCT_NAME = os.path.basename(PROJECT_DIR)
+
+# run_step() calls the scripts' main() without running their __main__ block, where some of them add these
+sys.path.insert(0, os.path.join(SCRIPT_DIR, IPLUG2_ROOT + "/Scripts"))
+sys.path.insert(0, os.path.join(SCRIPT_DIR, IPLUG2_ROOT + "/../Scripts"))
+
+import tracing
+
+# common-*.xcconfig live next to the iPlug2 folder, not inside the project
+COMMON_DIR = os.path.relpath(os.path.dirname(os.path.abspath(os.path.join(SCRIPT_DIR, IPLUG2_ROOT))), PROJECT_DIR)
+
+# inputs/outputs are glob patterns relative to the project folder ("**" matches any depth).
+# env lists environment variables a step needs (e.g. when it can only run from an Xcode build phase)
+# platforms restricts a step to some sys.platform prefixes, None means everywhere
+Step = namedtuple("Step", ["name", "script", "args", "inputs", "outputs", "env", "platforms"], defaults=[None])
+
+def resource(suffix):
+  return "resources/" + PRODUCT_NAME + suffix
+
+STEPS = [
+  Step("version-mac", "update_version-mac.py", [],
+    inputs=["config.h", COMMON_DIR + "/common-mac.xcconfig"],
+    outputs=[resource(s) for s in ("-VST3-Info.plist", "-VST2-Info.plist", "-AU-Info.plist", "-macOS-AUv3-Info.plist", "-AAX-Info.plist", "-macOS-Info.plist")],
+    env=[]),
+  Step("version-ios", "update_version-ios.py", [],
+    inputs=["config.h", COMMON_DIR + "/common-ios.xcconfig"],
+    outputs=[resource("-iOS-AUv3-Info.plist"), resource("-iOS-Info.plist")],
+    env=[]),
+  Step("installer-win", "update_installer-win.py", ["0"],
+    inputs=["config.h"],
+    outputs=["installer/" + PRODUCT_NAME + ".iss"],
+    env=[]),
+  Step("docs-mac", "prepare_installer_docs.py", ["mac"],
+    inputs=["installer/*.md", "manual/*.md", "installer/" + PRODUCT_NAME + "-installer-bg.png"],
+    outputs=["build-mac/installer/resources/*", "build-mac/manual/" + PRODUCT_NAME + " manual.pdf"],
+    env=[]),
+  Step("docs-win", "prepare_installer_docs.py", ["win"],
+    inputs=["installer/*.md", "manual/*.md"],
+    outputs=["build-win/installer-docs/*.txt", "build-win/manual/" + PRODUCT_NAME + " manual.pdf"],
+    env=[]),
+  Step("resources-mac", "prepare_resources-mac.py", [],
+    inputs=["config.h", "resources/img/*", "resources/fonts/*"],
+    outputs=[],
+    env=["TARGET_BUILD_DIR", "UNLOCALIZED_RESOURCES_FOLDER_PATH"]),
+  Step("embed-resources", "embed_resources.py", [],
+    inputs=["resources/img/*", "resources/fonts/*"],
+    outputs=["resources/embedded/*"],
+    env=[]),
+  Step("zip-win", "makezip-win.py", ["0", "1"],
+    inputs=["build-win/*.exe", "build-win/*.clap", "build-win/" + PRODUCT_NAME + ".vst3/**", "build-win/clap/**/*.clap",
+      "build-win/pdbs/*.pdb", "build-win/installer/*.exe", "build-win/manual/*.pdf", "installer/changelog.txt", "installer/known-issues.txt"],
+    outputs=["build-win/out/*"],
+    env=[],
+    platforms=["win32"]),
+]
+
+def configure(steps=STEPS, demo=False, zip=True):
+  """Return steps with the demo/full and zip/installer choices applied to their arguments."""
+  configured = []
+  for step in steps:
+    if step.name == "installer-win":
+      step = step._replace(args=[str(int(demo))])
+    elif step.name == "zip-win":
+      step = step._replace(args=[str(int(demo)), str(int(zip))])
+    configured.append(step)
+  return configured
+
+def supported(step):
+  return step.platforms is None or any(sys.platform.startswith(p) for p in step.platforms)
+
+def project_relpath(path):
+  return os.path.relpath(os.path.abspath(path), PROJECT_DIR).replace(os.sep, "/")
+
+def step_matches(step, relpath):
+  return any(fnmatch.fnmatch(relpath, os.path.normpath(p).replace(os.sep, "/")) for p in step.inputs)
+
+def steps_for_changes(paths, steps=STEPS):
+  """Return the steps whose inputs include any of paths, in STEPS order."""
+  relpaths = [project_relpath(p) for p in paths]
+  return [step for step in steps if any(step_matches(step, r) for r in relpaths)]
+
+def expand(patterns):
+  """Existing files matching patterns, as sorted project relative paths."""
+  files = set()
+  for pattern in patterns:
+    for path in glob.glob(os.path.join(PROJECT_DIR, pattern), recursive=True):
+      if os.path.isfile(path):
+        files.add(project_relpath(path))
+  return sorted(files)
+
+def watch_dirs(steps=STEPS):
+  """Directories that need to be watched to see every input of steps."""
+  dirs = set()
+  for step in steps:
+    for pattern in step.inputs:
+      dirs.add(os.path.normpath(os.path.join(PROJECT_DIR, os.path.dirname(pattern))))
+  return sorted(d for d in dirs if os.path.isdir(d))
+
+def missing_env(step):
+  return [name for name in step.env if name not in os.environ]
+
+_modules = {}
+
+def load_step(step):
+  """Import a step script once, so repeated runs skip interpreter startup and module imports."""
+  if step.script not in _modules:
+    # the scripts resolve iPlug2/Scripts relative to the working directory when imported
+    cwd = os.getcwd()
+    os.chdir(SCRIPT_DIR)
+    try:
+      name = os.path.splitext(step.script)[0].replace("-", "_")
+      spec = importlib.util.spec_from_file_location(name, os.path.join(SCRIPT_DIR, step.script))
+      module = importlib.util.module_from_spec(spec)
+      spec.loader.exec_module(module)
+      _modules[step.script] = module
+    finally:
+      os.chdir(cwd)
+  return _modules[step.script]
+
+def run_step(step, args=None):
+  """Run a step's main() in this process. Returns True on success."""
+  module = load_step(step)
+  cwd = os.getcwd()
+  argv = sys.argv
+  os.chdir(SCRIPT_DIR)
+  sys.argv = [step.script] + list(step.args if args is None else args)
+  try:
+    with tracing.span(step.name, "step"):
+      module.main()
+    return True
+  except SystemExit as e:
+    return not e.code
+  finally:
+    sys.argv = argv
+    os.chdir(cwd)
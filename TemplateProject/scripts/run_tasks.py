@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+
+# this script runs the project's preparation steps (declared in project_steps.py) as a small task runner.
+# a step is skipped when its script, arguments, input files and previous outputs are unchanged since it last succeeded.
+# steps that don't consume each other's outputs run in parallel on a worker pool.
+# state is kept in build-tasks/state.json, input hashes are cached by size and mtime
+
+import argparse, concurrent.futures, fnmatch, hashlib, json, os, subprocess, sys, threading, time
+
+import project_steps
+import tracing
+
+STATE_PATH = os.path.join(project_steps.PROJECT_DIR, "build-tasks", "state.json")
+
+print_lock = threading.Lock()
+state_lock = threading.Lock()
+
+def load_state():
+  try:
+    with open(STATE_PATH, "r", encoding="utf-8") as f:
+      return json.load(f)
+  except (OSError, ValueError):
+    return {"files": {}, "steps": {}}
+
+def save_state(state):
+  os.makedirs(os.path.dirname(STATE_PATH), exist_ok=True)
+  temp_path = STATE_PATH + ".tmp"
+  with open(temp_path, "w", encoding="utf-8") as f:
+    json.dump(state, f, indent=1, sort_keys=True)
+  os.replace(temp_path, STATE_PATH)
+
+def file_digest(state, relpath):
+  """sha256 of a project file, re-read only when its size or mtime changed."""
+  path = os.path.join(project_steps.PROJECT_DIR, relpath)
+  st = os.stat(path)
+  cached = state["files"].get(relpath)
+  if cached and cached[0] == st.st_size and cached[1] == st.st_mtime_ns:
+    return cached[2]
+  h = hashlib.sha256()
+  with open(path, "rb") as f:
+    for chunk in iter(lambda: f.read(1 << 20), b""):
+      h.update(chunk)
+  with state_lock:
+    state["files"][relpath] = [st.st_size, st.st_mtime_ns, h.hexdigest()]
+  return h.hexdigest()
+
+def step_key(state, step):
+  h = hashlib.sha256()
+  h.update(json.dumps([step.script, step.args]).encode())
+  for relpath in ["scripts/" + step.script] + project_steps.expand(step.inputs):
+    h.update(relpath.encode() + b"\0" + file_digest(state, relpath).encode())
+  return h.hexdigest()
+
+def output_digests(state, step):
+  return {relpath: file_digest(state, relpath) for relpath in project_steps.expand(step.outputs)}
+
+def up_to_date(state, step, key):
+  previous = state["steps"].get(step.name)
+  if not previous or previous["key"] != key:
+    return False
+  # outputs deleted or edited by something else also make a step stale
+  return output_digests(state, step) == previous["outputs"]
+
+def patterns_overlap(a, b):
+  return fnmatch.fnmatch(a, b) or fnmatch.fnmatch(b, a)
+
+def dependencies(steps):
+  """For each step, the names of the steps producing one of its inputs."""
+  deps = {}
+  for step in steps:
+    deps[step.name] = set(other.name for other in steps if other is not step and
+      any(patterns_overlap(o, i) for o in other.outputs for i in step.inputs))
+  return deps
+
+def report(status, step, output=""):
+  with print_lock:
+    print("[" + status + "] " + step.name)
+    if output.strip():
+      print("  " + output.strip().replace("\n", "\n  "))
+    sys.stdout.flush()
+
+def execute(state, step, force, dry_run):
+  missing = project_steps.missing_env(step)
+  if missing:
+    report("skipped", step, "needs " + ", ".join(missing))
+    return "skipped"
+
+  key = step_key(state, step)
+  if not force and up_to_date(state, step, key):
+    report("up-to-date", step)
+    return "up-to-date"
+
+  if dry_run:
+    report("would run", step)
+    return "ran"
+
+  start = time.perf_counter()
+  with tracing.span(step.name, "step"):
+    result = subprocess.run([sys.executable, step.script] + list(step.args), cwd=project_steps.SCRIPT_DIR,
+      stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+  elapsed = " (%.2f s)" % (time.perf_counter() - start)
+
+  if result.returncode != 0:
+    report("FAILED" + elapsed, step, result.stdout)
+    with state_lock:
+      state["steps"].pop(step.name, None)
+    return "failed"
+
+  outputs = output_digests(state, step)
+  with state_lock:
+    state["steps"][step.name] = {"key": key, "outputs": outputs}
+  report("ran" + elapsed, step, result.stdout)
+  return "ran"
+
+def run(steps, jobs, force=False, dry_run=False):
+  """Run steps in dependency order, up to jobs at a time. Returns {step name: status}."""
+  state = load_state()
+  deps = dependencies(steps)
+  pending = list(steps)
+  results = {}
+
+  with concurrent.futures.ThreadPoolExecutor(max_workers=jobs) as pool:
+    running = {}
+    while pending or running:
+      progressed = False
+      for step in list(pending):
+        if not deps[step.name] <= set(results):
+          continue
+        pending.remove(step)
+        progressed = True
+        if any(results[d] in ("failed", "blocked") for d in deps[step.name]):
+          report("blocked", step)
+          results[step.name] = "blocked"
+        else:
+          running[pool.submit(execute, state, step, force, dry_run)] = step
+
+      if not running:
+        if not progressed:
+          for step in pending:
+            report("blocked", step, "dependency cycle")
+            results[step.name] = "blocked"
+          pending = []
+        continue
+
+      finished, _ = concurrent.futures.wait(running, return_when=concurrent.futures.FIRST_COMPLETED)
+      for future in finished:
+        step = running.pop(future)
+        try:
+          results[step.name] = future.result()
+        except Exception as e:
+          report("FAILED", step, repr(e))
+          results[step.name] = "failed"
+
+  if not dry_run:
+    save_state(state)
+  return results
+
+def main():
+  parser = argparse.ArgumentParser(description="Run the project's preparation steps, skipping the ones that are up to date.")
+  parser.add_argument("steps", nargs="*", help="Steps to run (default: every step supported on this platform).")
+  parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count() or 1, help="Number of steps to run in parallel.")
+  parser.add_argument("--force", action="store_true", help="Run steps even if they are up to date.")
+  parser.add_argument("--dry-run", action="store_true", help="Only report which steps would run.")
+  parser.add_argument("--list", action="store_true", help="List the steps with their inputs and outputs.")
+  parser.add_argument("--demo", type=int, choices=(0, 1), default=0, help="Prepare the demo variant.")
+  parser.add_argument("--zip", type=int, choices=(0, 1), default=1, help="Package zip (1) or installer (0) distributions.")
+  args = parser.parse_args()
+
+  steps = project_steps.configure(demo=args.demo, zip=args.zip)
+  names = [s.name for s in steps]
+
+  if args.list:
+    deps = dependencies(steps)
+    for step in steps:
+      print(step.name + ": " + " ".join([step.script] + list(step.args)) + ("" if project_steps.supported(step) else " (not supported here)"))
+      print("  inputs:  " + ", ".join(step.inputs))
+      print("  outputs: " + ", ".join(step.outputs))
+      if deps[step.name]:
+        print("  after:   " + ", ".join(sorted(deps[step.name])))
+    return
+
+  for name in args.steps:
+    if name not in names:
+      print("error: unknown step " + name + " (choose from " + ", ".join(names) + ")")
+      sys.exit(1)
+
+  if args.steps:
+    selected = [s for s in steps if s.name in args.steps]
+  else:
+    selected = [s for s in steps if project_steps.supported(s)]
+
+  results = run(selected, max(1, args.jobs), args.force, args.dry_run)
+
+  if any(r in ("failed", "blocked") for r in results.values()):
+    sys.exit(1)
+
+if __name__ == '__main__':
+  main()
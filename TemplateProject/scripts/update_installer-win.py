@@ -9,8 +9,10 @@ projectpath = os.path.abspath(os.path.join(scriptpath, os.pardir))
 IPLUG2_ROOT = "../../iPlug2"
 
 sys.path.insert(0, os.path.join(os.getcwd(), IPLUG2_ROOT + '/Scripts'))
+sys.path.insert(0, os.path.join(os.getcwd(), IPLUG2_ROOT + '/../Scripts'))
 
 from parse_config import parse_config
+import tracing
 
 README_SOURCE_RE = re.compile(r'^\s*Source:\s*"', re.IGNORECASE)
 README_DEST_RE = re.compile(r'\bDestName:\s*"readme\.txt"', re.IGNORECASE)
@@ -30,6 +32,37 @@ def replacestrs(filename, s, r):
     line = line.replace(s, r)
     sys.stdout.write(line)
 
+def update_iss(iss, config, demo):
+  with open(iss, "r") as f:
+    lines = f.readlines()
+
+  with open(iss, "w") as out:
+    for line in lines:
+      if "AppVersion" in line:
+        line="AppVersion=" + config['FULL_VER_STR'] + "\n"
+      if "OutputBaseFilename" in line:
+        if demo:
+          line="OutputBaseFilename=TemplateProject Demo Installer\n"
+        else:
+          line="OutputBaseFilename=TemplateProject Installer\n"
+        
+      if is_readme_entry(line):
+        line=readme_entry(demo)
+    
+      if "WelcomeLabel1" in line:
+       if demo:
+         line="WelcomeLabel1=Welcome to the TemplateProject Demo installer\n"
+       else:
+         line="WelcomeLabel1=Welcome to the TemplateProject installer\n"
+       
+      if "SetupWindowTitle" in line:
+       if demo:
+         line="SetupWindowTitle=TemplateProject Demo installer\n"
+       else:
+         line="SetupWindowTitle=TemplateProject installer\n"
+       
+      out.write(line)
+
 def main():
   demo = 0
   
@@ -43,33 +76,12 @@ def main():
 
 # WIN INSTALLER
   print("Updating Windows Installer version info...")
-  
-  for line in fileinput.input(projectpath + "/installer/" + config['BUNDLE_NAME'] + ".iss",inplace=1):
-    if "AppVersion" in line:
-      line="AppVersion=" + config['FULL_VER_STR'] + "\n"
-    if "OutputBaseFilename" in line:
-      if demo:
-        line="OutputBaseFilename=TemplateProject Demo Installer\n"
-      else:
-        line="OutputBaseFilename=TemplateProject Installer\n"
-        
-    if is_readme_entry(line):
-      line=readme_entry(demo)
-    
-    if "WelcomeLabel1" in line:
-     if demo:
-       line="WelcomeLabel1=Welcome to the TemplateProject Demo installer\n"
-     else:
-       line="WelcomeLabel1=Welcome to the TemplateProject installer\n"
-       
-    if "SetupWindowTitle" in line:
-     if demo:
-       line="SetupWindowTitle=TemplateProject Demo installer\n"
-     else:
-       line="SetupWindowTitle=TemplateProject installer\n"
-       
-    sys.stdout.write(line) 
-    
-    
+
+  iss = projectpath + "/installer/" + config['BUNDLE_NAME'] + ".iss"
+  with tracing.span("update iss", "file", file=os.path.basename(iss)) as span:
+    span.read(os.path.getsize(iss))
+    update_iss(iss, config, demo)
+    span.wrote(os.path.getsize(iss))
+
 if __name__ == '__main__':
   main()
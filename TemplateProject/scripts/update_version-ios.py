@@ -15,8 +15,17 @@ kAudioUnitType_Effect           = "aufx"
 kAudioUnitType_MIDIProcessor    = "aumi"
 
 sys.path.insert(0, os.path.join(os.getcwd(), IPLUG2_ROOT + '/Scripts'))
+sys.path.insert(0, os.path.join(os.getcwd(), IPLUG2_ROOT + '/../Scripts'))
 
 from parse_config import parse_config, parse_xcconfig
+import tracing
+
+def write_plist(plistpath, plist):
+  with tracing.span("write plist", "file", file=os.path.basename(plistpath)) as span:
+    data = plistlib.dumps(plist)
+    with open(plistpath, 'wb') as f:
+      f.write(data)
+    span.wrote(len(data))
 
 def main():
   config = parse_config(projectpath)
@@ -86,8 +95,7 @@ def main():
     else:
       auv3['NSExtension']['NSExtensionPrincipalClass'] = "IPlugAUViewController_vTemplateProject"
     
-    with open(plistpath, 'wb') as f2:
-      plistlib.dump(auv3, f2)
+    write_plist(plistpath, auv3)
 
 # Standalone APP
 
@@ -102,8 +110,7 @@ def main():
     iOSapp['CFBundlePackageType'] = "APPL"
     iOSapp['LSApplicationCategoryType'] = "public.app-category.music"
 
-    with open(plistpath, 'wb') as f2:
-      plistlib.dump(iOSapp, f2)
+    write_plist(plistpath, iOSapp)
 
 if __name__ == '__main__':
   main()
@@ -1,8 +1,18 @@
 #!/usr/bin/env python3
 
 # this script will create/update info plist files based on config.h
-
-import plistlib, os, sys, shutil
+#
+# when run from a target's build phase, only that target's plist is updated (picked from Xcode's
+# WRAPPER_EXTENSION). otherwise, or with "all", every plist is updated. formats can also be given
+# as arguments: update_version-mac.py [vst3|vst2|au|auv3|aax|app|all ...]
+#
+# parallel target builds may run this script concurrently: runs are serialized with a lock, and a
+# plist is skipped when a stamp shows it was already made from the same config.h, xcconfig and script
+#
+# build phases call it through iplug-tools (see Scripts/iplug_tools.py), which sets up sys.path and calls
+# main(). the other modules are only imported when they are needed, so an up to date run stays cheap
+
+import os, sys
 
 IPLUG2_ROOT = "../../iPlug2"
 
@@ -14,185 +24,268 @@ kAudioUnitType_MusicEffect      = "aumf"
 kAudioUnitType_Effect           = "aufx"
 kAudioUnitType_MIDIProcessor    = "aumi"
 
-sys.path.insert(0, os.path.join(os.getcwd(), IPLUG2_ROOT + '/Scripts'))
-
-from parse_config import parse_config, parse_xcconfig
-
-def main():
-  config = parse_config(projectpath)
-  xcconfig = parse_xcconfig(os.path.join(os.getcwd(), IPLUG2_ROOT +  '/../common-mac.xcconfig'))
-
-  CFBundleGetInfoString = config['BUNDLE_NAME'] + " v" + config['FULL_VER_STR'] + " " + config['PLUG_COPYRIGHT_STR']
-  CFBundleVersion = config['FULL_VER_STR']
-  CFBundlePackageType = "BNDL"
-  CSResourcesFileMapped = True
-  LSMinimumSystemVersion = xcconfig['DEPLOYMENT_TARGET']
-
-  print("Processing Info.plist files...")
+def write_plist(plistpath, plist):
+  import plistlib, tracing
+  with tracing.span("write plist", "file", file=os.path.basename(plistpath)) as span:
+    data = plistlib.dumps(plist)
+    # unchanged plists keep their mtime, so Xcode doesn't reprocess them
+    with open(plistpath, 'rb') as f:
+      if f.read() == data:
+        return
+    temp_path = plistpath + "." + str(os.getpid()) + ".tmp"
+    with open(temp_path, 'wb') as f:
+      f.write(data)
+    os.replace(temp_path, plistpath)
+    span.wrote(len(data))
+
+def component_type(config):
+  if config['PLUG_TYPE'] == 0:
+    if config['PLUG_DOES_MIDI_IN']:
+      return kAudioUnitType_MusicEffect
+    else:
+      return kAudioUnitType_Effect
+  elif config['PLUG_TYPE'] == 1:
+    return kAudioUnitType_MusicDevice
+  elif config['PLUG_TYPE'] == 2:
+    return kAudioUnitType_MIDIProcessor
+
+def common_values(config, xcconfig):
+  return dict(
+    CFBundleGetInfoString = config['BUNDLE_NAME'] + " v" + config['FULL_VER_STR'] + " " + config['PLUG_COPYRIGHT_STR'],
+    CFBundleVersion = config['FULL_VER_STR'],
+    CFBundlePackageType = "BNDL",
+    CSResourcesFileMapped = True,
+    LSMinimumSystemVersion = xcconfig['DEPLOYMENT_TARGET'])
 
 # VST3
 
-  plistpath = projectpath + "/resources/" + config['BUNDLE_NAME'] + "-VST3-Info.plist"
-  with open(plistpath, 'rb') as f:
-    vst3 = plistlib.load(f)  
-    vst3['CFBundleExecutable'] = config['BUNDLE_NAME']
-    vst3['CFBundleGetInfoString'] = CFBundleGetInfoString
-    vst3['CFBundleIdentifier'] = config['BUNDLE_DOMAIN'] + "." + config['BUNDLE_MFR'] + ".vst3." + config['BUNDLE_NAME'] + ""
-    vst3['CFBundleName'] = config['BUNDLE_NAME']
-    vst3['CFBundleVersion'] = CFBundleVersion
-    vst3['CFBundleShortVersionString'] = CFBundleVersion
-    vst3['LSMinimumSystemVersion'] = LSMinimumSystemVersion
-    vst3['CFBundlePackageType'] = CFBundlePackageType
-    vst3['CFBundleSignature'] = config['PLUG_UNIQUE_ID']
-    vst3['CSResourcesFileMapped'] = CSResourcesFileMapped
-
-    with open(plistpath, 'wb') as f2:
-      plistlib.dump(vst3, f2)
+def update_vst3(vst3, config, common):
+  vst3['CFBundleExecutable'] = config['BUNDLE_NAME']
+  vst3['CFBundleGetInfoString'] = common['CFBundleGetInfoString']
+  vst3['CFBundleIdentifier'] = config['BUNDLE_DOMAIN'] + "." + config['BUNDLE_MFR'] + ".vst3." + config['BUNDLE_NAME'] + ""
+  vst3['CFBundleName'] = config['BUNDLE_NAME']
+  vst3['CFBundleVersion'] = common['CFBundleVersion']
+  vst3['CFBundleShortVersionString'] = common['CFBundleVersion']
+  vst3['LSMinimumSystemVersion'] = common['LSMinimumSystemVersion']
+  vst3['CFBundlePackageType'] = common['CFBundlePackageType']
+  vst3['CFBundleSignature'] = config['PLUG_UNIQUE_ID']
+  vst3['CSResourcesFileMapped'] = common['CSResourcesFileMapped']
 
 # VST2
 
-  plistpath = projectpath + "/resources/" + config['BUNDLE_NAME'] + "-VST2-Info.plist"
-  with open(plistpath, 'rb') as f:
-    vst2 = plistlib.load(f)  
-    vst2['CFBundleExecutable'] = config['BUNDLE_NAME']
-    vst2['CFBundleGetInfoString'] = CFBundleGetInfoString
-    vst2['CFBundleIdentifier'] = config['BUNDLE_DOMAIN'] + "." + config['BUNDLE_MFR'] + ".vst." + config['BUNDLE_NAME'] + ""
-    vst2['CFBundleName'] = config['BUNDLE_NAME']
-    vst2['CFBundleVersion'] = CFBundleVersion
-    vst2['CFBundleShortVersionString'] = CFBundleVersion
-    vst2['LSMinimumSystemVersion'] = LSMinimumSystemVersion
-    vst2['CFBundlePackageType'] = CFBundlePackageType
-    vst2['CFBundleSignature'] = config['PLUG_UNIQUE_ID']
-    vst2['CSResourcesFileMapped'] = CSResourcesFileMapped
-
-    with open(plistpath, 'wb') as f2:
-      plistlib.dump(vst2, f2)
+def update_vst2(vst2, config, common):
+  vst2['CFBundleExecutable'] = config['BUNDLE_NAME']
+  vst2['CFBundleGetInfoString'] = common['CFBundleGetInfoString']
+  vst2['CFBundleIdentifier'] = config['BUNDLE_DOMAIN'] + "." + config['BUNDLE_MFR'] + ".vst." + config['BUNDLE_NAME'] + ""
+  vst2['CFBundleName'] = config['BUNDLE_NAME']
+  vst2['CFBundleVersion'] = common['CFBundleVersion']
+  vst2['CFBundleShortVersionString'] = common['CFBundleVersion']
+  vst2['LSMinimumSystemVersion'] = common['LSMinimumSystemVersion']
+  vst2['CFBundlePackageType'] = common['CFBundlePackageType']
+  vst2['CFBundleSignature'] = config['PLUG_UNIQUE_ID']
+  vst2['CSResourcesFileMapped'] = common['CSResourcesFileMapped']
 
 # AUDIOUNIT v2
 
-  plistpath = projectpath + "/resources/" + config['BUNDLE_NAME'] + "-AU-Info.plist"
-  with open(plistpath, 'rb') as f:
-    auv2 = plistlib.load(f)  
-    auv2['CFBundleExecutable'] = config['BUNDLE_NAME']
-    auv2['CFBundleGetInfoString'] = CFBundleGetInfoString
-    auv2['CFBundleIdentifier'] = config['BUNDLE_DOMAIN'] + "." + config['BUNDLE_MFR'] + ".audiounit." + config['BUNDLE_NAME'] + ""
-    auv2['CFBundleName'] = config['BUNDLE_NAME']
-    auv2['CFBundleVersion'] = CFBundleVersion
-    auv2['CFBundleShortVersionString'] = CFBundleVersion
-    auv2['LSMinimumSystemVersion'] = LSMinimumSystemVersion
-    auv2['CFBundlePackageType'] = CFBundlePackageType
-    auv2['CFBundleSignature'] = config['PLUG_UNIQUE_ID']
-    auv2['CSResourcesFileMapped'] = CSResourcesFileMapped
-
-    if config['PLUG_TYPE'] == 0:
-      if config['PLUG_DOES_MIDI_IN']:
-        COMPONENT_TYPE = kAudioUnitType_MusicEffect
-      else:
-        COMPONENT_TYPE = kAudioUnitType_Effect
-    elif config['PLUG_TYPE'] == 1:
-      COMPONENT_TYPE = kAudioUnitType_MusicDevice
-    elif config['PLUG_TYPE'] == 2:
-      COMPONENT_TYPE = kAudioUnitType_MIDIProcessor
-
-    auv2['AudioUnit Version'] = config['PLUG_VERSION_HEX']
-    auv2['AudioComponents'] = [{}]
-    auv2['AudioComponents'][0]['description'] = config['PLUG_NAME']
-    auv2['AudioComponents'][0]['factoryFunction'] = config['AUV2_FACTORY']
-    auv2['AudioComponents'][0]['manufacturer'] = config['PLUG_MFR_ID']
-    auv2['AudioComponents'][0]['name'] = config['PLUG_MFR'] + ": " + config['PLUG_NAME']
-    auv2['AudioComponents'][0]['subtype'] = config['PLUG_UNIQUE_ID']
-    auv2['AudioComponents'][0]['type'] = COMPONENT_TYPE
-    auv2['AudioComponents'][0]['version'] = config['PLUG_VERSION_INT']
-    auv2['AudioComponents'][0]['sandboxSafe'] = True
-
-    with open(plistpath, 'wb') as f2:
-      plistlib.dump(auv2, f2)
-      
+def update_au(auv2, config, common):
+  auv2['CFBundleExecutable'] = config['BUNDLE_NAME']
+  auv2['CFBundleGetInfoString'] = common['CFBundleGetInfoString']
+  auv2['CFBundleIdentifier'] = config['BUNDLE_DOMAIN'] + "." + config['BUNDLE_MFR'] + ".audiounit." + config['BUNDLE_NAME'] + ""
+  auv2['CFBundleName'] = config['BUNDLE_NAME']
+  auv2['CFBundleVersion'] = common['CFBundleVersion']
+  auv2['CFBundleShortVersionString'] = common['CFBundleVersion']
+  auv2['LSMinimumSystemVersion'] = common['LSMinimumSystemVersion']
+  auv2['CFBundlePackageType'] = common['CFBundlePackageType']
+  auv2['CFBundleSignature'] = config['PLUG_UNIQUE_ID']
+  auv2['CSResourcesFileMapped'] = common['CSResourcesFileMapped']
+
+  auv2['AudioUnit Version'] = config['PLUG_VERSION_HEX']
+  auv2['AudioComponents'] = [{}]
+  auv2['AudioComponents'][0]['description'] = config['PLUG_NAME']
+  auv2['AudioComponents'][0]['factoryFunction'] = config['AUV2_FACTORY']
+  auv2['AudioComponents'][0]['manufacturer'] = config['PLUG_MFR_ID']
+  auv2['AudioComponents'][0]['name'] = config['PLUG_MFR'] + ": " + config['PLUG_NAME']
+  auv2['AudioComponents'][0]['subtype'] = config['PLUG_UNIQUE_ID']
+  auv2['AudioComponents'][0]['type'] = component_type(config)
+  auv2['AudioComponents'][0]['version'] = config['PLUG_VERSION_INT']
+  auv2['AudioComponents'][0]['sandboxSafe'] = True
+
 # AUDIOUNIT v3
 
+def update_auv3(auv3, config, common):
   if config['PLUG_HAS_UI']:
     NSEXTENSIONPOINTIDENTIFIER  = "com.apple.AudioUnit-UI"
   else:
     NSEXTENSIONPOINTIDENTIFIER  = "com.apple.AudioUnit"
 
-  plistpath = projectpath + "/resources/" + config['BUNDLE_NAME'] + "-macOS-AUv3-Info.plist"
-
-  with open(plistpath, 'rb') as f:
-    auv3 = plistlib.load(f)  
-    auv3['CFBundleExecutable'] = config['BUNDLE_NAME']
-    auv3['CFBundleGetInfoString'] = CFBundleGetInfoString
-    auv3['CFBundleIdentifier'] = config['BUNDLE_DOMAIN'] + "." + config['BUNDLE_MFR'] + ".app." + config['BUNDLE_NAME'] + ".AUv3"
-    auv3['CFBundleName'] = config['BUNDLE_NAME']
-    auv3['CFBundleVersion'] = CFBundleVersion
-    auv3['CFBundleShortVersionString'] = CFBundleVersion
-    auv3['LSMinimumSystemVersion'] = LSMinimumSystemVersion
-    auv3['CFBundlePackageType'] = "XPC!"
-    auv3['NSExtension'] = dict(
-    NSExtensionAttributes = dict(
-                                AudioComponentBundle = "com.AcmeInc.app." + config['BUNDLE_NAME'] + ".AUv3Framework",
-                                AudioComponents = [{}]),
-  #                               NSExtensionServiceRoleType = "NSExtensionServiceRoleTypeEditor",
-    NSExtensionPointIdentifier = NSEXTENSIONPOINTIDENTIFIER,
-    NSExtensionPrincipalClass = "IPlugAUViewController_vTemplateProject"
-                              )
-    auv3['NSExtension']['NSExtensionAttributes']['AudioComponents'] = [{}]
-    auv3['NSExtension']['NSExtensionAttributes']['AudioComponents'][0]['description'] = config['PLUG_NAME']
-    auv3['NSExtension']['NSExtensionAttributes']['AudioComponents'][0]['manufacturer'] = config['PLUG_MFR_ID']
-    auv3['NSExtension']['NSExtensionAttributes']['AudioComponents'][0]['name'] = config['PLUG_MFR'] + ": " + config['PLUG_NAME']
-    auv3['NSExtension']['NSExtensionAttributes']['AudioComponents'][0]['subtype'] = config['PLUG_UNIQUE_ID']
-    auv3['NSExtension']['NSExtensionAttributes']['AudioComponents'][0]['type'] = COMPONENT_TYPE
-    auv3['NSExtension']['NSExtensionAttributes']['AudioComponents'][0]['version'] = config['PLUG_VERSION_INT']
-    auv3['NSExtension']['NSExtensionAttributes']['AudioComponents'][0]['sandboxSafe'] = True
-    auv3['NSExtension']['NSExtensionAttributes']['AudioComponents'][0]['tags'] = [{}]
-
-    if config['PLUG_TYPE'] == 1:
-      auv3['NSExtension']['NSExtensionAttributes']['AudioComponents'][0]['tags'][0] = "Synth"
-    else:
-      auv3['NSExtension']['NSExtensionAttributes']['AudioComponents'][0]['tags'][0] = "Effects"
-
-    with open(plistpath, 'wb') as f2:
-      plistlib.dump(auv3, f2)
+  auv3['CFBundleExecutable'] = config['BUNDLE_NAME']
+  auv3['CFBundleGetInfoString'] = common['CFBundleGetInfoString']
+  auv3['CFBundleIdentifier'] = config['BUNDLE_DOMAIN'] + "." + config['BUNDLE_MFR'] + ".app." + config['BUNDLE_NAME'] + ".AUv3"
+  auv3['CFBundleName'] = config['BUNDLE_NAME']
+  auv3['CFBundleVersion'] = common['CFBundleVersion']
+  auv3['CFBundleShortVersionString'] = common['CFBundleVersion']
+  auv3['LSMinimumSystemVersion'] = common['LSMinimumSystemVersion']
+  auv3['CFBundlePackageType'] = "XPC!"
+  auv3['NSExtension'] = dict(
+  NSExtensionAttributes = dict(
+                              AudioComponentBundle = "com.AcmeInc.app." + config['BUNDLE_NAME'] + ".AUv3Framework",
+                              AudioComponents = [{}]),
+#                               NSExtensionServiceRoleType = "NSExtensionServiceRoleTypeEditor",
+  NSExtensionPointIdentifier = NSEXTENSIONPOINTIDENTIFIER,
+  NSExtensionPrincipalClass = "IPlugAUViewController_vTemplateProject"
+                            )
+  auv3['NSExtension']['NSExtensionAttributes']['AudioComponents'] = [{}]
+  auv3['NSExtension']['NSExtensionAttributes']['AudioComponents'][0]['description'] = config['PLUG_NAME']
+  auv3['NSExtension']['NSExtensionAttributes']['AudioComponents'][0]['manufacturer'] = config['PLUG_MFR_ID']
+  auv3['NSExtension']['NSExtensionAttributes']['AudioComponents'][0]['name'] = config['PLUG_MFR'] + ": " + config['PLUG_NAME']
+  auv3['NSExtension']['NSExtensionAttributes']['AudioComponents'][0]['subtype'] = config['PLUG_UNIQUE_ID']
+  auv3['NSExtension']['NSExtensionAttributes']['AudioComponents'][0]['type'] = component_type(config)
+  auv3['NSExtension']['NSExtensionAttributes']['AudioComponents'][0]['version'] = config['PLUG_VERSION_INT']
+  auv3['NSExtension']['NSExtensionAttributes']['AudioComponents'][0]['sandboxSafe'] = True
+  auv3['NSExtension']['NSExtensionAttributes']['AudioComponents'][0]['tags'] = [{}]
+
+  if config['PLUG_TYPE'] == 1:
+    auv3['NSExtension']['NSExtensionAttributes']['AudioComponents'][0]['tags'][0] = "Synth"
+  else:
+    auv3['NSExtension']['NSExtensionAttributes']['AudioComponents'][0]['tags'][0] = "Effects"
 
 # AAX
 
-  plistpath = projectpath + "/resources/" + config['BUNDLE_NAME'] + "-AAX-Info.plist"
-  with open(plistpath, 'rb') as f:
-    aax = plistlib.load(f)  
-    aax['CFBundleExecutable'] = config['BUNDLE_NAME']
-    aax['CFBundleGetInfoString'] = CFBundleGetInfoString
-    aax['CFBundleIdentifier'] = config['BUNDLE_DOMAIN'] + "." + config['BUNDLE_MFR'] + ".aax." + config['BUNDLE_NAME'] + ""
-    aax['CFBundleName'] = config['BUNDLE_NAME']
-    aax['CFBundleVersion'] = CFBundleVersion
-    aax['CFBundleShortVersionString'] = CFBundleVersion
-    aax['LSMinimumSystemVersion'] = LSMinimumSystemVersion
-    aax['CSResourcesFileMapped'] = CSResourcesFileMapped
-
-    with open(plistpath, 'wb') as f2:
-      plistlib.dump(aax, f2)
+def update_aax(aax, config, common):
+  aax['CFBundleExecutable'] = config['BUNDLE_NAME']
+  aax['CFBundleGetInfoString'] = common['CFBundleGetInfoString']
+  aax['CFBundleIdentifier'] = config['BUNDLE_DOMAIN'] + "." + config['BUNDLE_MFR'] + ".aax." + config['BUNDLE_NAME'] + ""
+  aax['CFBundleName'] = config['BUNDLE_NAME']
+  aax['CFBundleVersion'] = common['CFBundleVersion']
+  aax['CFBundleShortVersionString'] = common['CFBundleVersion']
+  aax['LSMinimumSystemVersion'] = common['LSMinimumSystemVersion']
+  aax['CSResourcesFileMapped'] = common['CSResourcesFileMapped']
 
 # APP
 
-  plistpath = projectpath + "/resources/" + config['BUNDLE_NAME'] + "-macOS-Info.plist"
-
-  with open(plistpath, 'rb') as f:
-    macOSapp = plistlib.load(f)
-    macOSapp['CFBundleExecutable'] = config['BUNDLE_NAME']
-    macOSapp['CFBundleGetInfoString'] = CFBundleGetInfoString
-    macOSapp['CFBundleIdentifier'] = config['BUNDLE_DOMAIN'] + "." + config['BUNDLE_MFR'] + ".app." + config['BUNDLE_NAME'] + ""
-    macOSapp['CFBundleName'] = config['BUNDLE_NAME']
-    macOSapp['CFBundleVersion'] = CFBundleVersion
-    macOSapp['CFBundleShortVersionString'] = CFBundleVersion
-    macOSapp['LSMinimumSystemVersion'] = LSMinimumSystemVersion
-    macOSapp['CFBundlePackageType'] = CFBundlePackageType
-    macOSapp['CFBundleSignature'] = config['PLUG_UNIQUE_ID']
-    macOSapp['CSResourcesFileMapped'] = CSResourcesFileMapped
-    macOSapp['NSPrincipalClass'] = "SWELLApplication"
-    macOSapp['NSMainNibFile'] = config['BUNDLE_NAME'] + "-macOS-MainMenu"
-    macOSapp['LSApplicationCategoryType'] = "public.app-category.music"
-    macOSapp['NSMicrophoneUsageDescription'] = 	"This app needs mic access to process audio."
-
-    with open(plistpath, 'wb') as f2:
-      plistlib.dump(macOSapp, f2)
+def update_app(macOSapp, config, common):
+  macOSapp['CFBundleExecutable'] = config['BUNDLE_NAME']
+  macOSapp['CFBundleGetInfoString'] = common['CFBundleGetInfoString']
+  macOSapp['CFBundleIdentifier'] = config['BUNDLE_DOMAIN'] + "." + config['BUNDLE_MFR'] + ".app." + config['BUNDLE_NAME'] + ""
+  macOSapp['CFBundleName'] = config['BUNDLE_NAME']
+  macOSapp['CFBundleVersion'] = common['CFBundleVersion']
+  macOSapp['CFBundleShortVersionString'] = common['CFBundleVersion']
+  macOSapp['LSMinimumSystemVersion'] = common['LSMinimumSystemVersion']
+  macOSapp['CFBundlePackageType'] = common['CFBundlePackageType']
+  macOSapp['CFBundleSignature'] = config['PLUG_UNIQUE_ID']
+  macOSapp['CSResourcesFileMapped'] = common['CSResourcesFileMapped']
+  macOSapp['NSPrincipalClass'] = "SWELLApplication"
+  macOSapp['NSMainNibFile'] = config['BUNDLE_NAME'] + "-macOS-MainMenu"
+  macOSapp['LSApplicationCategoryType'] = "public.app-category.music"
+  macOSapp['NSMicrophoneUsageDescription'] = 	"This app needs mic access to process audio."
+
+# format -> (plist suffix, update function)
+FORMATS = {
+  "vst3": ("-VST3-Info.plist", update_vst3),
+  "vst2": ("-VST2-Info.plist", update_vst2),
+  "au": ("-AU-Info.plist", update_au),
+  "auv3": ("-macOS-AUv3-Info.plist", update_auv3),
+  "aax": ("-AAX-Info.plist", update_aax),
+  "app": ("-macOS-Info.plist", update_app),
+}
+
+# Xcode's WRAPPER_EXTENSION of the target running the script -> format
+WRAPPER_FORMATS = {
+  "vst3": "vst3",
+  "vst": "vst2",
+  "component": "au",
+  "appex": "auv3",
+  "aaxplugin": "aax",
+  "app": "app",
+}
+
+def requested_formats(args):
+  if args:
+    if "all" in args:
+      return list(FORMATS)
+    unknown = [a for a in args if a not in FORMATS]
+    if unknown:
+      print("error: unknown format " + ", ".join(unknown) + " (expected " + "|".join(list(FORMATS) + ["all"]) + ")")
+      sys.exit(1)
+    return args
+  wrapper = os.environ.get("WRAPPER_EXTENSION", "")
+  if wrapper in WRAPPER_FORMATS:
+    return [WRAPPER_FORMATS[wrapper]]
+  return list(FORMATS)
+
+class StampLock(object):
+  """Exclusive lock on a file in the stamp folder, so concurrent runs wait for each other."""
+
+  def __init__(self, path):
+    self.path = path
+
+  def __enter__(self):
+    import tracing
+    self.file = open(self.path, "a")
+    with tracing.span("wait for lock"):
+      try:
+        import fcntl
+        fcntl.flock(self.file, fcntl.LOCK_EX)
+      except ImportError:
+        pass
+    return self
+
+  def __exit__(self, exc_type, exc, tb):
+    # closing the file releases the lock
+    self.file.close()
+    return False
+
+def read_file(path):
+  with open(path, 'rb') as f:
+    return f.read()
+
+def stamp_key(inputs, plistpath):
+  import hashlib
+  h = hashlib.sha256()
+  for data in inputs + [read_file(plistpath)]:
+    h.update(str(len(data)).encode() + b"\0" + data)
+  return h.hexdigest()
+
+def main():
+  from parse_config import parse_config, parse_xcconfig
+  import tracing
+
+  formats = requested_formats(sys.argv[1:])
+
+  xcconfigpath = os.path.join(scriptpath, IPLUG2_ROOT +  '/../common-mac.xcconfig')
+  stampdir = os.path.join(projectpath, 'build-mac', '.plist-stamps')
+  os.makedirs(stampdir, exist_ok=True)
+
+  print("Processing Info.plist files...")
+
+  with StampLock(os.path.join(stampdir, 'lock')):
+    # read under the lock, bump_version.py may be replacing config.h
+    inputs = [read_file(os.path.join(projectpath, 'config.h')), read_file(xcconfigpath), read_file(os.path.realpath(__file__))]
+    config = parse_config(projectpath)
+    common = common_values(config, parse_xcconfig(xcconfigpath))
+
+    for name in formats:
+      suffix, update = FORMATS[name]
+      plistpath = projectpath + "/resources/" + config['BUNDLE_NAME'] + suffix
+      stamppath = os.path.join(stampdir, name + '.stamp')
+
+      try:
+        if read_file(stamppath).decode() == stamp_key(inputs, plistpath):
+          tracing.debug(os.path.basename(plistpath) + " is up to date")
+          continue
+      except OSError:
+        pass
+
+      import plistlib
+      with open(plistpath, 'rb') as f:
+        plist = plistlib.load(f)
+      update(plist, config, common)
+      write_plist(plistpath, plist)
+
+      with open(stamppath, 'w') as f:
+        f.write(stamp_key(inputs, plistpath))
 
 if __name__ == '__main__':
+  sys.path.insert(0, os.path.join(scriptpath, IPLUG2_ROOT + '/Scripts'))
+  sys.path.insert(0, os.path.join(scriptpath, IPLUG2_ROOT + '/../Scripts'))
   main()
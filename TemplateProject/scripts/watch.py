@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+
+# this script watches config.h, the common xcconfigs, resources and installer/manual Markdown
+# and regenerates only the derived files (plists, .iss, installer docs...) that depend on what changed.
+# the step scripts are imported once and re-run in this process, so each change avoids interpreter startup.
+# uses inotify on Linux, and falls back to polling elsewhere (or with --poll)
+
+import argparse, os, select, sys, time
+
+import project_steps
+
+# packaging consumes build products, it only makes sense after a build
+UNWATCHED_STEPS = ("zip-win",)
+
+def inotify_changes(dirs, debounce):
+  import ctypes, ctypes.util, struct
+
+  IN_MODIFY = 0x00000002
+  IN_CLOSE_WRITE = 0x00000008
+  IN_MOVED_TO = 0x00000080
+  IN_CREATE = 0x00000100
+  IN_DELETE = 0x00000200
+  EVENT = struct.Struct("iIII")
+
+  libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+  fd = libc.inotify_init1(os.O_CLOEXEC)
+  if fd < 0:
+    raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+
+  wds = {}
+  for d in dirs:
+    wd = libc.inotify_add_watch(fd, os.fsencode(d), IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE | IN_DELETE)
+    if wd < 0:
+      raise OSError(ctypes.get_errno(), "inotify_add_watch failed for " + d)
+    wds[wd] = d
+
+  try:
+    changed = set()
+    while True:
+      # block until something happens, then keep collecting until things go quiet for `debounce` seconds
+      ready, _, _ = select.select([fd], [], [], debounce if changed else None)
+      if not ready:
+        yield changed
+        changed = set()
+        continue
+      data = os.read(fd, 65536)
+      offset = 0
+      while offset < len(data):
+        wd, mask, cookie, length = EVENT.unpack_from(data, offset)
+        name = data[offset + EVENT.size:offset + EVENT.size + length].rstrip(b"\0")
+        offset += EVENT.size + length
+        if wd in wds and name:
+          changed.add(os.path.join(wds[wd], os.fsdecode(name)))
+  finally:
+    os.close(fd)
+
+def snapshot(dirs):
+  state = {}
+  for d in dirs:
+    if not os.path.isdir(d):
+      continue
+    with os.scandir(d) as entries:
+      for entry in entries:
+        if entry.is_file():
+          st = entry.stat()
+          state[entry.path] = (st.st_mtime_ns, st.st_size)
+  return state
+
+def polling_changes(dirs, debounce, interval):
+  previous = snapshot(dirs)
+  changed = set()
+  quiet_since = None
+  while True:
+    time.sleep(interval)
+    current = snapshot(dirs)
+    diff = {p for p in set(previous) | set(current) if previous.get(p) != current.get(p)}
+    previous = current
+    if diff:
+      changed |= diff
+      quiet_since = time.monotonic()
+    elif changed and time.monotonic() - quiet_since >= debounce:
+      yield changed
+      changed = set()
+
+def run_steps(steps):
+  for step in steps:
+    missing = project_steps.missing_env(step)
+    if missing:
+      print("skipping " + step.name + " (needs " + ", ".join(missing) + ")")
+      continue
+    start = time.perf_counter()
+    try:
+      ok = project_steps.run_step(step)
+    except Exception as e:
+      print("error: " + step.name + " failed: " + repr(e))
+      ok = False
+    print(("regenerated " if ok else "FAILED ") + step.name + " in %.0f ms" % ((time.perf_counter() - start) * 1000.0))
+    sys.stdout.flush()
+
+def main():
+  parser = argparse.ArgumentParser(description="Watch project inputs and regenerate the files derived from them.")
+  parser.add_argument("--poll", action="store_true", help="Poll for changes instead of using inotify.")
+  parser.add_argument("--interval", type=float, default=0.25, help="Polling interval in seconds.")
+  parser.add_argument("--debounce", type=float, default=0.1, help="Seconds without changes before regenerating.")
+  parser.add_argument("--demo", action="store_true", help="Write the demo variant of the Windows installer script.")
+  parser.add_argument("--initial", action="store_true", help="Regenerate every output once before watching.")
+  args = parser.parse_args()
+
+  steps = [s for s in project_steps.configure(demo=args.demo) if project_steps.supported(s) and s.name not in UNWATCHED_STEPS]
+  dirs = project_steps.watch_dirs(steps)
+
+  # import the step scripts up front, so the first change is as fast as the rest
+  for step in steps:
+    project_steps.load_step(step)
+
+  if args.initial:
+    run_steps(steps)
+
+  if args.poll or not sys.platform.startswith("linux"):
+    changes = polling_changes(dirs, args.debounce, args.interval)
+  else:
+    changes = inotify_changes(dirs, args.debounce)
+
+  print("watching " + ", ".join(project_steps.project_relpath(d) for d in dirs) + " (ctrl-c to stop)")
+  sys.stdout.flush()
+
+  try:
+    for changed in changes:
+      affected = project_steps.steps_for_changes(changed, steps)
+      if affected:
+        print("changed: " + ", ".join(sorted(project_steps.project_relpath(p) for p in changed)))
+        run_steps(affected)
+  except KeyboardInterrupt:
+    pass
+
+if __name__ == '__main__':
+  main()
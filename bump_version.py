@@ -3,72 +3,193 @@
 # https://semver.org/
 # pip3 install semver
 
-import os, sys, shutil, subprocess, glob, fileinput, string
+# USAGE:
+# bump_version.py major|minor|patch                    bump TemplateProject
+# bump_version.py major|minor|patch Project1 'Plug*'   bump several projects (names or globs) together
+
+import argparse, concurrent.futures, os, sys, shutil, subprocess, glob, re, json, threading
 import semver
 
 IPLUG2_ROOT = "iPlug2"
 PROJECT_ROOT = "TemplateProject"
-PROJECT_SCRIPTS = PROJECT_ROOT + "/scripts"
-
-def replacestrs(filename, s, r):
-  files = glob.glob(filename)
-  print("replacing " + s + " with " + r + " in " + filename)
 
-  for line in fileinput.input(files,inplace=1):
-    line = line.replace(s, r)
-    sys.stdout.write(line)
+# metadata scripts run in each project's scripts folder after config.h is updated
+UPDATE_SCRIPTS = [
+  ["update_version-mac.py"],
+  ["update_version-ios.py"],
+  ["update_installer-win.py", "0"],
+]
 
 sys.path.insert(0, os.path.join(os.getcwd(), IPLUG2_ROOT + "/Scripts"))
+sys.path.insert(0, os.path.join(os.getcwd(), "Scripts"))
 
 from parse_config import parse_config
+import tracing
+
+print_lock = threading.Lock()
+
+def bump(versionInfo, part):
+  if part == 'major':
+    return versionInfo.bump_major()
+  elif part == 'minor':
+    return versionInfo.bump_minor()
+  elif part == 'patch':
+    return versionInfo.bump_patch()
+  return versionInfo
+
+def version_hex(versionInfo):
+  versionInt = (versionInfo.major << 16 & 0xFFFF0000) + (versionInfo.minor << 8 & 0x0000FF00) + (versionInfo.patch & 0x000000FF)
+  return '0x{:08x}'.format(versionInt)
+
+def write_config(project, versionInfo):
+  """Set the version defines in a project's config.h. The file is replaced in one step, so it is never seen half written."""
+  path = os.path.join(project, "config.h")
+  with open(path, "r") as f:
+    text = f.read()
+
+  text = re.sub(r'^(#define PLUG_VERSION_STR )".*"', r'\g<1>"' + str(versionInfo) + '"', text, flags=re.MULTILINE)
+  text = re.sub(r'^(#define PLUG_VERSION_HEX )\S+', r'\g<1>' + version_hex(versionInfo), text, flags=re.MULTILINE)
+
+  temp_path = path + "." + str(os.getpid()) + ".tmp"
+  with open(temp_path, "w") as f:
+    f.write(text)
+  shutil.copymode(path, temp_path)
+  os.replace(temp_path, path)
+
+def metadata_files(project):
+  """config.h and the files the metadata scripts write."""
+  return [os.path.join(project, "config.h")] + sorted(glob.glob(os.path.join(project, "resources", "*.plist")) +
+    glob.glob(os.path.join(project, "installer", "*.iss")))
+
+def snapshot(projects):
+  """{path: contents} of every project's metadata files, to undo a run that fails partway."""
+  contents = {}
+  for project in projects:
+    for path in metadata_files(project):
+      with open(path, "rb") as f:
+        contents[path] = f.read()
+  return contents
+
+def restore(contents):
+  for path, data in contents.items():
+    with open(path, "rb") as f:
+      if f.read() == data:
+        continue
+    temp_path = path + "." + str(os.getpid()) + ".tmp"
+    with open(temp_path, "wb") as f:
+      f.write(data)
+    shutil.copymode(path, temp_path)
+    os.replace(temp_path, path)
+
+def update_project(project, versionStr, newVersionInfo):
+  """Write a project's new version and regenerate its metadata. Returns (old version, new version, problems)."""
+  with tracing.span("update config.h", "file", project=project):
+    write_config(project, newVersionInfo)
+
+  output = []
+  problems = []
+  scripts = os.path.join(project, "scripts")
+  for args in UPDATE_SCRIPTS:
+    if not os.path.exists(os.path.join(scripts, args[0])):
+      continue
+    with tracing.span(project + " " + args[0], "subprocess"):
+      result = subprocess.run([sys.executable] + args, cwd=scripts, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+    output.append(result.stdout)
+    if result.returncode != 0:
+      problems.append(args[0] + " failed")
+
+  with print_lock:
+    print("[" + project + "] v" + versionStr + " -> v" + str(newVersionInfo))
+    text = "".join(output).strip()
+    if text:
+      print("  " + text.replace("\n", "\n  "))
+    sys.stdout.flush()
+
+  return versionStr, str(newVersionInfo), problems
+
+def find_projects(patterns):
+  projects = []
+  for pattern in patterns:
+    matches = sorted(p.rstrip("/\\") for p in glob.glob(pattern) if os.path.isfile(os.path.join(p, "config.h")))
+    if not matches:
+      print("error: no project matches " + pattern)
+      sys.exit(1)
+    projects += [p for p in matches if p not in projects]
+  return projects
 
 def main():
-  config = parse_config(PROJECT_ROOT)
-  versionStr = config['FULL_VER_STR']
-  currentVersionInfo = semver.VersionInfo.parse(versionStr)
-  print("current version in config.h: v" + versionStr)
-
-  if len(sys.argv) == 2:
-    if sys.argv[1] == 'major':
-      newVersionInfo = currentVersionInfo.bump_major()
-    elif sys.argv[1] == 'minor':
-      newVersionInfo = currentVersionInfo.bump_minor()
-    elif sys.argv[1] == 'patch':
-      newVersionInfo = currentVersionInfo.bump_patch()
-    else:
-      newVersionInfo = currentVersionInfo
-  else:
-    print("Please supply an argument major, minor or patch")
-    exit()
+  parser = argparse.ArgumentParser(description="Bump the version of one or more projects, update their metadata, then commit and tag.")
+  parser.add_argument("part", help="major, minor or patch (anything else keeps the current version)")
+  parser.add_argument("projects", nargs="*", default=[PROJECT_ROOT], help="Project folders or globs (default: " + PROJECT_ROOT + ").")
+  parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count() or 1, help="Number of projects updated in parallel.")
+  parser.add_argument("--summary", help="Also write the old and new versions to this JSON file.")
+  args = parser.parse_args()
+
+  projects = find_projects(args.projects)
+  multi = len(projects) > 1
+
+  # parse_config isn't thread safe (it uses fileinput), so read the versions up front
+  versions = {}
+  for project in projects:
+    versionStr = parse_config(project)['FULL_VER_STR']
+    versions[project] = (versionStr, bump(semver.VersionInfo.parse(versionStr), args.part))
+    if not multi:
+      print("current version in config.h: v" + versionStr)
+
+  originals = snapshot(projects)
+  try:
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max(1, args.jobs)) as pool:
+      results = dict(zip(projects, pool.map(lambda p: update_project(p, *versions[p]), projects)))
+  except BaseException:
+    restore(originals)
+    raise
+
+  print("\nSummary:\n--------------------")
+  for project in projects:
+    old, new, problems = results[project]
+    print(project.ljust(max(len(p) for p in projects)) + "  v" + old + " -> v" + new + ("  (" + ", ".join(problems) + ")" if problems else ""))
+  print("--------------------")
+
+  if args.summary:
+    with open(args.summary, "w") as f:
+      json.dump(dict((p, {"old": r[0], "new": r[1], "problems": r[2]}) for p, r in results.items()), f, indent=2)
+
+  if any(r[2] for r in results.values()):
+    # leave every project as it was, rather than with a new version and partly updated metadata
+    restore(originals)
+    print("error: some metadata updates failed, restored the previous config.h, plist and .iss files, not tagging")
+    sys.exit(1)
+
+  changelogs = [p + "/installer/changelog.txt" for p in projects if os.path.exists(p + "/installer/changelog.txt")]
 
-  newVersionInt = (newVersionInfo.major << 16 & 0xFFFF0000) + (newVersionInfo.minor << 8 & 0x0000FF00) + (newVersionInfo.patch & 0x000000FF)
-
-  replacestrs(PROJECT_ROOT + "/config.h", '#define PLUG_VERSION_STR "' + versionStr + '"', '#define PLUG_VERSION_STR "' + str(newVersionInfo) + '"')
-  replacestrs(PROJECT_ROOT + "/config.h", '#define PLUG_VERSION_HEX ' + config['PLUG_VERSION_HEX'], '#define PLUG_VERSION_HEX ' + '0x{:08x}'.format(newVersionInt))
-
-  os.system("cd " + PROJECT_SCRIPTS + "; python3 update_version-mac.py")
-  os.system("cd " + PROJECT_SCRIPTS + "; python3 update_version-ios.py")
-  os.system("cd " + PROJECT_SCRIPTS + "; python3 update_installer-win.py 0")
-  
   print("\nCurrent changelog: \n--------------------")
-  os.system("cat " + PROJECT_ROOT + "/installer/changelog.txt")
+  for changelog in changelogs:
+    if multi:
+      print("\n" + changelog + ":")
+    os.system("cat '" + changelog + "'")
   print("\n\n--------------------")
 
   edit = input("\nEdit changelog? Y/N: ")
 
   if edit == 'y' or edit == 'Y':
-    os.system("vim " + PROJECT_ROOT + "/installer/changelog.txt")
+    os.system("vim " + " ".join("'" + c + "'" for c in changelogs))
 
     print("\nNew changelog: \n--------------------")
-    os.system("cat " + PROJECT_ROOT + "/installer/changelog.txt")
+    for changelog in changelogs:
+      os.system("cat '" + changelog + "'")
     print("\n\n--------------------");
 
   edit = input("\nTag version and git push to origin (will prompt for commit message)? Y/N: ")
 
   if edit == 'y' or edit == 'Y':
-    os.system("git commit -a --allow-empty")
-    os.system("git tag v" + str(newVersionInfo))
-    os.system("git push && git push --tags")
+    tracing.system("git commit -a --allow-empty")
+    if multi:
+      # projects ship together but are versioned separately, so each gets its own tag
+      for project in projects:
+        tracing.system("git tag " + os.path.basename(project) + "-v" + results[project][1])
+    else:
+      tracing.system("git tag v" + results[projects[0]][1])
+    tracing.system("git push && git push --tags")
 
 if __name__ == '__main__':
   main()
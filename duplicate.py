@@ -16,6 +16,10 @@
 
 # USAGE:
 # duplicate.py [inputprojectname] [outputprojectname] [manufacturername] (outputpath)
+# duplicate.py [inputprojectname] [outputprojectname] [manufacturername] (outputpath) --archive <file.zip|file.tar|file.tar.gz|->
+#   writes the duplicated project into an archive (- for stdout, see --format) instead of a folder. nothing else is
+#   created or modified - the root, .github and .vscode files are left alone. outputpath is only used to work out
+#   the relative path to iPlug2, for where the archive will be extracted.
 
 # TODO:
 # - indentation of directory structure
@@ -24,15 +28,17 @@
 
 from __future__ import generators
 
-import fileinput, glob, string, sys, os, re, uuid, pprint, random
+import fileinput, glob, string, sys, os, re, uuid, pprint, random, io, tarfile, time, zipfile
 from shutil import copy, copytree, ignore_patterns, rmtree
 from os.path import join
 
 scriptpath = os.path.dirname(os.path.realpath(__file__))
 
 sys.path.insert(0, scriptpath + '/iPlug2/Scripts/')
+sys.path.insert(0, scriptpath + '/Scripts/')
 
 from parse_config import parse_config, parse_xcconfig, set_uniqueid
+import project_index, tracing
 
 VERSION = "0.95"
 
@@ -58,12 +64,22 @@ SUBFOLDERS_TO_SEARCH = [
 "build-web-wasm"
 ]
 
+# folders dirwalk renames, and whether it looks inside them
+RENAMED_FOLDER_SUFFIXES = [
+("-macOS.xcodeproj", True),
+("-iOS.xcodeproj", True),
+(".xcworkspace", True),
+("-iOS.appiconset", False),
+("-macOS.appiconset", True)
+]
+
+ARCHIVE_FORMATS = {".zip": "zip", ".tar": "tar", ".tar.gz": "tar.gz", ".tgz": "tar.gz"}
+
 def randomFourChar(chars=string.ascii_letters + string.digits):
   return ''.join(random.choice(chars) for _ in range(4))
 
 def checkdirname(name, searchproject):
   "check if directory name matches with the given pattern"
-  print("")
   if name == searchproject:
     return True
   else:
@@ -72,10 +88,17 @@ def checkdirname(name, searchproject):
 def replacestrs(filename, s, r):
   files = glob.glob(filename)
 
-  for line in fileinput.input(files,inplace=1):
-    line.find(s)
-    line = line.replace(s, r)
-    sys.stdout.write(line)
+  with tracing.span("replacestrs", "file", file=os.path.basename(filename)) as span:
+    for f in files:
+      span.read(os.path.getsize(f))
+
+    for line in fileinput.input(files,inplace=1):
+      line.find(s)
+      line = line.replace(s, r)
+      sys.stdout.write(line)
+
+    for f in files:
+      span.wrote(os.path.getsize(f))
 
 def replacestrsChop(filename, s, r):
   files = glob.glob(filename)
@@ -94,37 +117,37 @@ def dirwalk(dir, searchproject, replaceproject, searchman, replaceman, oldroot=
         os.rename(fullpath, os.path.join(dir, replaceproject + "-macOS.xcodeproj"))
         fullpath = os.path.join(dir, replaceproject + "-macOS.xcodeproj")
 
-        print("recursing in macOS xcode project directory: ")
+        tracing.debug("recursing in macOS xcode project directory: ")
         for x in dirwalk(fullpath, searchproject, replaceproject, searchman, replaceman, oldroot, newroot):
           yield x
       elif checkdirname(f, searchproject + "-iOS.xcodeproj"):
         os.rename(fullpath, os.path.join(dir, replaceproject + "-iOS.xcodeproj"))
         fullpath = os.path.join(dir, replaceproject + "-iOS.xcodeproj")
 
-        print("recursing in iOS xcode project directory: ")
+        tracing.debug("recursing in iOS xcode project directory: ")
         for x in dirwalk(fullpath, searchproject, replaceproject, searchman, replaceman, oldroot, newroot):
           yield x
       elif checkdirname(f, searchproject + ".xcworkspace"):
         os.rename(fullpath, os.path.join(dir, replaceproject + ".xcworkspace"))
         fullpath = os.path.join(dir, replaceproject + ".xcworkspace")
 
-        print("recursing in main xcode workspace directory: ")
+        tracing.debug("recursing in main xcode workspace directory: ")
         for x in dirwalk(fullpath, searchproject, replaceproject, searchman, replaceman, oldroot, newroot):
           yield x
       elif checkdirname(f, searchproject + "-iOS.appiconset"):
         os.rename(fullpath, os.path.join(dir, replaceproject + "-iOS.appiconset"))
         fullpath = os.path.join(dir, replaceproject + "-iOS.appiconset")
 
-        print("recursing in -iOS.appiconset directory: ")
+        tracing.debug("recursing in -iOS.appiconset directory: ")
       elif checkdirname(f, searchproject + "-macOS.appiconset"):
         os.rename(fullpath, os.path.join(dir, replaceproject + "-macOS.appiconset"))
         fullpath = os.path.join(dir, replaceproject + "-macOS.appiconset")
 
-        print("recursing in -macOS.appiconset directory: ")
+        tracing.debug("recursing in -macOS.appiconset directory: ")
         for x in dirwalk(fullpath, searchproject, replaceproject, searchman, replaceman, oldroot, newroot):
           yield x
       elif (f in SUBFOLDERS_TO_SEARCH):
-        print('recursing in ' + f + ' directory: ')
+        tracing.debug('recursing in ' + f + ' directory: ')
         for x in dirwalk(fullpath, searchproject, replaceproject, searchman, replaceman, oldroot, newroot):
           yield x
 
@@ -135,51 +158,228 @@ def dirwalk(dir, searchproject, replaceproject, searchman, replaceman, oldroot=
 
       if (not(extension in FILTERED_FILE_EXTENSIONS) and not(filename in FILTERED_FILE_NAMES)):
 
-        print("Replacing project name strings in file " + filename)
+        tracing.debug("Replacing project name strings in file " + filename)
         replacestrs(fullpath, searchproject, replaceproject)
 
-        print("Replacing captitalized project name strings in file " + filename)
+        tracing.debug("Replacing captitalized project name strings in file " + filename)
         replacestrs(fullpath, searchproject.upper(), replaceproject.upper())
 
-        print("Replacing manufacturer name strings in file " + filename)
+        tracing.debug("Replacing manufacturer name strings in file " + filename)
         replacestrs(fullpath, searchman, replaceman)
 
         if (oldroot and newroot):
-          print ("Replacing iPlug2 root folder in file  " + filename)
+          tracing.debug("Replacing iPlug2 root folder in file  " + filename)
           replacestrs(fullpath, oldroot, newroot)
           replacestrs(fullpath, oldroot.replace('/', '\\'), newroot.replace('/', '\\'))
 
       else:
-        print("NOT replacing name strings in file " + filename)
+        tracing.debug("NOT replacing name strings in file " + filename)
 
       if filename != newfilename:
-        print("Renaming file " + filename + " to " + newfilename)
+        tracing.debug("Renaming file " + filename + " to " + newfilename)
         os.rename(fullpath, os.path.join(dir, newfilename))
 
       yield f, fullpath
     else:
       yield f, fullpath
 
+def substitutions(searchproject, replaceproject, searchman, replaceman, oldroot="", newroot=""):
+  "the (search, replace) pairs dirwalk applies to a file's contents, in order"
+  pairs = [(searchproject, replaceproject), (searchproject.upper(), replaceproject.upper()), (searchman, replaceman)]
+  if (oldroot and newroot):
+    pairs += [(oldroot, newroot), (oldroot.replace('/', '\\'), newroot.replace('/', '\\'))]
+  return [(s.encode("utf-8"), r.encode("utf-8")) for s, r in pairs]
+
+def treewalk(dir, arcdir, searchproject, replaceproject, pairs, ignore, search=True):
+  """what copytree followed by dirwalk would produce, without writing anything. yields (path, contents, mode)
+  for each folder (contents None) and file, reading one file at a time. line endings are left as they are."""
+  names = sorted(os.listdir(dir))
+  ignored = ignore(dir, names)
+
+  for f in names:
+    if f in ignored:
+      continue
+    fullpath = os.path.join(dir, f)
+
+    if os.path.isdir(fullpath):
+      newname = f
+      recurse = False
+      if search and not os.path.islink(fullpath):
+        recurse = f in SUBFOLDERS_TO_SEARCH
+        for suffix, lookinside in RENAMED_FOLDER_SUFFIXES:
+          if checkdirname(f, searchproject + suffix):
+            newname = replaceproject + suffix
+            recurse = lookinside
+
+      arcpath = arcdir + "/" + newname
+      yield arcpath, None, os.stat(fullpath).st_mode
+      for x in treewalk(fullpath, arcpath, searchproject, replaceproject, pairs, ignore, recurse):
+        yield x
+
+    elif os.path.isfile(fullpath):
+      with tracing.span("read", "file", file=f) as span:
+        with open(fullpath, "rb") as fh:
+          data = fh.read()
+        span.read(len(data))
+
+      newname = f
+      if search:
+        base, extension = os.path.splitext(f)
+        if (not(extension in FILTERED_FILE_EXTENSIONS) and not(f in FILTERED_FILE_NAMES)):
+          for s, r in pairs:
+            data = data.replace(s, r)
+        newname = f.replace(searchproject, replaceproject)
+
+      yield arcdir + "/" + newname, data, os.stat(fullpath).st_mode
+
+def set_uniqueid_bytes(data, uid):
+  "set_uniqueid for config.h contents"
+  lines = data.splitlines(True)
+  return b"".join(("#define PLUG_UNIQUE_ID '" + uid + "'\n").encode("utf-8") if b"#define PLUG_UNIQUE_ID" in line else line for line in lines)
+
+def duplicate_files(inputprojectname, outputprojectname, manufacturer, oldroot="", newroot="", uniqueid=None):
+  """the duplicated project, with every rename and substitution applied, as (path, contents, mode) entries.
+  paths start with outputprojectname/, folders have None contents. nothing is written."""
+  pairs = substitutions(inputprojectname, outputprojectname, "AcmeInc", manufacturer, oldroot, newroot)
+  configpath = outputprojectname + "/config.h"
+
+  for path, data, mode in treewalk(inputprojectname, outputprojectname, inputprojectname, outputprojectname, pairs, ignore_patterns(*DONT_COPY)):
+    if uniqueid and path == configpath:
+      data = set_uniqueid_bytes(data, uniqueid)
+    yield path, data, mode
+
+def duplicate_to_dict(inputprojectname, outputprojectname, manufacturer, oldroot="", newroot="", uniqueid=None):
+  "the duplicated project as {path: contents}, files only"
+  return dict((path, data) for path, data, mode in duplicate_files(inputprojectname, outputprojectname, manufacturer, oldroot, newroot, uniqueid) if data is not None)
+
+def archive_format(path):
+  for extension in sorted(ARCHIVE_FORMATS, key=len, reverse=True):
+    if path.endswith(extension):
+      return ARCHIVE_FORMATS[extension]
+  return None
+
+def write_archive(entries, fileobj, format):
+  """stream (path, contents, mode) entries into a zip, tar or tar.gz archive. fileobj doesn't have to be seekable,
+  only one file's contents are held at a time"""
+  now = time.time()
+
+  if format == "zip":
+    with zipfile.ZipFile(fileobj, "w", zipfile.ZIP_DEFLATED) as zf:
+      for path, data, mode in entries:
+        zinfo = zipfile.ZipInfo(path + ("/" if data is None else ""), time.localtime(now)[:6])
+        zinfo.external_attr = (mode & 0xFFFF) << 16
+        if data is None:
+          zinfo.external_attr |= 0x10
+          zinfo.compress_type = zipfile.ZIP_STORED
+        else:
+          zinfo.compress_type = zipfile.ZIP_DEFLATED
+        zf.writestr(zinfo, data or b"")
+  else:
+    # the stream modes (w|) write sequentially, without seeking back
+    with tarfile.open(fileobj=fileobj, mode="w|gz" if format == "tar.gz" else "w|") as tf:
+      for path, data, mode in entries:
+        info = tarfile.TarInfo(path)
+        info.mtime = now
+        info.mode = mode & 0o7777
+        if data is None:
+          info.type = tarfile.DIRTYPE
+          tf.addfile(info)
+        else:
+          info.size = len(data)
+          tf.addfile(info, io.BytesIO(data))
+
+def iplug2_roots(inputprojectname, outputpath):
+  "the IPLUG2_ROOT of the input project, and the one the output project needs at outputpath"
+  configpath = os.path.join(inputprojectname, "config")
+  xcconfig = parse_xcconfig(configpath + "/" + inputprojectname + "-mac.xcconfig")
+  oldroot = xcconfig["IPLUG2_ROOT"]
+  iplug2folder = os.path.abspath(os.path.join(configpath, oldroot))
+  newroot = os.path.relpath(iplug2folder, os.path.join(outputpath, "config"))
+  return oldroot, newroot
+
+def duplicate_archive(inputprojectname, outputprojectname, manufacturer, outputpath, archive, archivefile, format):
+  oldroot = ""
+  newroot = ""
+  if outputpath:
+    oldroot, newroot = iplug2_roots(inputprojectname, outputpath)
+
+  # pick an ID no other project in the workspace uses. the index isn't saved, the project isn't in the workspace
+  with tracing.span("project index"):
+    uniqueid = project_index.ProjectIndex(scriptpath).new_unique_id(randomFourChar)
+
+  config = {}
+  def entries():
+    for path, data, mode in duplicate_files(inputprojectname, outputprojectname, manufacturer, oldroot, newroot, uniqueid):
+      if path == outputprojectname + "/config.h":
+        config.update(project_index.parse_defines(data.decode("utf-8", "replace")))
+      yield path, data, mode
+
+  with tracing.span("write archive", "write", file=archive):
+    if archivefile:
+      write_archive(entries(), archivefile, format)
+      archivefile.flush()
+    else:
+      # write next to the destination and rename, so a failed run doesn't leave half an archive
+      temppath = archive + "." + str(os.getpid()) + ".tmp"
+      try:
+        with open(temppath, "wb") as f:
+          write_archive(entries(), f, format)
+        os.replace(temppath, archive)
+      finally:
+        if os.path.exists(temppath):
+          os.remove(temppath)
+
+  pp = pprint.PrettyPrinter(indent=4)
+  pp.pprint(config)
+  print("\ndone - wrote " + (archive if archive != "-" else format + " archive to stdout") + " - don't forget to change PLUG_MFR_UID in config.h")
+
+def pop_option(args, name, default=None):
+  if name in args:
+    i = args.index(name)
+    if i + 1 >= len(args):
+      print("error: " + name + " needs a value")
+      sys.exit(1)
+    value = args[i + 1]
+    del args[i:i + 2]
+    return value
+  return default
+
 def main():
   global VERSION
+
+  args = sys.argv[1:]
+  archive = pop_option(args, "--archive")
+  format = pop_option(args, "--format")
+
+  if archive == "-":
+    # the archive goes to stdout, so messages go to stderr
+    archivefile = sys.stdout.buffer
+    sys.stdout = sys.stderr
+
   print("\nIPlug Project Duplicator v" + VERSION + " by Oli Larkin ------------------------------\n")
 
-  numargs = len(sys.argv) - 1
+  numargs = len(args)
 
   if not (numargs == 3 or numargs == 4):
-    print("Usage: duplicate.py inputprojectname outputprojectname manufacturername (outputprojectpath)")
+    print("Usage: duplicate.py inputprojectname outputprojectname manufacturername (outputprojectpath) (--archive file.zip|file.tar|file.tar.gz|- (--format zip|tar|tar.gz))")
     sys.exit(1)
   else:
-    inputprojectname=sys.argv[1]
-    outputprojectname=sys.argv[2]
-    manufacturer=sys.argv[3]
+    inputprojectname=args[0]
+    outputprojectname=args[1]
+    manufacturer=args[2]
 
   if numargs == 4:
-    outputbasepath=os.path.abspath(sys.argv[4])
+    outputbasepath=os.path.abspath(args[3])
   else:
     outputbasepath=os.getcwd()
 
-  if not (os.path.isdir(outputbasepath)):
+  if archive:
+    format = format or (archive_format(archive) if archive != "-" else "tar.gz")
+    if format not in ARCHIVE_FORMATS.values():
+      print("error: unknown archive format, use --format zip, tar or tar.gz")
+      sys.exit(1)
+
+  if not archive and not (os.path.isdir(outputbasepath)):
     print("error: Output path does not exist")
     sys.exit(1)
 
@@ -213,41 +413,46 @@ def main():
     print("error: input project not found")
     sys.exit(1)
 
+  if archive:
+    duplicate_archive(inputprojectname, outputprojectname, manufacturer, outputpath if numargs == 4 else "", archive, archivefile if archive == "-" else None, format)
+    return
+
   if os.path.isdir(outputpath):
     print("error: output project allready exists")
     sys.exit(1)
   # rmtree(output)
 
   print("copying " + inputprojectname + " folder to " + outputpath)
-  copytree(inputprojectname, outputpath, ignore=ignore_patterns(*DONT_COPY))
+  with tracing.span("copytree"):
+    copytree(inputprojectname, outputpath, ignore=ignore_patterns(*DONT_COPY))
 
   oldroot = ""
   newroot = ""
   
   if numargs == 4:
-    configpath = os.path.join(inputprojectname, "config")
-    xcconfig = parse_xcconfig(configpath + "/" + inputprojectname + "-mac.xcconfig")
-    oldroot = xcconfig["IPLUG2_ROOT"]
-    iplug2folder = os.path.abspath(os.path.join(configpath, oldroot))
-    newroot = os.path.relpath(iplug2folder, os.path.join(outputpath, "config"))
+    oldroot, newroot = iplug2_roots(inputprojectname, outputpath)
   else:
     newroot = ""
 
   #replace manufacturer name strings
-  for dir in dirwalk(outputpath, inputprojectname, outputprojectname, "AcmeInc", manufacturer, oldroot, newroot):
-    pass
+  with tracing.span("dirwalk project"):
+    for dir in dirwalk(outputpath, inputprojectname, outputprojectname, "AcmeInc", manufacturer, oldroot, newroot):
+      pass
 
   #replace project name in root
-  for dir in dirwalk(scriptpath, inputprojectname, outputprojectname, "AcmeInc", manufacturer, oldroot, newroot):
-    pass
+  with tracing.span("dirwalk root"):
+    for dir in dirwalk(scriptpath, inputprojectname, outputprojectname, "AcmeInc", manufacturer, oldroot, newroot):
+      pass
 
   #replace project name in github
-  for dir in dirwalk(scriptpath + "/.github/workflows", inputprojectname, outputprojectname, "AcmeInc", manufacturer, oldroot, newroot):
-    pass
+  with tracing.span("dirwalk github"):
+    for dir in dirwalk(scriptpath + "/.github/workflows", inputprojectname, outputprojectname, "AcmeInc", manufacturer, oldroot, newroot):
+      pass
 
   #replace project name in vscode
-  for dir in dirwalk(scriptpath + "/.vscode", inputprojectname, outputprojectname, "AcmeInc", manufacturer, oldroot, newroot):
-    pass
+  with tracing.span("dirwalk vscode"):
+    for dir in dirwalk(scriptpath + "/.vscode", inputprojectname, outputprojectname, "AcmeInc", manufacturer, oldroot, newroot):
+      pass
 
   # print("\ncopying gitignore template into project folder\n")
 
@@ -255,9 +460,14 @@ def main():
 
   config = parse_config(outputpath)
 
-  config["PLUG_UNIQUE_ID"] = randomFourChar()
+  # pick an ID no other project in the workspace uses
+  with tracing.span("project index"):
+    index = project_index.ProjectIndex(scriptpath)
+    config["PLUG_UNIQUE_ID"] = index.new_unique_id(randomFourChar)
 
   set_uniqueid(outputpath, config["PLUG_UNIQUE_ID"])
+  index.refresh()
+  index.save()
 
   pp = pprint.PrettyPrinter(indent=4)
   pp.pprint(config)